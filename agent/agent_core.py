@@ -1,12 +1,25 @@
 import os
+import gzip
 import json
 import socket
 import time
 import requests
 import psutil
 import platform
+import random
 import urllib3
 import sys
+from requests.adapters import HTTPAdapter
+
+from budget import ResourceBudget
+from events import ProcessEvent
+from prefilter import AgentFilter
+from spool import Backoff, Spool
+
+try:
+    import proc_connector
+except ImportError:
+    proc_connector = None
 
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
@@ -15,11 +28,13 @@ SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 SHARED_SECRET = "MySecureProjectPassword2026!"
 CONFIG_FILE = os.path.join(SCRIPT_DIR, "agent_config.json")
 SETTINGS_FILE = os.path.join(SCRIPT_DIR, "agent_settings.json")
+SPOOL_FILE = os.path.join(SCRIPT_DIR, "agent_spool.db")
 
 # Default to localhost, but try to load from settings
 SERVER_API = "http://127.0.0.1:5001/api"
 
 # 1. Load from settings file if it exists
+settings = {}
 if os.path.exists(SETTINGS_FILE):
     try:
         with open(SETTINGS_FILE, "r") as f:
@@ -86,26 +101,165 @@ def register_with_server():
     except Exception as e:
         print(f"❌ Registration Error: {e}")
         return None
+# --- Process collection ---
+SCAN_INTERVAL = 1.0       # seconds between process table scans
+SEND_INTERVAL = 10        # max seconds between uploads (also the heartbeat)
+FLUSH_MAX_EVENTS = 1000   # upload early once this many events are pending
+GZIP_LEVEL = 6
+SPOOL_MAX_BYTES = 50 * 1024 * 1024  # oldest spooled batches are evicted beyond this
+REPLAY_INTERVAL = 2.0     # seconds between upload rounds while a backlog is replayed
+REPLAY_BATCHES = 5        # spooled batches sent per round
+BACKOFF_BASE = 2.0        # seconds; doubles per failed upload, with full jitter
+BACKOFF_MAX = 300.0
+FILTER_REFRESH_INTERVAL = 60  # seconds between pre-filter fetches
+BENIGN_FLUSH_INTERVAL = 60    # non-priority events are batched this long (priority ones go out at once)
+BENIGN_SAMPLE_RATE = 1.0      # fraction of non-priority events kept when the filter is complete
+SCAN_CPU_BUDGET = 0.05    # max fraction of one core spent scanning
+MAX_PENDING_EVENTS = 5000 # oldest events are dropped beyond this
+# Own resource budget (overridable in agent_settings.json); see budget.py for the degradation steps
+AGENT_CPU_BUDGET = float(settings.get("cpu_budget", 0.02))      # fraction of one core, averaged per window
+AGENT_RSS_BUDGET_MB = float(settings.get("rss_budget_mb", 150))
+BUDGET_WINDOW = float(settings.get("budget_window", 30))        # seconds between budget checks
+DEGRADED_SAMPLE_RATE = float(settings.get("degraded_sample_rate", 0.25))  # benign events kept in "sampled" mode
+LEAN_CMD_MAX = 1024       # benign command lines are truncated to this in "lean" mode
+
+
+class ProcessCollector:
+    """Incremental process collector.
+
+    Keeps a compact table keyed by (pid, create_time) and, on each scan,
+    reports only processes that were not there on the previous scan,
+    together with their parent's image and command line. The first scan
+    only primes the table. Events carry the process's create_time as
+    observed_at, so a process found on a later poll keeps its real start
+    time. Scan CPU time is measured; if a scan costs more than
+    SCAN_CPU_BUDGET of the interval, the interval is stretched. With lean
+    set, user and working directory are not read for new processes.
+    """
+
+    def __init__(self, interval=SCAN_INTERVAL, cpu_budget=SCAN_CPU_BUDGET):
+        self.interval = interval
+        self.cpu_budget = cpu_budget
+        self.next_interval = interval
+        self.table = {}      # (pid, create_time) -> (name, exe, cmdline)
+        self.by_pid = {}     # pid -> (pid, create_time) of the live process
+        self.primed = False
+        self.last_scan_cpu = 0.0
+        self.last_scan_seconds = 0.0
+        self.scans = 0
+        self.lean = False
+
+    def scan(self):
+        cpu_start, wall_start = time.process_time(), time.perf_counter()
+        fields = ['cmdline', 'exe'] if self.lean else ['username', 'cmdline', 'exe', 'cwd']
+        new_keys = []
+        live = set()
+        for proc in psutil.process_iter(['pid', 'ppid', 'name', 'create_time']):
+            info = proc.info
+            key = (info['pid'], info['create_time'])
+            live.add(key)
+            if key not in self.table:
+                new_keys.append((info['create_time'], proc, info))
+
+        events = []
+        # Oldest first, so a parent started in the same window is in the table before its child
+        for _, proc, info in sorted(new_keys, key=lambda item: item[0]):
+            try:
+                # Expensive fields are only read once, for processes we haven't seen
+                details = proc.as_dict(fields, ad_value=None)
+            except (psutil.NoSuchProcess, psutil.ZombieProcess):
+                continue
+            cmd = " ".join(details['cmdline']) if details['cmdline'] else ""
+            key = (info['pid'], info['create_time'])
+            self.table[key] = (info['name'], details['exe'], cmd)
+            self.by_pid[info['pid']] = key
+            if not self.primed:
+                continue
+            parent = self.table.get(self.by_pid.get(info['ppid']), (None, None, None))
+            events.append(ProcessEvent(
+                process_name=info['name'],
+                command_line=cmd,
+                user=details.get('username'),
+                pid=info['pid'],
+                ppid=info['ppid'],
+                image_path=details['exe'],
+                current_directory=details.get('cwd'),
+                parent_image=parent[1] or parent[0],
+                parent_command_line=None if self.lean else parent[2],
+                observed_at=info['create_time'],
+            ))
+
+        for key in [k for k in self.table if k not in live]:
+            del self.table[key]
+            if self.by_pid.get(key[0]) == key:
+                del self.by_pid[key[0]]
+
+        self.primed = True
+        self.scans += 1
+        self.last_scan_cpu = time.process_time() - cpu_start
+        self.last_scan_seconds = time.perf_counter() - wall_start
+        self.next_interval = max(self.interval, self.last_scan_cpu / self.cpu_budget)
+        return events
+
+
+_collector = ProcessCollector()
+
+
 def collect_logs():
-    """Simulates collecting process events"""
-    logs = []
-    # Get a few running processes
-    for proc in psutil.process_iter(['pid', 'name', 'username', 'cmdline']):
-        try:
-            pinfo = proc.info
-            cmd = " ".join(pinfo['cmdline']) if pinfo['cmdline'] else ""
-            
-            logs.append({
-                "process_name": pinfo['name'],
-                "command_line": cmd,
-                "user": pinfo['username']
-            })
-            
-            if len(logs) >= 5: break # Send in batches of 5
-        except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
-            pass
-            
-    return logs
+    """Returns process events started since the previous call"""
+    return _collector.scan()
+
+
+def start_exec_capture():
+    """Subscribe to kernel exec notifications (Linux, root only). Returns None to fall back to polling."""
+    if proc_connector is None or not proc_connector.available():
+        return None
+    try:
+        capture = proc_connector.ExecCapture(max_events=MAX_PENDING_EVENTS)
+        capture.start()
+        return capture
+    except OSError as e:
+        print(f"⚠️ Exec notifications unavailable ({e}), falling back to polling")
+        return None
+
+def make_session():
+    """One keep-alive connection to the server, reused for every upload."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=1)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.verify = False
+    return session
+
+
+def upload(session, payload):
+    """Send telemetry and logs as one gzip-compressed request. Returns the compressed size."""
+    body = gzip.compress(json.dumps(payload, separators=(",", ":")).encode("utf-8"), GZIP_LEVEL)
+    response = session.post(
+        f"{SERVER_API}/ingest",
+        data=body,
+        headers={"Content-Type": "application/json", "Content-Encoding": "gzip"},
+        timeout=10,
+    )
+    response.raise_for_status()
+    return len(body)
+
+
+def fetch_filter(session, agent_id, current):
+    """Fetch the server's pre-filter and full-fidelity flag; keeps the current filter on errors."""
+    try:
+        response = session.get(f"{SERVER_API}/agent/filter", params={"agent_id": agent_id}, timeout=5)
+        response.raise_for_status()
+        data = response.json()
+    except Exception as e:
+        print(f"⚠️ Could not refresh pre-filter: {e}")
+        return current
+    prefilter = AgentFilter(data.get("filter"), data.get("full_fidelity", False), BENIGN_SAMPLE_RATE)
+    if (prefilter.version, prefilter.full_fidelity) != (current.version, current.full_fidelity):
+        mode = "full fidelity" if prefilter.full_fidelity else f"{len(prefilter.by_image) + len(prefilter.any_image)} filter keys"
+        print(f"🧹 Pre-filter {prefilter.version} ({mode})")
+    return prefilter
+
 
 def start_monitoring():
     # 1. Check if we are already registered
@@ -126,45 +280,152 @@ def start_monitoring():
 
     # 2. Main Loop
     print("🚀 Agent started monitoring...")
+    capture = start_exec_capture()
+    if capture:
+        print("⚡ Capturing every exec via the netlink proc connector")
+    else:
+        collect_logs()  # prime the process table; only new processes are reported from here on
+        print(f"🔍 Tracking {len(_collector.table)} running processes")
+    session = make_session()
+    spool = Spool(SPOOL_FILE, SPOOL_MAX_BYTES)
+    backoff = Backoff(BACKOFF_BASE, BACKOFF_MAX)
+    if spool.backlog():
+        print(f"💾 {spool.backlog()} spooled events will be replayed")
+    budget = ResourceBudget(AGENT_CPU_BUDGET, AGENT_RSS_BUDGET_MB, BUDGET_WINDOW)
+    prefilter = AgentFilter()  # inactive until fetched: everything is shipped
+    capture_error = None  # why exec capture stopped, reported with telemetry
+    next_filter = 0
+    urgent, pending = [], []  # priority (possible rule hits) and benign events
+    next_send = time.time()
+    next_benign = time.time() + BENIGN_FLUSH_INTERVAL
     while True:
+        if time.time() >= next_filter:
+            prefilter = fetch_filter(session, config['agent_id'], prefilter)
+            next_filter = time.time() + FILTER_REFRESH_INTERVAL
+
+        if budget.check():
+            print(f"🐢 Agent using {budget.cpu_fraction * 100:.1f}% CPU, {budget.rss / 1048576:.0f} MB RSS: "
+                  f"switching to {budget.mode} mode")
+            _collector.lean = budget.lean
+            if capture:
+                capture.lean = budget.lean
+
+        if capture and not capture.is_alive():
+            print("⚠️ Exec capture thread is gone, falling back to polling")
+            capture_error = str(capture.error or "thread exited")
+            events = capture.drain()
+            capture = None
+            collect_logs()  # prime the process table, as at startup
+        elif capture:
+            events = capture.drain()
+        else:
+            events = collect_logs()
+            budget.record_scan(_collector.last_scan_seconds)
+        for event in events:
+            if prefilter.is_priority(event):
+                event.priority = True
+                urgent.append(event)
+            elif not prefilter.keep_benign():
+                continue
+            elif budget.sampling and prefilter.can_sample and random.random() >= DEGRADED_SAMPLE_RATE:
+                # Non-priority under a complete filter (sequence-step images are always priority),
+                # so detections are unaffected
+                budget.counters["sampled_out"] += 1
+            else:
+                if budget.lean and event.command_line and len(event.command_line) > LEAN_CMD_MAX:
+                    event.command_line = event.command_line[:LEAN_CMD_MAX]
+                pending.append(event)
+        if len(pending) > MAX_PENDING_EVENTS:
+            print(f"⚠️ Dropping {len(pending) - MAX_PENDING_EVENTS} oldest events (buffer full)")
+            budget.counters["dropped"] += len(pending) - MAX_PENDING_EVENTS
+            pending = pending[-MAX_PENDING_EVENTS:]
+
+        # Flush on a priority event, when enough events are pending, or when the send interval is up
+        if time.time() < next_send and not urgent and len(pending) < FLUSH_MAX_EVENTS:
+            # The capture thread blocks in recv(); the loop only wakes up to check the buffer
+            time.sleep(min(SCAN_INTERVAL, max(0, next_send - time.time())) if capture
+                       else _collector.next_interval * budget.interval_factor)
+            continue
+        now = time.time()
+        next_send = now + SEND_INTERVAL * budget.interval_factor
+
+        # Benign events ride along every BENIGN_FLUSH_INTERVAL (every flush without an active filter)
+        logs, urgent = urgent, []
+        if not prefilter.active or now >= next_benign or len(pending) >= FLUSH_MAX_EVENTS:
+            logs, pending = logs + pending, []
+            next_benign = now + BENIGN_FLUSH_INTERVAL * budget.interval_factor
+
+        # Persist first; a batch leaves the spool only once the server has acknowledged it
+        if logs:
+            spool.append([event.as_dict() for event in logs])
+        if not backoff.ready():
+            continue
+
         try:
             # Gather Telemetry
             telemetry = {
-                "agent_id": config['agent_id'],
                 "cpu": psutil.cpu_percent(),
                 "ram": psutil.virtual_memory().percent,
                 "disk": psutil.disk_usage(os.path.abspath(os.sep)).percent
             }
         except Exception as e:
             print(f"⚠️ Telemetry gathering error: {e}")
-            telemetry = {
-                "agent_id": config['agent_id'],
-                "cpu": 0,
-                "ram": 0,
-                "disk": 0
-            }
-        
-        # Gather Logs
-        logs = collect_logs()
+            telemetry = {"cpu": 0, "ram": 0, "disk": 0}
+        telemetry["agent"] = budget.report()
+        telemetry["agent"].update(spool_backlog=spool.backlog(), spool_bytes=spool.size(),
+                                  spool_evicted_events=spool.stats["evicted_events"],
+                                  spool_evicted_batches=spool.stats["evicted_batches"],
+                                  spool_rejected=spool.stats["rejected"])
+        if capture:
+            telemetry["agent"].update(execs=capture.stats["execs"], exec_missed=capture.stats["missed"],
+                                      exec_dropped=capture.stats["dropped"], exec_overruns=capture.stats["overruns"],
+                                      exec_busy_ms=round(capture.stats["busy_ms"], 1))
+        elif capture_error:
+            telemetry["agent"]["exec_error"] = capture_error
 
-        # Send Data to Server
-        try:
-            # Send Telemetry
-            requests.post(f"{SERVER_API}/telemetry", json=telemetry, timeout=5, verify=False)
-            print(f"📡 Sent Telemetry: CPU {telemetry['cpu']}%")
-
-            # Send Logs
-            if logs:
-                requests.post(f"{SERVER_API}/logs", json={"agent_id": config['agent_id'], "logs": logs}, timeout=5, verify=False)
-                print(f"📝 Sent {len(logs)} log events")
-
-        except requests.exceptions.ConnectionError:
-            print(f"❌ Connection Error: Could not reach server at {SERVER_API}.")
-            print(f"   Check your network connection and server IP.")
-        except Exception as e:
-             print(f"❌ Network Error during data transmission: {e}")
+        # Send the oldest spooled batches (at most REPLAY_BATCHES per round); telemetry rides on the first
+        for _ in range(REPLAY_BATCHES):
+            batch = spool.oldest()
+            if batch is None and telemetry is None:
+                break
+            batch_id, logs = batch if batch else (None, [])
+            try:
+                size = upload(session, {"agent_id": config['agent_id'], "telemetry": telemetry, "logs": logs})
+            except requests.exceptions.HTTPError as e:
+                if batch_id is not None and e.response.status_code in (400, 413):
+                    print(f"❌ Server rejected a batch of {len(logs)} events (HTTP {e.response.status_code}), dropping it")
+                    spool.reject(batch_id)
+                    continue
+                print(f"❌ Upload failed: {e}. Retrying in {backoff.failed():.0f}s")
+                break
+            except requests.exceptions.ConnectionError:
+                print(f"❌ Connection Error: Could not reach server at {SERVER_API}.")
+                print(f"   {spool.backlog()} events spooled; retrying in {backoff.failed():.0f}s")
+                break
+            except Exception as e:
+                print(f"❌ Network Error during data transmission: {e}. Retrying in {backoff.failed():.0f}s")
+                break
+
+            if batch_id is not None:
+                spool.ack(batch_id)
+            backoff.succeeded()
+            if telemetry is not None:
+                if capture:
+                    detail = f"{capture.stats['execs']} execs, {capture.stats['missed']} missed, {capture.stats['dropped']} dropped"
+                else:
+                    detail = f"scan {_collector.last_scan_cpu * 1000:.1f} ms CPU"
+                print(f"📡 Sent Telemetry: CPU {telemetry['cpu']}% + {len(logs)} log events ({size} bytes gzip, {detail}; "
+                      f"agent {telemetry['agent']['cpu_percent']}% CPU, {telemetry['agent']['rss_mb']} MB, {budget.mode})")
+            else:
+                print(f"💾 Replayed {len(logs)} spooled events ({spool.backlog()} left)")
+            telemetry = None
+
+        # Keep draining a backlog at a steady, jittered pace instead of all at once
+        if backoff.failures == 0 and spool.backlog():
+            next_send = time.time() + random.uniform(0.5, 1.5) * REPLAY_INTERVAL
 
-        time.sleep(10)
+        if not capture:
+            time.sleep(_collector.next_interval * budget.interval_factor)
 
 if __name__ == "__main__":
     start_monitoring()
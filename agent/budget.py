@@ -0,0 +1,112 @@
+"""
+Agent self-profiling and resource budgets.
+The agent measures its own CPU time (all threads) and resident memory and,
+when it runs over budget, steps down through cheaper modes until it fits.
+"""
+import time
+
+import psutil
+
+MODES = ("normal", "slow", "lean", "sampled")
+
+
+class ResourceBudget:
+    """Own-usage tracker with graded degradation.
+
+    Every window seconds the CPU used since the last check (as a fraction of
+    one core) and the RSS are compared with the budgets. Over budget moves
+    one level down the ladder; it takes two calm windows (under half the CPU
+    budget and 80% of the memory budget) to move one level back up:
+
+      slow     scan, send and benign-flush intervals are doubled per level
+      lean     also skip the costlier fields (user, cwd, parent command line)
+               and truncate long command lines
+      sampled  also keep only a fraction of non-priority events (only under a
+               complete pre-filter; otherwise nothing is sampled)
+    """
+
+    def __init__(self, cpu_budget=0.02, rss_budget_mb=150, window=30.0):
+        self.cpu_budget = cpu_budget
+        self.rss_budget = rss_budget_mb * 1024 * 1024
+        self.window = window
+        self.level = 0
+        self._process = psutil.Process()
+        self._last_check = time.monotonic()
+        self._last_cpu = time.process_time()
+        self._calm = 0
+        self.cpu_fraction = 0.0
+        self.rss = self._rss()
+        self.peak_rss = self.rss
+        self.scans = {"count": 0, "last_ms": 0.0, "max_ms": 0.0, "total_ms": 0.0}
+        self.counters = {"sampled_out": 0, "dropped": 0, "level_changes": 0}
+
+    def _rss(self):
+        try:
+            return self._process.memory_info().rss
+        except psutil.Error:
+            return 0
+
+    @property
+    def mode(self):
+        return MODES[self.level]
+
+    @property
+    def interval_factor(self):
+        return 2 ** self.level
+
+    @property
+    def lean(self):
+        return self.level >= 2
+
+    @property
+    def sampling(self):
+        return self.level >= 3
+
+    def record_scan(self, seconds):
+        ms = seconds * 1000
+        self.scans["count"] += 1
+        self.scans["last_ms"] = ms
+        self.scans["max_ms"] = max(self.scans["max_ms"], ms)
+        self.scans["total_ms"] += ms
+
+    def check(self):
+        """Re-evaluate once per window. Returns True when the level changed."""
+        now = time.monotonic()
+        if now - self._last_check < self.window:
+            return False
+        cpu = time.process_time()
+        self.cpu_fraction = (cpu - self._last_cpu) / (now - self._last_check)
+        self._last_check, self._last_cpu = now, cpu
+        self.rss = self._rss()
+        self.peak_rss = max(self.peak_rss, self.rss)
+
+        level = self.level
+        if self.cpu_fraction > self.cpu_budget or self.rss > self.rss_budget:
+            self._calm = 0
+            level = min(level + 1, len(MODES) - 1)
+        elif self.cpu_fraction < self.cpu_budget / 2 and self.rss < self.rss_budget * 0.8:
+            self._calm += 1
+            if self._calm >= 2:
+                self._calm = 0
+                level = max(level - 1, 0)
+        else:
+            self._calm = 0
+        if level == self.level:
+            return False
+        self.level = level
+        self.counters["level_changes"] += 1
+        return True
+
+    def report(self):
+        """Own resource usage for the telemetry payload."""
+        return {
+            "mode": self.mode,
+            "cpu_percent": round(self.cpu_fraction * 100, 2),
+            "rss_mb": round(self.rss / 1048576, 1),
+            "peak_rss_mb": round(self.peak_rss / 1048576, 1),
+            "scans": self.scans["count"],
+            "scan_ms_last": round(self.scans["last_ms"], 2),
+            "scan_ms_max": round(self.scans["max_ms"], 2),
+            "scan_ms_avg": round(self.scans["total_ms"] / self.scans["count"], 2) if self.scans["count"] else 0.0,
+            **self.counters,
+        }
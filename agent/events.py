@@ -0,0 +1,52 @@
+"""
+Compact in-memory process event for the agent.
+Collected events wait in the pending buffer (up to MAX_PENDING_EVENTS) until
+they are spooled; a __slots__ record with interned names, paths and users
+keeps that buffer small. as_dict() gives the upload format.
+"""
+
+# observed_at: when the process started (epoch seconds, UTC), not when it was uploaded
+FIELDS = ("process_name", "command_line", "user", "pid", "ppid", "image_path",
+          "current_directory", "parent_image", "parent_command_line", "observed_at")
+
+_INTERN_MAX = 20000
+_interned = {}
+
+
+def intern(value):
+    """Share one string object per distinct name/path/user (bounded, cleared when full)."""
+    if value is None:
+        return None
+    canonical = _interned.get(value)
+    if canonical is None:
+        if len(_interned) >= _INTERN_MAX:
+            _interned.clear()
+        canonical = _interned[value] = value
+    return canonical
+
+
+class ProcessEvent:
+    __slots__ = FIELDS + ("priority",)
+
+    def __init__(self, process_name=None, command_line=None, user=None, pid=None, ppid=None, image_path=None,
+                 current_directory=None, parent_image=None, parent_command_line=None, observed_at=None):
+        self.process_name = intern(process_name)
+        self.command_line = command_line
+        self.user = intern(user)
+        self.pid = pid
+        self.ppid = ppid
+        self.image_path = intern(image_path)
+        self.current_directory = intern(current_directory)
+        self.parent_image = intern(parent_image)
+        self.parent_command_line = parent_command_line
+        self.observed_at = observed_at
+        self.priority = False
+
+    def get(self, name, default=None):
+        return getattr(self, name, default)
+
+    def as_dict(self):
+        data = {name: getattr(self, name) for name in FIELDS}
+        if self.priority:
+            data["priority"] = True
+        return data
@@ -0,0 +1,74 @@
+"""
+Agent-side pre-filter pushed down from the server's detection rules.
+Events that could match a rule are flagged as priority and shipped right
+away; everything else waits for the next (larger) benign batch.
+"""
+import random
+import re
+
+# Same shapes the analyzer decodes: long base64 tokens and char-code lists
+_ENCODED = re.compile(r"[A-Za-z0-9+/]{16,}={0,2}|(?i:\[char\])\s*\d|(?:\d{2,3}\s*,\s*){4,}\d{2,3}")
+
+
+def normalize_image(value):
+    """Reduce a process path or name to a lowercase basename without '.exe' (same as the analyzer)."""
+    if not value:
+        return ""
+    name = value.strip().strip('"').replace("/", "\\").rsplit("\\", 1)[-1].lower()
+    if name.endswith(".exe"):
+        name = name[:-4]
+    return name
+
+
+class AgentFilter:
+    """Matches events against the compact filter served by /api/agent/filter.
+
+    The filter over-approximates the rule set, so a non-priority event cannot
+    produce an alert. It is inactive (every event is shipped as before) until
+    a filter has been fetched, and whenever the agent is in full-fidelity mode.
+    Benign events are only sampled when the filter is complete. When the
+    server decodes payloads, a command with an encoded-looking token on a
+    rule's image is also priority, since its keywords may be hidden inside.
+    """
+
+    def __init__(self, spec=None, full_fidelity=False, sample_rate=1.0):
+        spec = spec or {}
+        self.version = spec.get("version")
+        self.complete = bool(spec.get("complete"))
+        self.decode = bool(spec.get("decode"))
+        self.full_fidelity = full_fidelity
+        self.sample_rate = sample_rate
+        self.active = bool(spec) and not full_fidelity
+        self.any_image = []   # keyword lists of rules that apply to every image
+        self.by_image = {}    # image -> keyword lists ([] = image alone is enough)
+        for entry in spec.get("rules", []):
+            keywords = [k.lower() for k in entry.get("keywords") or []]
+            if entry.get("images"):
+                for image in entry["images"]:
+                    self.by_image.setdefault(image, []).append(keywords)
+            else:
+                self.any_image.append(keywords)
+
+    def is_priority(self, event):
+        if not self.active:
+            return False
+        candidates = list(self.any_image)
+        for image in (event.process_name, event.image_path):
+            candidates.extend(self.by_image.get(normalize_image(image), ()))
+        if not candidates:
+            return False
+        cmd = (event.command_line or "").lower()
+        if any(not keywords or any(k in cmd for k in keywords) for keywords in candidates):
+            return True
+        return self.decode and _ENCODED.search(event.command_line or "") is not None
+
+    @property
+    def can_sample(self):
+        """Non-priority events may only be sampled away when the filter covers every rule."""
+        return self.active and self.complete
+
+    def keep_benign(self):
+        """Sampling decision for a non-priority event."""
+        if not self.can_sample or self.sample_rate >= 1.0:
+            return True
+        return random.random() < self.sample_rate
@@ -0,0 +1,185 @@
+"""
+Event-driven Linux process capture via the netlink proc connector.
+The kernel multicasts a message for every exec(); we read /proc for the new
+process right away, so even sub-second `curl | bash` pipelines are seen.
+Requires root (CAP_NET_ADMIN); agent_core falls back to polling otherwise.
+"""
+import collections
+import errno
+import os
+import pwd
+import socket
+import struct
+import sys
+import threading
+import time
+
+from events import ProcessEvent
+
+NETLINK_CONNECTOR = 11
+CN_IDX_PROC = 1
+CN_VAL_PROC = 1
+NLMSG_DONE = 3
+PROC_CN_MCAST_LISTEN = 1
+PROC_CN_MCAST_IGNORE = 2
+PROC_EVENT_EXEC = 0x00000002
+
+NLMSGHDR = struct.Struct("=IHHII")      # len, type, flags, seq, pid
+CN_MSG = struct.Struct("=IIIIHH")       # idx, val, seq, ack, len, flags
+PROC_EVENT = struct.Struct("=IIQ")      # what, cpu, timestamp_ns
+EXEC_EVENT = struct.Struct("=II")       # process_pid, process_tgid
+
+
+def available():
+    return sys.platform.startswith("linux") and hasattr(socket, "AF_NETLINK")
+
+
+def _read(path):
+    try:
+        with open(path, "rb") as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def _readlink(path):
+    try:
+        return os.readlink(path)
+    except OSError:
+        return None
+
+
+def _cmdline(pid):
+    raw = _read(f"/proc/{pid}/cmdline")
+    if not raw:
+        return None
+    return raw.rstrip(b"\0").replace(b"\0", b" ").decode("utf-8", "replace")
+
+
+class ExecCapture(threading.Thread):
+    """Background thread turning kernel exec notifications into agent log events.
+
+    recv() blocks until the kernel has something for us, so an idle system
+    costs nothing. Events are kept in a bounded deque; drain() hands them to
+    the upload loop. Counters: execs seen, missed (process gone before /proc
+    could be read), overruns (kernel dropped messages, ENOBUFS), dropped
+    (oldest events pushed out of a full deque) and busy_ms (time spent
+    reading /proc). With lean set, the working directory and the parent
+    command line are not read. If the socket fails, the thread logs the
+    error, keeps it in self.error and exits; agent_core then polls instead.
+    """
+
+    def __init__(self, max_events=5000, rcvbuf=4 * 1024 * 1024):
+        super().__init__(name="proc-connector", daemon=True)
+        self.events = collections.deque(maxlen=max_events)
+        self.stats = {"execs": 0, "missed": 0, "overruns": 0, "dropped": 0, "busy_ms": 0.0}
+        self.lean = False
+        self.error = None
+        self._users = {}
+        self._sock = socket.socket(socket.AF_NETLINK, socket.SOCK_DGRAM, NETLINK_CONNECTOR)
+        self._sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, rcvbuf)
+        self._sock.bind((0, CN_IDX_PROC))  # raises PermissionError without CAP_NET_ADMIN
+        self._subscribe(PROC_CN_MCAST_LISTEN)
+
+    def _subscribe(self, op):
+        payload = struct.pack("=I", op)
+        cn_msg = CN_MSG.pack(CN_IDX_PROC, CN_VAL_PROC, 0, 0, len(payload), 0) + payload
+        header = NLMSGHDR.pack(NLMSGHDR.size + len(cn_msg), NLMSG_DONE, 0, 0, os.getpid())
+        self._sock.send(header + cn_msg)
+
+    def stop(self):
+        try:
+            self._subscribe(PROC_CN_MCAST_IGNORE)
+        finally:
+            self._sock.close()
+
+    def drain(self):
+        events = []
+        while self.events:
+            events.append(self.events.popleft())
+        return events
+
+    def run(self):
+        while True:
+            try:
+                data = self._sock.recv(65536)
+            except OSError as e:
+                if e.errno == errno.ENOBUFS:
+                    self.stats["overruns"] += 1
+                    continue
+                if e.errno == errno.EBADF:
+                    return  # stopped
+                print(f"⚠️ Exec capture stopped: {e}")
+                self.error = e
+                return
+            try:
+                self._handle(data)
+            except Exception as e:
+                print(f"⚠️ Exec capture stopped: {e}")
+                self.error = e
+                return
+
+    def _handle(self, data):
+        offset = 0
+        while offset + NLMSGHDR.size <= len(data):
+            msg_len = NLMSGHDR.unpack_from(data, offset)[0]
+            if msg_len < NLMSGHDR.size:
+                break
+            body = offset + NLMSGHDR.size + CN_MSG.size
+            if body + PROC_EVENT.size + EXEC_EVENT.size <= offset + msg_len:
+                what = PROC_EVENT.unpack_from(data, body)[0]
+                if what == PROC_EVENT_EXEC:
+                    _, tgid = EXEC_EVENT.unpack_from(data, body + PROC_EVENT.size)
+                    start = time.perf_counter()
+                    self._on_exec(tgid)
+                    self.stats["busy_ms"] += (time.perf_counter() - start) * 1000
+            offset += (msg_len + 3) & ~3  # NLMSG_ALIGN
+
+    def _user(self, uid):
+        name = self._users.get(uid)
+        if name is None:
+            try:
+                name = pwd.getpwuid(uid).pw_name
+            except KeyError:
+                name = str(uid)
+            self._users[uid] = name
+        return name
+
+    def _on_exec(self, pid):
+        self.stats["execs"] += 1
+        status = _read(f"/proc/{pid}/status")
+        cmd = _cmdline(pid)
+        if status is None or cmd is None:
+            self.stats["missed"] += 1
+            return
+        fields = dict(line.split(b":", 1) for line in status.splitlines() if b":" in line)
+        ppid = int(fields.get(b"PPid", b"0").strip() or 0)
+        uid = int(fields.get(b"Uid", b"0").split()[0])
+        lean = self.lean
+        if len(self.events) == self.events.maxlen:
+            self.stats["dropped"] += 1  # the append below pushes out the oldest event
+        self.events.append(ProcessEvent(
+            process_name=fields.get(b"Name", b"").strip().decode("utf-8", "replace"),
+            command_line=cmd,
+            user=self._user(uid),
+            pid=pid,
+            ppid=ppid,
+            image_path=_readlink(f"/proc/{pid}/exe"),
+            current_directory=None if lean else _readlink(f"/proc/{pid}/cwd"),
+            parent_image=_readlink(f"/proc/{ppid}/exe"),
+            parent_command_line=None if lean else _cmdline(ppid),
+            observed_at=time.time(),  # the exec notification arrives as the process starts
+        ))
+
+
+if __name__ == "__main__":
+    # Quick manual check: print every exec until Ctrl+C
+    capture = ExecCapture()
+    capture.start()
+    try:
+        while True:
+            time.sleep(1)
+            for event in capture.drain():
+                print(event.pid, event.ppid, event.command_line)
+    except KeyboardInterrupt:
+        print(capture.stats)
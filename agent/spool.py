@@ -0,0 +1,112 @@
+"""
+On-disk spool for agent log batches.
+Every batch is written here before it is uploaded and only deleted once the
+server has acknowledged it, so events collected while the server is
+unreachable (or across an agent restart) are replayed instead of lost.
+"""
+import gzip
+import json
+import random
+import sqlite3
+import time
+
+
+class Spool:
+    """Append-only SQLite (WAL) queue of gzip-compressed log batches.
+
+    Total size is capped at max_bytes; when a new batch would go over the
+    cap, the oldest batches are evicted first and counted in stats.
+    """
+
+    def __init__(self, path, max_bytes=50 * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS batch (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                created REAL NOT NULL,
+                events INTEGER NOT NULL,
+                size INTEGER NOT NULL,
+                body BLOB NOT NULL
+            )
+        """)
+        self.conn.commit()
+        self.stats = {"spooled": 0, "acked": 0, "evicted_batches": 0, "evicted_events": 0, "rejected": 0}
+
+    def append(self, logs):
+        """Persist a batch of events; returns its id."""
+        body = gzip.compress(json.dumps(logs, separators=(",", ":")).encode("utf-8"))
+        cursor = self.conn.execute(
+            "INSERT INTO batch (created, events, size, body) VALUES (?, ?, ?, ?)",
+            (time.time(), len(logs), len(body), body))
+        self._evict()
+        self.conn.commit()
+        self.stats["spooled"] += len(logs)
+        return cursor.lastrowid
+
+    def _evict(self):
+        total = self.size()
+        while total > self.max_bytes:
+            row = self.conn.execute("SELECT id, events, size FROM batch ORDER BY id LIMIT 1").fetchone()
+            if row is None:
+                break
+            self.conn.execute("DELETE FROM batch WHERE id = ?", (row[0],))
+            total -= row[2]
+            self.stats["evicted_batches"] += 1
+            self.stats["evicted_events"] += row[1]
+            print(f"⚠️ Spool full: evicted {row[1]} oldest events")
+
+    def oldest(self):
+        """Return (batch_id, logs) for the oldest unacknowledged batch, or None."""
+        row = self.conn.execute("SELECT id, body FROM batch ORDER BY id LIMIT 1").fetchone()
+        if row is None:
+            return None
+        return row[0], json.loads(gzip.decompress(row[1]))
+
+    def ack(self, batch_id):
+        self.conn.execute("DELETE FROM batch WHERE id = ?", (batch_id,))
+        self.conn.commit()
+        self.stats["acked"] += 1
+
+    def reject(self, batch_id):
+        """Drop a batch the server refused outright, so it can't block the queue."""
+        self.conn.execute("DELETE FROM batch WHERE id = ?", (batch_id,))
+        self.conn.commit()
+        self.stats["rejected"] += 1
+
+    def size(self):
+        return self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM batch").fetchone()[0]
+
+    def backlog(self):
+        """Number of events waiting to be acknowledged."""
+        return self.conn.execute("SELECT COALESCE(SUM(events), 0) FROM batch").fetchone()[0]
+
+
+class Backoff:
+    """Exponential backoff with full jitter between failed uploads.
+
+    The jitter spreads reconnect attempts of a whole fleet over the window
+    instead of having every agent retry on the same schedule.
+    """
+
+    def __init__(self, base=1.0, maximum=300.0):
+        self.base = base
+        self.maximum = maximum
+        self.failures = 0
+        self.retry_at = 0.0
+
+    def ready(self):
+        return time.time() >= self.retry_at
+
+    def failed(self):
+        self.failures += 1
+        delay = random.uniform(0, min(self.maximum, self.base * 2 ** self.failures))
+        self.retry_at = time.time() + delay
+        return delay
+
+    def succeeded(self):
+        self.failures = 0
+        self.retry_at = 0.0
@@ -0,0 +1,44 @@
+// Agent log rows for lotl_process_event, kept free of express/mysql so they can be tested on their own
+const LOG_COLUMNS = `(host_id, agent_id, provider, event_type, timestamp, process_name, command_line, user_name,
+             pid, ppid, image_path, current_directory, parent_image, parent_command_line)`;
+
+// Inserted verbatim by the query formatter, so the database clock is used
+const CURRENT_TIMESTAMP = { toSqlString: () => 'CURRENT_TIMESTAMP' };
+
+// Older agents send no observed_at; anything before 2000 or a day ahead is a broken clock, not an event time
+const MIN_OBSERVED_AT = 946684800;
+const MAX_CLOCK_SKEW = 86400;
+
+// When the agent saw the event (epoch seconds) as a UTC 'YYYY-MM-DD HH:MM:SS', the format
+// the bulk importer stores, so spooled events keep their collection time instead of the replay time
+const observedAt = (log, now = Date.now() / 1000) => {
+    const ts = Number(log.observed_at);
+    if (log.observed_at == null || !Number.isFinite(ts) || ts < MIN_OBSERVED_AT || ts > now + MAX_CLOCK_SKEW) {
+        return CURRENT_TIMESTAMP;
+    }
+    return new Date(Math.floor(ts) * 1000).toISOString().slice(0, 19).replace('T', ' ');
+};
+
+const logRow = (agent, log) => [
+    agent.host_id,
+    agent.agent_id,
+    'Sysmon',
+    'ProcessCreate',
+    observedAt(log),
+    log.process_name,
+    log.command_line,
+    log.user || 'SYSTEM',
+    log.pid ?? null,
+    log.ppid ?? null,
+    log.image_path ?? null,
+    log.current_directory ?? null,
+    log.parent_image ?? null,
+    log.parent_command_line ?? null
+];
+
+module.exports = {
+    LOG_COLUMNS,
+    CURRENT_TIMESTAMP,
+    observedAt,
+    logRow
+};
@@ -31,7 +31,8 @@ app.use(cors({
     origin: true, // Allow any origin (reflects request origin)
     credentials: true
 }));
-app.use(express.json());
+// Agent uploads arrive gzip-compressed (body-parser inflates them); the limit applies to the inflated body
+app.use(express.json({ limit: '10mb' }));
 
 // Session Management
 // Using MemoryStore for simplicity as we removed SQLite. 
@@ -84,6 +85,7 @@ const dbGet = async (sql, params = []) => {
 
 // Import middleware
 const { requireAuth, requireAdmin } = require('./middleware/auth');
+const { LOG_COLUMNS, logRow } = require('./ingest');
 // const { auditLog } = require('./middleware/audit'); // Kept import if needed by requireAuth implicitly or future use
 
 async function initDB() {
@@ -438,7 +440,7 @@ app.get('/api/hosts', async (req, res) => {
 app.get('/api/agents', async (req, res) => {
     try {
         const rows = await dbAll(`
-            SELECT a.agent_id, a.agent_uuid, a.agent_name, a.status, a.last_seen,
+            SELECT a.agent_id, a.agent_uuid, a.agent_name, a.status, a.last_seen, a.full_fidelity, a.self_stats,
                    h.hostname, h.ip_address, h.os_name,
                    CASE WHEN a.last_seen > NOW() - INTERVAL 60 SECOND
                         THEN 'online' ELSE 'offline' END AS connectivity_status
@@ -452,6 +454,34 @@ app.get('/api/agents', async (req, res) => {
     }
 });
 
+// 9.1a Agent pre-filter: newest rule-derived filter plus this agent's full-fidelity flag
+app.get('/api/agent/filter', async (req, res) => {
+    try {
+        const agent = await dbGet('SELECT full_fidelity FROM lotl_agent WHERE agent_uuid = ?', [req.query.agent_id || '']);
+        if (!agent) return res.status(404).json({ error: "Agent not found" });
+
+        const row = await dbGet('SELECT version, content FROM lotl_agent_filter ORDER BY created_at DESC LIMIT 1');
+        res.json({
+            full_fidelity: !!agent.full_fidelity,
+            filter: row ? JSON.parse(row.content) : null
+        });
+    } catch (err) {
+        res.status(500).json({ error: err.message });
+    }
+});
+
+// 9.1b Toggle full fidelity (every event shipped unfiltered) for an agent under investigation
+app.post('/api/agents/:id/full-fidelity', requireAuth, async (req, res) => {
+    const enabled = !!req.body.enabled;
+    try {
+        const result = await dbRun('UPDATE lotl_agent SET full_fidelity = ? WHERE agent_id = ?', [enabled, req.params.id]);
+        if (result.changes === 0) return res.status(404).json({ error: "Agent not found" });
+        res.json({ agent_id: Number(req.params.id), full_fidelity: enabled });
+    } catch (err) {
+        res.status(500).json({ error: err.message });
+    }
+});
+
 // 9.2 Connection verify — health-check for agents
 app.get('/api/connection/verify', (req, res) => {
     res.json({ status: 'ok', timestamp: new Date().toISOString(), server: 'LOTIflow' });
@@ -485,12 +515,17 @@ app.get('/api/agent/download', async (req, res) => {
 
         // Add only specific files
         zip.addLocalFile(path.join(agentFolder, 'agent_core.py'));
+        zip.addLocalFile(path.join(agentFolder, 'budget.py'));
         zip.addLocalFile(path.join(agentFolder, 'connect.py'));
+        zip.addLocalFile(path.join(agentFolder, 'events.py'));
+        zip.addLocalFile(path.join(agentFolder, 'proc_connector.py'));
         zip.addLocalFile(path.join(agentFolder, 'install.ps1'));
         zip.addLocalFile(path.join(agentFolder, 'install.py'));
+        zip.addLocalFile(path.join(agentFolder, 'prefilter.py'));
         zip.addLocalFile(path.join(agentFolder, 'requirements.txt'));
         zip.addLocalFile(path.join(agentFolder, 'simulate_attack.ps1'));
         zip.addLocalFile(path.join(agentFolder, 'simulate_attack.py'));
+        zip.addLocalFile(path.join(agentFolder, 'spool.py'));
 
         const downloadName = `LOTIflow_Agent_Installer.zip`;
         const data = zip.toBuffer();
@@ -572,6 +607,13 @@ app.post('/api/telemetry', async (req, res) => {
 });
 
 // 11. Ingest Logs
+// One multi-row INSERT per upload instead of a round trip per event
+async function insertLogs(connection, agent, logs) {
+    if (logs.length === 0) return;
+    const rows = logs.map(log => logRow(agent, log));
+    await connection.query(`INSERT INTO lotl_process_event ${LOG_COLUMNS} VALUES ?`, [rows]);
+}
+
 app.post('/api/logs', async (req, res) => {
     const { agent_id, logs } = req.body; // logs is array of event objects
     if (!logs || !Array.isArray(logs)) return res.status(400).json({ error: "Invalid logs format" });
@@ -589,27 +631,53 @@ app.post('/api/logs', async (req, res) => {
         }
 
         await connection.beginTransaction();
+        await insertLogs(connection, agent, logs);
+        await connection.commit();
+        res.json({ status: "processed", count: logs.length });
+    } catch (err) {
+        await connection.rollback();
+        res.status(500).json({ error: err.message });
+    } finally {
+        connection.release();
+    }
+});
 
-        const sql = `INSERT INTO lotl_process_event 
-            (host_id, agent_id, provider, event_type, timestamp, process_name, command_line, user_name) 
-            VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP, ?, ?, ?)`;
-
-        for (const log of logs) {
-            await connection.execute(sql, [
-                agent.host_id,
-                agent.agent_id,
-                'Sysmon',
-                'ProcessCreate',
-                log.process_name,
-                log.command_line,
-                log.user || 'SYSTEM'
-            ]);
-        }
+// 11b. Combined agent upload: heartbeat/telemetry and logs in one request and one transaction
+app.post('/api/ingest', async (req, res) => {
+    const { agent_id, telemetry, logs = [] } = req.body;
+    if (!Array.isArray(logs)) return res.status(400).json({ error: "Invalid logs format" });
 
+    const connection = await pool.getConnection();
+    let agent = null;
+    try {
+        const [agents] = await connection.execute('SELECT agent_id, host_id FROM lotl_agent WHERE agent_uuid = ?', [agent_id]);
+        agent = agents[0];
+        if (!agent) return res.status(404).json({ error: "Agent not found" });
+
+        // The agent's own CPU/RSS/scan figures, kept so agent overhead can be watched across the fleet
+        const selfStats = telemetry && telemetry.agent ? JSON.stringify(telemetry.agent) : null;
+
+        await connection.beginTransaction();
+        await connection.execute('UPDATE lotl_agent SET last_seen = CURRENT_TIMESTAMP, self_stats = COALESCE(?, self_stats) WHERE agent_id = ?',
+            [selfStats, agent.agent_id]);
+        await connection.execute('UPDATE lotl_host SET last_seen = CURRENT_TIMESTAMP WHERE host_id = ?', [agent.host_id]);
+        await insertLogs(connection, agent, logs);
         await connection.commit();
+
+        if (telemetry) {
+            const own = telemetry.agent ? ` (agent ${telemetry.agent.cpu_percent}% CPU, ${telemetry.agent.rss_mb} MB, ${telemetry.agent.mode})` : '';
+            console.log(`Telemetry from ${agent_id}: CPU ${telemetry.cpu}%, RAM ${telemetry.ram}%${own}`);
+            if (telemetry.agent && telemetry.agent.spool_evicted_events > 0) {
+                console.warn(`Agent ${agent_id} evicted ${telemetry.agent.spool_evicted_events} spooled events (spool full), ${telemetry.agent.spool_backlog} still queued`);
+            }
+            // Exec capture losses: dropped = agent queue full, overruns = kernel socket buffer full (ENOBUFS)
+            if (telemetry.agent && (telemetry.agent.exec_dropped > 0 || telemetry.agent.exec_overruns > 0)) {
+                console.warn(`Agent ${agent_id} exec capture lost events: ${telemetry.agent.exec_dropped} dropped, ${telemetry.agent.exec_overruns ?? 0} overruns`);
+            }
+        }
         res.json({ status: "processed", count: logs.length });
     } catch (err) {
-        await connection.rollback();
+        if (agent) await connection.rollback();
         res.status(500).json({ error: err.message });
     } finally {
         connection.release();
@@ -0,0 +1,25 @@
+const test = require('node:test');
+const assert = require('node:assert');
+const { observedAt, logRow, CURRENT_TIMESTAMP } = require('../ingest');
+
+const agent = { host_id: 3, agent_id: 7 };
+
+test('rows carry the time the agent observed the event', () => {
+    const row = logRow(agent, { process_name: 'sh', command_line: 'sh -c id', observed_at: 1769310000.75 });
+    assert.strictEqual(row[4], '2026-01-25 03:00:00');
+});
+
+test('missing or unusable observed_at falls back to the database clock', () => {
+    assert.strictEqual(observedAt({}), CURRENT_TIMESTAMP);
+    assert.strictEqual(observedAt({ observed_at: null }), CURRENT_TIMESTAMP);
+    assert.strictEqual(observedAt({ observed_at: 'soon' }), CURRENT_TIMESTAMP);
+    assert.strictEqual(observedAt({ observed_at: 0 }), CURRENT_TIMESTAMP);
+    assert.strictEqual(observedAt({ observed_at: 2e9 }, 1769310000), CURRENT_TIMESTAMP);
+});
+
+test('optional fields map to NULL and a missing user to SYSTEM', () => {
+    const row = logRow(agent, { process_name: 'sh', command_line: 'sh' });
+    assert.deepStrictEqual(row.slice(0, 4), [3, 7, 'Sysmon', 'ProcessCreate']);
+    assert.strictEqual(row[7], 'SYSTEM');
+    assert.deepStrictEqual(row.slice(8), [null, null, null, null, null, null]);
+});
@@ -48,6 +48,8 @@ CREATE TABLE lotl_agent (
     status VARCHAR(15) NOT NULL CHECK (status IN ('active', 'inactive')),
     last_seen DATETIME NULL,
     install_time DATETIME NULL,
+    full_fidelity BOOLEAN NOT NULL DEFAULT FALSE,
+    self_stats TEXT NULL,
     FOREIGN KEY (host_id) REFERENCES lotl_host(host_id) ON DELETE CASCADE
 ) ENGINE=InnoDB;
 
@@ -70,7 +72,7 @@ CREATE TABLE lotl_detection_rule (
     technique VARCHAR(120) NULL,
     severity_default VARCHAR(10) NOT NULL CHECK (severity_default IN ('low', 'medium', 'high', 'critical')),
     enabled BOOLEAN NOT NULL DEFAULT TRUE,
-    logic_type VARCHAR(10) NOT NULL CHECK (logic_type IN ('regex', 'keyword', 'sigma')),
+    logic_type VARCHAR(10) NOT NULL CHECK (logic_type IN ('regex', 'keyword', 'sigma', 'sequence')),
     rule_content LONGTEXT NOT NULL,
     created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
     updated_at DATETIME NULL
@@ -112,6 +114,12 @@ CREATE TABLE lotl_alert_reference (
     status VARCHAR(12) NOT NULL CHECK (status IN ('new', 'open', 'suppressed', 'closed')),
     confidence_score DECIMAL(5,2) NULL CHECK (confidence_score >= 0 AND confidence_score <= 100),
     detection_source VARCHAR(10) NOT NULL CHECK (detection_source IN ('rule', 'ml', 'hybrid')),
+    rule_set_version VARCHAR(64) NULL,
+    ai_status VARCHAR(10) NULL CHECK (ai_status IN ('pending', 'done', 'failed', 'skipped')),
+    origin VARCHAR(10) NOT NULL DEFAULT 'live' CHECK (origin IN ('live', 'retro')),
+    event_count INT UNSIGNED NOT NULL DEFAULT 1,
+    first_seen DATETIME NULL,
+    last_seen DATETIME NULL,
     FOREIGN KEY (host_id) REFERENCES lotl_host(host_id) ON DELETE CASCADE,
     FOREIGN KEY (agent_id) REFERENCES lotl_agent(agent_id) ON DELETE SET NULL,
     FOREIGN KEY (event_ref_id) REFERENCES lotl_process_event(event_id) ON DELETE SET NULL,
@@ -200,6 +208,37 @@ CREATE TABLE lotl_audit_log (
     FOREIGN KEY (user_id) REFERENCES lotl_login(login_id) ON DELETE SET NULL
 ) ENGINE=InnoDB;
 
+-- 15) lotl_analyzer_checkpoint (last event each analyzer consumer, shard or retro-hunt chunk has committed alerts for;
+--     owner/lease_expires form the shard lease when analyzer workers are sharded)
+CREATE TABLE lotl_analyzer_checkpoint (
+    consumer VARCHAR(64) PRIMARY KEY,
+    last_event_id BIGINT UNSIGNED NOT NULL DEFAULT 0,
+    owner VARCHAR(64) NULL,
+    lease_expires DATETIME NULL,
+    updated_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+) ENGINE=InnoDB;
+
+-- 16) lotl_analyzer_worker (heartbeats of sharded analyzer workers)
+CREATE TABLE lotl_analyzer_worker (
+    owner VARCHAR(64) PRIMARY KEY,
+    heartbeat DATETIME NOT NULL
+) ENGINE=InnoDB;
+
+-- 17) lotl_agent_filter (pre-filter derived by the analyzer from each rule-set version; agents fetch the newest)
+CREATE TABLE lotl_agent_filter (
+    version VARCHAR(64) PRIMARY KEY,
+    content LONGTEXT NOT NULL,
+    created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+) ENGINE=InnoDB;
+
+-- 18) lotl_retro_hunt (event range and chunking fixed by a hunt's first run, so reruns resume the same chunks)
+CREATE TABLE lotl_retro_hunt (
+    hunt_id VARCHAR(16) PRIMARY KEY,
+    first_event_id BIGINT UNSIGNED NOT NULL,
+    end_event_id BIGINT UNSIGNED NOT NULL,
+    chunks INT UNSIGNED NOT NULL,
+    created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+) ENGINE=InnoDB;
 
 -- Indexes
 CREATE INDEX idx_process_host_time ON lotl_process_event(host_id, timestamp);
@@ -240,8 +279,10 @@ INSERT INTO lotl_user_host (user_id, host_id, access_level) VALUES
 
 -- 6. Detection Rules
 INSERT INTO lotl_detection_rule (rule_name, description, technique, severity_default, logic_type, rule_content) VALUES 
-('CertUtil Download', 'Detects use of certutil.exe to download files', 'T1105', 'high', 'keyword', 'process_name:certutil.exe AND command_line:urlcache'),
-('Suspicious PowerShell', 'Detects encoded capabilities in PowerShell', 'T1059.001', 'medium', 'keyword', 'process_name:powershell.exe AND command_line:-enc');
+('CertUtil Download', 'Detects use of certutil.exe to download files', 'T1105', 'high', 'keyword', 'process_name:certutil.exe AND command_line:urlcache|split|decode'),
+('Suspicious PowerShell', 'Detects encoded capabilities in PowerShell', 'T1059.001', 'medium', 'keyword', 'process_name:powershell.exe|pwsh.exe AND command_line:-enc|-encodedcommand'),
+('Office Spawns Shell Downloader', 'Office document starts PowerShell, which starts certutil to fetch a payload', 'T1105', 'critical', 'sequence', 'process_name:winword.exe|excel.exe|powerpnt.exe -> process_name:powershell.exe|pwsh.exe|cmd.exe -> process_name:certutil.exe AND command_line:urlcache|split WITHIN 300'),
+('PowerShell Download Cradle', 'PowerShell fetching a remote script or file; also matched inside decoded -enc payloads', 'T1059.001', 'high', 'keyword', 'process_name:powershell.exe|pwsh.exe AND command_line:downloadstring|downloadfile|invoke-webrequest|net.webclient');
 
 -- 7. Process Events
 INSERT INTO lotl_process_event (host_id, agent_id, provider, event_type, timestamp, user_name, process_name, command_line) VALUES 
@@ -8,3 +8,79 @@ USE lotl_dfms;
 ALTER TABLE lotl_host 
 ADD COLUMN machine_user VARCHAR(100) NULL AFTER status,
 ADD COLUMN machine_credential TEXT NULL AFTER machine_user;
+
+-- Record which compiled rule-set version produced each alert
+ALTER TABLE lotl_alert_reference
+ADD COLUMN rule_set_version VARCHAR(64) NULL AFTER detection_source;
+
+-- AI enrichment runs asynchronously; track whether the description is final
+ALTER TABLE lotl_alert_reference
+ADD COLUMN ai_status VARCHAR(10) NULL CHECK (ai_status IN ('pending', 'done', 'failed', 'skipped')) AFTER rule_set_version;
+
+-- Durable analyzer offsets, committed together with the alerts they produced
+CREATE TABLE IF NOT EXISTS lotl_analyzer_checkpoint (
+    consumer VARCHAR(64) PRIMARY KEY,
+    last_event_id BIGINT UNSIGNED NOT NULL DEFAULT 0,
+    owner VARCHAR(64) NULL,
+    lease_expires DATETIME NULL,
+    updated_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+) ENGINE=InnoDB;
+
+-- Heartbeats of sharded analyzer workers (leases live on lotl_analyzer_checkpoint)
+CREATE TABLE IF NOT EXISTS lotl_analyzer_worker (
+    owner VARCHAR(64) PRIMARY KEY,
+    heartbeat DATETIME NOT NULL
+) ENGINE=InnoDB;
+
+-- Analysts can switch an agent to full fidelity (ship every event, no pre-filtering)
+ALTER TABLE lotl_agent
+ADD COLUMN full_fidelity BOOLEAN NOT NULL DEFAULT FALSE AFTER install_time;
+
+-- Agent pre-filters published by the analyzer, one per rule-set version
+CREATE TABLE IF NOT EXISTS lotl_agent_filter (
+    version VARCHAR(64) PRIMARY KEY,
+    content LONGTEXT NOT NULL,
+    created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+) ENGINE=InnoDB;
+
+-- Retro-hunt findings (rules re-run over historical events) are kept apart from live alerts
+ALTER TABLE lotl_alert_reference
+ADD COLUMN origin VARCHAR(10) NOT NULL DEFAULT 'live' AFTER ai_status;
+
+-- Event range and chunking of each retro-hunt, fixed by its first run so reruns resume the same chunks
+CREATE TABLE IF NOT EXISTS lotl_retro_hunt (
+    hunt_id VARCHAR(16) PRIMARY KEY,
+    first_event_id BIGINT UNSIGNED NOT NULL,
+    end_event_id BIGINT UNSIGNED NOT NULL,
+    chunks INT UNSIGNED NOT NULL,
+    created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+) ENGINE=InnoDB;
+
+-- Repeats of the same host/rule/command within the aggregation window are folded into one alert
+ALTER TABLE lotl_alert_reference
+ADD COLUMN event_count INT UNSIGNED NOT NULL DEFAULT 1 AFTER origin,
+ADD COLUMN first_seen DATETIME NULL AFTER event_count,
+ADD COLUMN last_seen DATETIME NULL AFTER first_seen;
+
+-- Sequence rules: parent-child chains such as 'a.exe -> b.exe AND command_line:x WITHIN 60'
+ALTER TABLE lotl_detection_rule
+MODIFY logic_type VARCHAR(10) NOT NULL CHECK (logic_type IN ('regex', 'keyword', 'sigma', 'sequence'));
+
+-- Agents report their own CPU, RSS, scan durations and degradation mode with each upload
+ALTER TABLE lotl_agent
+ADD COLUMN self_stats TEXT NULL AFTER full_fidelity;
+
+-- Rule-driven detection replaced the analyzer's hard-coded checks; bring the original seed rows up to
+-- what those checks matched (certutil -split/-decode, pwsh). Rows an analyst has edited are left alone.
+UPDATE lotl_detection_rule
+SET rule_content = 'process_name:certutil.exe AND command_line:urlcache|split|decode'
+WHERE rule_name = 'CertUtil Download' AND rule_content = 'process_name:certutil.exe AND command_line:urlcache';
+
+UPDATE lotl_detection_rule
+SET rule_content = 'process_name:powershell.exe|pwsh.exe AND command_line:-enc|-encodedcommand'
+WHERE rule_name = 'Suspicious PowerShell' AND rule_content = 'process_name:powershell.exe AND command_line:-enc';
+
+-- Seed rules added since the first release (init.sql creates them on fresh installs)
+INSERT IGNORE INTO lotl_detection_rule (rule_name, description, technique, severity_default, logic_type, rule_content) VALUES
+('Office Spawns Shell Downloader', 'Office document starts PowerShell, which starts certutil to fetch a payload', 'T1105', 'critical', 'sequence', 'process_name:winword.exe|excel.exe|powerpnt.exe -> process_name:powershell.exe|pwsh.exe|cmd.exe -> process_name:certutil.exe AND command_line:urlcache|split WITHIN 300'),
+('PowerShell Download Cradle', 'PowerShell fetching a remote script or file; also matched inside decoded -enc payloads', 'T1059.001', 'high', 'keyword', 'process_name:powershell.exe|pwsh.exe AND command_line:downloadstring|downloadfile|invoke-webrequest|net.webclient');
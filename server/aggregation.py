@@ -0,0 +1,79 @@
+import hashlib
+from collections import OrderedDict
+
+from cache import normalize_command
+
+
+class AlertAggregator:
+    """Sliding-window index of recent alerts keyed by (host, rule, normalized command).
+
+    A hit whose key was last seen less than window seconds ago joins that
+    alert instead of creating a new one. While the alert is still buffered
+    its count is bumped in place; once written, the bump becomes an UPDATE
+    in the next alert-sink transaction. Groups are kept in recency order and
+    evicted when they fall out of the window or the index exceeds max_groups.
+    """
+
+    def __init__(self, window=300, max_groups=50000):
+        self.window = window
+        self.max_groups = max_groups
+        self._groups = OrderedDict()  # key -> [last_seen, alert dict while buffered, alert_id once written]
+        self.stats = {"groups": 0, "merged": 0, "evicted": 0}
+
+    def __len__(self):
+        return len(self._groups)
+
+    @staticmethod
+    def key(host_id, rule_id, cmd_line):
+        digest = hashlib.sha1(normalize_command(cmd_line).encode("utf-8")).hexdigest()[:16]
+        return host_id, rule_id, digest
+
+    def _evict(self, now):
+        while self._groups:
+            key, group = next(iter(self._groups.items()))
+            if group[0] >= now - self.window and len(self._groups) <= self.max_groups:
+                break
+            del self._groups[key]
+            self.stats["evicted"] += 1
+
+    def lookup(self, key, seen):
+        """Return the [last_seen, alert, alert_id] group a hit at time seen joins, or None."""
+        self._evict(seen)
+        group = self._groups.get(key)
+        if group is None or seen - group[0] > self.window:
+            return None
+        group[0] = max(group[0], seen)
+        self._groups.move_to_end(key)
+        self.stats["merged"] += 1
+        return group
+
+    def add(self, key, seen, alert):
+        self._groups[key] = [seen, alert, None]
+        self._groups.move_to_end(key)
+        self.stats["groups"] += 1
+        self._evict(seen)
+
+    def settle(self, written):
+        """After a sink flush: bind written alerts to their ids, forget the ones that were not written.
+
+        Alerts that were spilled (or had no id) can no longer be bumped in
+        place, so their groups are dropped and the next hit starts a new alert.
+        """
+        ids = {id(alert): alert_id for alert_id, alert in written}
+        for key in list(self._groups):
+            group = self._groups[key]
+            if group[2] is not None:
+                continue
+            alert_id = ids.get(id(group[1]))
+            if alert_id:
+                group[1], group[2] = None, alert_id
+            else:
+                del self._groups[key]
+
+    def discard(self, alerts):
+        """Forget the groups of buffered alerts that will never be written (their sink lost its lease)."""
+        dropped = set(id(alert) for alert in alerts)
+        for key in list(self._groups):
+            group = self._groups[key]
+            if group[2] is None and id(group[1]) in dropped:
+                del self._groups[key]
@@ -0,0 +1,237 @@
+import json
+import os
+import time
+
+from mysql.connector import errors
+
+from sharding import LeaseLost
+
+INSERT_SQL = """
+    INSERT INTO lotl_alert_reference
+        (host_id, event_ref_id, rule_id, severity, description, timestamp, status, detection_source, rule_set_version, ai_status, origin,
+         event_count, first_seen, last_seen)
+    VALUES (%s, %s, %s, %s, %s, %s, 'new', 'rule', %s, %s, %s, %s, %s, %s)
+"""
+
+CHECKPOINT_SQL = """
+    INSERT INTO lotl_analyzer_checkpoint (consumer, last_event_id) VALUES (%s, %s)
+    ON DUPLICATE KEY UPDATE last_event_id = VALUES(last_event_id), updated_at = NOW()
+"""
+
+BUMP_SQL = """
+    UPDATE lotl_alert_reference
+    SET event_count = event_count + %s, last_seen = GREATEST(COALESCE(last_seen, %s), %s)
+    WHERE alert_id = %s
+"""
+
+LEASE_SQL = "SELECT owner FROM lotl_analyzer_checkpoint WHERE consumer = %s FOR UPDATE"
+
+AUTOINC_SQL = "SELECT @@innodb_autoinc_lock_mode"
+
+COLUMNS = ("host_id", "event_ref_id", "rule_id", "severity", "description", "timestamp", "rule_set_version", "ai_status", "origin",
+           "event_count", "first_seen", "last_seen")
+COLUMN_DEFAULTS = {"origin": "live", "event_count": 1}  # for alerts spilled before these columns existed
+
+# Errors caused by a row itself (unknown rule_id or host_id, description too long): retrying
+# cannot fix them, unlike lost connections, lock wait timeouts and deadlocks
+DATA_ERRORS = (errors.IntegrityError, errors.DataError)
+
+
+class AlertSink:
+    """Buffers alerts and writes each batch with one multi-row INSERT and one commit.
+
+    The consumer's checkpoint (the last event fully analyzed, see advance())
+    is upserted in the same transaction, so after a restart the analyzer
+    resumes exactly where its last committed alerts end.
+
+    Repeat hits folded into an already written alert (see bump()) are
+    applied as UPDATEs in the same transaction.
+
+    A flush is retried with backoff; if MySQL is still unavailable the batch
+    and its checkpoint are written to a local spill file and replayed ahead
+    of the next batch, so alerts survive a database outage or restart.
+    Alert ids are taken from lastrowid, which only numbers a multi-row
+    INSERT consecutively under innodb_autoinc_lock_mode 0 or 1; the mode is
+    checked on the first write, and under 2 (interleaved) every alert is
+    inserted on its own. If a row is rejected for its data, the batch is
+    retried row by row and
+    the rejected rows go to a dead-letter file (one JSON line each), so
+    one bad alert can't hold back the rest.
+
+    With an owner (sharded workers), the checkpoint row is locked and its
+    lease checked first; if another worker took the shard over, the batch is
+    discarded and LeaseLost raised, since the new owner re-analyzes it.
+    """
+
+    def __init__(self, connect, spill_path, consumer="analyzer", max_batch=500, max_delay=2.0, retries=3, owner=None):
+        self._connect = connect
+        self.spill_path = spill_path
+        self.dead_letter_path = spill_path + ".rejected"
+        self.consumer = consumer
+        self.owner = owner
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.retries = retries
+        self._buffer = []
+        self._bumps = {}        # alert_id -> [extra events, last seen]
+        self._first_added = None
+        self.position = None    # last event id whose alerts are all buffered
+        self.committed = None   # last checkpoint known to be durable
+        self.consecutive_ids = None  # whether multi-row INSERTs get consecutive ids; checked on first write
+        self.stats = {"written": 0, "flushes": 0, "spilled": 0, "dead_lettered": 0}
+
+    def __len__(self):
+        return len(self._buffer) + len(self._bumps)
+
+    def _touch(self):
+        if not self._buffer and not self._bumps:
+            self._first_added = time.time()
+
+    def add(self, alert):
+        """Queue an alert dict (COLUMNS plus any extra keys the caller needs back)."""
+        self._touch()
+        self._buffer.append(alert)
+
+    def bump(self, alert_id, last_seen, count=1):
+        """Add count repeat events, last seen at last_seen, to an alert that is already written."""
+        self._touch()
+        bump = self._bumps.setdefault(alert_id, [0, last_seen])
+        bump[0] += count
+        bump[1] = max(bump[1], last_seen)
+
+    def advance(self, event_id):
+        """Mark every alert for events up to event_id as buffered."""
+        self.position = event_id
+
+    def should_flush(self):
+        if not len(self):
+            return False
+        return len(self) >= self.max_batch or time.time() - self._first_added >= self.max_delay
+
+    def _read_spill(self):
+        if not os.path.exists(self.spill_path):
+            return {}
+        with open(self.spill_path, "r") as f:
+            return json.load(f)
+
+    def load_spill(self):
+        """Return (alerts, checkpoint) left over from a failed flush."""
+        spill = self._read_spill()
+        return spill.get("alerts", []), spill.get("checkpoint")
+
+    def _write_spill(self, alerts, bumps, checkpoint):
+        tmp_path = self.spill_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"consumer": self.consumer, "checkpoint": checkpoint, "alerts": alerts,
+                       "bumps": [[alert_id, count, last_seen] for alert_id, (count, last_seen) in bumps.items()]}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.spill_path)
+
+    def _dead_letter(self, rejected):
+        with open(self.dead_letter_path, "a") as f:
+            for alert, error in rejected:
+                f.write(json.dumps({"consumer": self.consumer, "error": str(error), "alert": alert}, default=str) + "\n")
+        self.stats["dead_lettered"] += len(rejected)
+        print(f"Dead-lettered {len(rejected)} rejected alerts to {self.dead_letter_path}")
+
+    def _write(self, alerts, bumps, checkpoint, per_row=False):
+        """Write one transaction; returns (alert ids in alerts order, [(alert, error)] rejected).
+
+        per_row inserts alerts one statement at a time: a row rejected for its
+        data only rolls back its own statement, so it is set aside with a None
+        id and the others still commit.
+        """
+        conn = self._connect()
+        cursor = conn.cursor()
+        if self.consecutive_ids is None:
+            cursor.execute(AUTOINC_SQL)
+            row = cursor.fetchone()
+            self.consecutive_ids = bool(row) and row[0] in (0, 1)
+            if not self.consecutive_ids:
+                print(f"innodb_autoinc_lock_mode is {row[0] if row else 'unknown'}: inserting alerts one row at a time")
+        try:
+            if self.owner is not None:
+                cursor.execute(LEASE_SQL, (self.consumer,))
+                row = cursor.fetchone()
+                if not row or row[0] != self.owner:
+                    raise LeaseLost(self.consumer)
+            rows = [tuple(a.get(c, COLUMN_DEFAULTS.get(c)) for c in COLUMNS) for a in alerts]
+            ids, rejected = [], []
+            if per_row or not self.consecutive_ids:
+                for alert, row in zip(alerts, rows):
+                    try:
+                        cursor.execute(INSERT_SQL, row)
+                        ids.append(cursor.lastrowid)
+                    except DATA_ERRORS as e:
+                        ids.append(None)
+                        rejected.append((alert, e))
+            elif alerts:
+                cursor.executemany(INSERT_SQL, rows)
+                # A multi-row INSERT gets consecutive auto-increment ids
+                # (lock mode checked above), starting at lastrowid.
+                ids = [cursor.lastrowid + i for i in range(len(alerts))]
+            if bumps:
+                cursor.executemany(BUMP_SQL, [(count, last_seen, last_seen, alert_id)
+                                              for alert_id, (count, last_seen) in bumps.items()])
+            if checkpoint is not None:
+                cursor.execute(CHECKPOINT_SQL, (self.consumer, checkpoint))
+            conn.commit()
+            return ids, rejected
+        except Exception:
+            try:
+                conn.rollback()
+            except Exception:
+                pass
+            raise
+
+    def flush(self):
+        """Write spilled and buffered alerts plus the checkpoint. Returns [(alert_id, alert)] written."""
+        spill = self._read_spill()
+        spilled, spilled_checkpoint = spill.get("alerts", []), spill.get("checkpoint")
+        for alert_id, count, last_seen in spill.get("bumps", []):
+            self.bump(alert_id, last_seen, count)
+        alerts, bumps = spilled + self._buffer, self._bumps
+        self._buffer, self._bumps = [], {}
+        checkpoint = self.position if self.position is not None else spilled_checkpoint
+        if not alerts and not bumps and checkpoint == self.committed:
+            return []
+
+        delay, attempt, per_row = 0.5, 0, False
+        while True:
+            try:
+                ids, rejected = self._write(alerts, bumps, checkpoint, per_row)
+                break
+            except LeaseLost as e:
+                if os.path.exists(self.spill_path):
+                    os.remove(self.spill_path)
+                e.discarded = alerts
+                raise
+            except DATA_ERRORS as e:
+                if not per_row:
+                    print(f"Alert Flush Error: {e}; retrying row by row")
+                    per_row = True
+                    continue
+                error = e  # not from an alert row; retry it like any other failure
+            except Exception as e:
+                error = e
+            attempt += 1
+            print(f"Alert Flush Error (attempt {attempt}/{self.retries}): {error}")
+            if attempt >= self.retries:
+                self._write_spill(alerts, bumps, checkpoint)
+                self.stats["spilled"] += len(alerts) - len(spilled)
+                print(f"Spilled {len(alerts)} alerts to {self.spill_path}")
+                return []
+            time.sleep(delay)
+            delay *= 2
+
+        if rejected:
+            self._dead_letter(rejected)
+
+        if spill:
+            os.remove(self.spill_path)
+            print(f"Replayed {len(spilled)} spilled alerts")
+        self.committed = checkpoint
+        self.stats["written"] += len(alerts) - len(rejected)
+        self.stats["flushes"] += 1
+        return [(alert_id, alert) for alert_id, alert in zip(ids, alerts) if alert_id is not None]
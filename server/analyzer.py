@@ -1,11 +1,28 @@
+import argparse
+import hashlib
 import json
+import multiprocessing
+import socket
 import sys
 import os
 import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
 import requests
 import mysql.connector
 from datetime import datetime
 
+from aggregation import AlertAggregator
+from alert_sink import AlertSink
+from cache import ExplanationCache, LRUCache
+from deobfuscate import Deobfuscator
+from detect_pool import DetectionPool
+from enrichment import UPDATE_SQL as ENRICHMENT_UPDATE_SQL, EnrichmentQueue
+from events import ProcessEvent
+from metrics import Registry, log_json, start_http_server
+from process_tree import ProcessTree
+from rule_engine import DEFAULT_RULES, RuleSet, RuleWatcher, load_rule_rows
+from sharding import LeaseLost, ShardLeases
+
 # DB Configuration
 DB_CONFIG = {
     'host': os.environ.get('DB_HOST', 'db'),
@@ -16,43 +33,256 @@ DB_CONFIG = {
 
 OLLAMA_HOST = os.environ.get('OLLAMA_HOST', 'http://ollama:11434')
 OLLAMA_MODEL = os.environ.get('OLLAMA_MODEL', 'llama3')
+OLLAMA_TIMEOUT = float(os.environ.get('OLLAMA_TIMEOUT', '10'))
+EXPLAIN_CACHE_SIZE = int(os.environ.get('EXPLAIN_CACHE_SIZE', '10000'))
+EXPLAIN_CACHE_TTL = float(os.environ.get('EXPLAIN_CACHE_TTL', '86400'))
+EXPLAIN_CACHE_DB = os.environ.get('EXPLAIN_CACHE_DB')  # optional SQLite file for a persistent tier
+EXPLAIN_CACHE_DB_ROWS = int(os.environ.get('EXPLAIN_CACHE_DB_ROWS', '100000'))  # row cap of that file
+RULE_RELOAD_INTERVAL = float(os.environ.get('RULE_RELOAD_INTERVAL', '30'))
+ENRICH_WORKERS = int(os.environ.get('ENRICH_WORKERS', '4'))
+ENRICH_QUEUE_SIZE = int(os.environ.get('ENRICH_QUEUE_SIZE', '500'))
+ENRICH_BATCH_SIZE = int(os.environ.get('ENRICH_BATCH_SIZE', '10'))
+ID_CACHE_SIZE = int(os.environ.get('ID_CACHE_SIZE', '50000'))
+ALERT_BATCH_SIZE = int(os.environ.get('ALERT_BATCH_SIZE', '500'))
+ALERT_FLUSH_INTERVAL = float(os.environ.get('ALERT_FLUSH_INTERVAL', '2'))
+FETCH_BATCH_SIZE = int(os.environ.get('FETCH_BATCH_SIZE', '2000'))
+CATCHUP_BATCH_SIZE = int(os.environ.get('CATCHUP_BATCH_SIZE', '10000'))
+ANALYZER_CONSUMER = os.environ.get('ANALYZER_CONSUMER', 'analyzer')
+POLL_MIN_INTERVAL = float(os.environ.get('POLL_MIN_INTERVAL', '0.5'))
+POLL_MAX_INTERVAL = float(os.environ.get('POLL_MAX_INTERVAL', '5'))
+DETECT_PROCESSES = int(os.environ.get('DETECT_PROCESSES', '0'))  # 0 = detect in the main process
+DETECT_CHUNK_SIZE = int(os.environ.get('DETECT_CHUNK_SIZE', '500'))
+DETECT_POOL_MIN_BATCH = int(os.environ.get('DETECT_POOL_MIN_BATCH', '1000'))
+ALERT_SPILL_PATH = os.environ.get('ALERT_SPILL_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'alert_spill.json'))
+LEASE_TTL = int(os.environ.get('LEASE_TTL', '30'))
+ALERT_AGGREGATION_WINDOW = float(os.environ.get('ALERT_AGGREGATION_WINDOW', '300'))  # 0 = one alert per hit
+ALERT_AGGREGATION_GROUPS = int(os.environ.get('ALERT_AGGREGATION_GROUPS', '50000'))
+PROCESS_TREE_MAX_NODES = int(os.environ.get('PROCESS_TREE_MAX_NODES', '200000'))
+PROCESS_TREE_TTL = float(os.environ.get('PROCESS_TREE_TTL', '3600'))
+RETRO_CHUNKS_PER_WORKER = int(os.environ.get('RETRO_CHUNKS_PER_WORKER', '4'))
+DEOBFUSCATE_MAX_DEPTH = int(os.environ.get('DEOBFUSCATE_MAX_DEPTH', '3'))  # 0 = only match the raw command line
+DEOBFUSCATE_CACHE_SIZE = int(os.environ.get('DEOBFUSCATE_CACHE_SIZE', '20000'))
+DECODED_TEXT_MAX = 2000  # decoded text kept in the alert description
+METRICS_PORT = int(os.environ.get('METRICS_PORT', '9108'))  # 0 = no HTTP endpoint; shard workers use port + index
+METRICS_ADDR = os.environ.get('METRICS_ADDR', '127.0.0.1')  # 0.0.0.0 to be scraped from outside the container (docker-compose does)
+METRICS_LOG_INTERVAL = float(os.environ.get('METRICS_LOG_INTERVAL', '60'))  # 0 = no JSON metrics log lines
+
+# Only the columns detection needs, in ProcessEvent slot order; raw_event JSON stays in the database.
+EVENT_COLUMNS = ", ".join("h.hostname" if name == "hostname" else f"e.{name}" for name in ProcessEvent.__slots__)
+
+
+class PollScheduler:
+    """Adaptive polling delay: no wait after a full page, exponential backoff when idle."""
+
+    def __init__(self, min_interval=0.5, max_interval=5.0):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.delay = min_interval
+
+    def next_delay(self, fetched, limit):
+        if fetched >= limit:
+            self.delay = self.min_interval
+            return 0  # more is waiting; fetch the next page immediately
+        if fetched:
+            self.delay = self.min_interval
+            return self.delay
+        delay, self.delay = self.delay, min(self.max_interval, self.delay * 2)
+        return delay
+
 
 class LogAnalyzer:
-    def __init__(self):
+    def __init__(self, connect=None):
+        self.connect = connect or (lambda: mysql.connector.connect(**DB_CONFIG))  # benchmarks pass a stand-in
         self.db_conn = None
+        self.enrichment = None  # set by main(); None means enrich inline
+        self.detect_pool = None  # set by main(); None means match in this process
+        self.origin = "live"  # "retro" for retro-hunt workers: alerts are tagged and not AI-enriched
+        self.explanations = ExplanationCache(EXPLAIN_CACHE_SIZE, EXPLAIN_CACHE_TTL, EXPLAIN_CACHE_DB, EXPLAIN_CACHE_DB_ROWS)
+        self.host_ids = LRUCache(ID_CACHE_SIZE)  # hostname -> host_id
+        self.rule_ids = LRUCache(ID_CACHE_SIZE)  # rule_name -> rule_id
+        self.deobfuscator = Deobfuscator(DEOBFUSCATE_CACHE_SIZE, DEOBFUSCATE_MAX_DEPTH) if DEOBFUSCATE_MAX_DEPTH > 0 else None
+        self.tree = ProcessTree(PROCESS_TREE_MAX_NODES, PROCESS_TREE_TTL)  # only fed while sequence rules exist
+        self.aggregator = AlertAggregator(ALERT_AGGREGATION_WINDOW, ALERT_AGGREGATION_GROUPS) if ALERT_AGGREGATION_WINDOW > 0 else None
+        self.alerts = AlertSink(self.live_conn, ALERT_SPILL_PATH, ANALYZER_CONSUMER, ALERT_BATCH_SIZE, ALERT_FLUSH_INTERVAL)
+        self.register_metrics()
         self.connect_db()
+        self.warm_id_caches()
+        self.rules = RuleSet.from_rows(self.load_rule_rows())
+        print(f"Loaded {len(self.rules)} detection rules (version {self.rules.version})")
+
+    def register_metrics(self):
+        """Stage timings are observed once per page, flush or LLM call; everything else is read at scrape time."""
+        self.metrics = registry = Registry()
+        self.stage = {stage: registry.histogram("analyzer_stage_seconds", "Time spent per stage call "
+                                                "(fetch: one page, detect: one page, persist: one flush, enrich: one LLM call)",
+                                                stage=stage)
+                      for stage in ("fetch", "detect", "persist", "enrich")}
+        self.events_total = registry.counter("analyzer_events", "Events analyzed")
+        self.last_event_id = registry.gauge("analyzer_last_event_id", "Last event_id analyzed")
+        self.backlog_events = registry.gauge("analyzer_backlog_events", "Events stored but not yet analyzed")
+        self.backlog_seconds = registry.gauge("analyzer_backlog_seconds", "Age of the last analyzed event when it was analyzed")
+        self.fetch_errors = registry.counter("analyzer_fetch_errors", "Failed event or MAX(event_id) queries")
+        self.fetch_failed = False  # the last query failed, so the backlog gauges are left at their last value
+        caches = {"host_ids": self.host_ids, "rule_ids": self.rule_ids}
+        if self.deobfuscator is not None:
+            caches["deobfuscate"] = self.deobfuscator.cache
+        for name, cache in caches.items():
+            registry.gauge("analyzer_cache_hit_ratio", "Hit ratio of in-process caches",
+                           fn=lambda c=cache: c.hits / (c.hits + c.misses) if c.hits + c.misses else 0.0, cache=name)
+        registry.gauge("analyzer_cache_hit_ratio", "Hit ratio of in-process caches",
+                       fn=self.explanations.hit_rate, cache="explanations")
+        registry.stats("analyzer_alert_sink", "Alert sink counters", lambda: self.alerts.stats)
+        registry.stats("analyzer_explain_cache", "LLM explanation cache counters", lambda: self.explanations.stats)
+        registry.stats("analyzer_enrichment", "Enrichment queue counters",
+                       lambda: dict(self.enrichment.stats, pending=self.enrichment.pending()) if self.enrichment else {})
+        registry.stats("analyzer_aggregation", "Alert aggregation counters", lambda: self.aggregator and self.aggregator.stats)
+        registry.stats("analyzer_process_tree", "Process-tree index counters", lambda: dict(self.tree.stats, nodes=len(self.tree)))
+        registry.stats("analyzer_deobfuscate", "Payload decoder counters", lambda: self.deobfuscator and self.deobfuscator.stats)
+        registry.stats("analyzer_detect_pool", "Detection pool counters", lambda: self.detect_pool and self.detect_pool.stats)
+        self._next_metrics_log = time.time() + METRICS_LOG_INTERVAL
+
+    def record_lag(self, events, limit):
+        """Update the backlog gauges after a page; MAX(event_id) is only queried when the page was full.
+
+        An empty page from a failed fetch says nothing about the backlog, so
+        the gauges keep their last value (the failure is counted in
+        analyzer_fetch_errors_total).
+        """
+        if self.fetch_failed:
+            return
+        if not events:
+            self.backlog_events.set(0)
+            return
+        last = events[-1]
+        if isinstance(last.timestamp, datetime):
+            self.backlog_seconds.set(max(0.0, (datetime.now() - last.timestamp).total_seconds()))
+        if len(events) < limit:
+            self.backlog_events.set(0)
+            return
+        high = self.get_max_event_id()
+        if not self.fetch_failed:
+            self.backlog_events.set(max(0, high - last.event_id))
+
+    def _fetch_result(self, error=None):
+        """Note whether the last event query failed, counting failures."""
+        self.fetch_failed = error is not None
+        if error is not None:
+            self.fetch_errors.inc()
+
+    def log_metrics(self, force=False):
+        """Emit the metrics snapshot as one JSON log line every METRICS_LOG_INTERVAL seconds."""
+        if METRICS_LOG_INTERVAL <= 0 or (not force and time.time() < self._next_metrics_log):
+            return
+        self._next_metrics_log = time.time() + METRICS_LOG_INTERVAL
+        log_json("metrics", consumer=self.alerts.consumer, **self.metrics.snapshot())
 
     def connect_db(self):
         try:
-            self.db_conn = mysql.connector.connect(**DB_CONFIG)
+            self.db_conn = self.connect()
             print("Connected to MySQL Database")
         except Exception as e:
             print(f"DB Error: {e}")
             self.db_conn = None
 
-    def ask_ollama(self, cmd_line, rule_name):
+    def live_conn(self):
+        if not self.db_conn or not self.db_conn.is_connected():
+            self.connect_db()
+        if not self.db_conn:
+            raise ConnectionError("MySQL unavailable")
+        return self.db_conn
+
+    def warm_id_caches(self):
+        """Prime the hostname/rule_name -> id maps with one bulk query each."""
+        if not self.db_conn: return
+        try:
+            cursor = self.db_conn.cursor()
+            cursor.execute("SELECT hostname, host_id FROM lotl_host ORDER BY last_seen DESC LIMIT %s", (ID_CACHE_SIZE,))
+            for hostname, host_id in cursor.fetchall():
+                self.host_ids.put(hostname, host_id)
+            cursor.execute("SELECT rule_name, rule_id FROM lotl_detection_rule")
+            for rule_name, rule_id in cursor.fetchall():
+                self.rule_ids.put(rule_name, rule_id)
+            self.db_conn.commit()
+            print(f"ID caches warmed: {len(self.host_ids)} hosts, {len(self.rule_ids)} rules")
+        except Exception as e:
+            print(f"ID Cache Warm Error: {e}")
+
+    def load_rule_rows(self):
+        """Fetch enabled rules, falling back to the built-in set if none are available."""
+        if self.db_conn:
+            try:
+                rows = load_rule_rows(self.db_conn)
+                if rows:
+                    return rows
+            except Exception as e:
+                print(f"Rule Load Error: {e}")
+        print("No rules in database, using built-in defaults")
+        return DEFAULT_RULES
+
+    def swap_rules(self, rule_set):
+        """Install a new rule snapshot; in-flight events keep the one they started with."""
+        if rule_set.version == self.rules.version:
+            return
+        print(f"Rules reloaded: {self.rules.version} -> {rule_set.version} ({len(rule_set)} rules)")
+        for rule in rule_set.rules:
+            if rule.rule_id is not None:
+                self.rule_ids.put(rule.name, rule.rule_id)
+        self.rules = rule_set
+        self.publish_agent_filter(rule_set)
+
+    def publish_agent_filter(self, rule_set):
+        """Store the agent pre-filter for a rule version; the backend serves the newest one to agents."""
+        spec = rule_set.agent_filter()
+        spec["decode"] = self.deobfuscator is not None  # agents then also prioritize encoded-looking commands
+        try:
+            conn = self.connect()
+            try:
+                cursor = conn.cursor()
+                cursor.execute("INSERT INTO lotl_agent_filter (version, content) VALUES (%s, %s) "
+                               "ON DUPLICATE KEY UPDATE created_at = NOW()",
+                               (rule_set.version, json.dumps(spec)))
+                conn.commit()
+            finally:
+                conn.close()
+        except Exception as e:
+            print(f"Agent Filter Publish Error: {e}")
+
+    def request_ollama(self, cmd_line, rule_name):
+        """Ask the LLM to explain a hit; raises on connection or HTTP errors."""
         prompt = f"Analyze this suspicious command detected by rule '{rule_name}':\n\nCommand: {cmd_line}\n\nExplain briefly (in 1-2 sentences) why this is dangerous and what the attacker might be trying to do."
+        response = requests.post(f"{OLLAMA_HOST}/api/generate", json={"model": OLLAMA_MODEL, "prompt": prompt, "stream": False}, timeout=OLLAMA_TIMEOUT)
+        if response.status_code != 200:
+            raise RuntimeError(f"AI Error: {response.status_code}")
+        return response.json().get("response", "No analysis provided.")
+
+    def explain(self, cmd_line, rule_name):
+        """Cached request_ollama: repeats of the same tooling across hosts reuse one answer."""
+        def compute():
+            with self.stage["enrich"].time():
+                return self.request_ollama(cmd_line, rule_name)
+        return self.explanations.get_or_compute(rule_name, cmd_line, OLLAMA_MODEL, compute)
+
+    def ask_ollama(self, cmd_line, rule_name):
         try:
-            response = requests.post(f"{OLLAMA_HOST}/api/generate", json={"model": OLLAMA_MODEL, "prompt": prompt, "stream": False}, timeout=10)
-            if response.status_code == 200:
-                result = response.json()
-                return result.get("response", "No analysis provided.")
-            return f"AI Error: {response.status_code}"
+            return self.explain(cmd_line, rule_name)
+        except RuntimeError as e:
+            return str(e)
         except Exception as e:
             return f"AI Connection Failed: {str(e)}"
 
     def get_or_create_host(self, hostname):
+        host_id = self.host_ids.get(hostname)
+        if host_id is not None: return host_id
         if not self.db_conn: return None
         cursor = self.db_conn.cursor()
         try:
-            # Check exist
-            cursor.execute("SELECT host_id FROM lotl_host WHERE hostname = %s", (hostname,))
-            res = cursor.fetchone()
-            if res: return res[0]
-            
-            # Create
-            cursor.execute("INSERT INTO lotl_host (hostname, environment, criticality, status) VALUES (%s, 'lab', 'medium', 'active')", (hostname,))
+            # Race-safe upsert: LAST_INSERT_ID(host_id) makes lastrowid the existing id on conflict
+            cursor.execute("""
+                INSERT INTO lotl_host (hostname, environment, criticality, status) VALUES (%s, 'lab', 'medium', 'active')
+                ON DUPLICATE KEY UPDATE host_id = LAST_INSERT_ID(host_id)
+            """, (hostname,))
             self.db_conn.commit()
+            self.host_ids.put(hostname, cursor.lastrowid)
             return cursor.lastrowid
         except Exception as e:
             print(f"Host ID Error: {e}")
@@ -60,136 +290,687 @@ class LogAnalyzer:
             return None
 
     def get_or_create_rule(self, rule_name):
+        rule_id = self.rule_ids.get(rule_name)
+        if rule_id is not None: return rule_id
         if not self.db_conn: return None
         cursor = self.db_conn.cursor()
         try:
-            cursor.execute("SELECT rule_id FROM lotl_detection_rule WHERE rule_name = %s", (rule_name,))
-            res = cursor.fetchone()
-            if res: return res[0]
-            
-            # Create default
-            cursor.execute("INSERT INTO lotl_detection_rule (rule_name, severity_default, logic_type, rule_content) VALUES (%s, 'high', 'keyword', 'auto-generated')", (rule_name,))
+            # Create default, or pick up the existing row's id
+            cursor.execute("""
+                INSERT INTO lotl_detection_rule (rule_name, severity_default, logic_type, rule_content) VALUES (%s, 'high', 'keyword', 'auto-generated')
+                ON DUPLICATE KEY UPDATE rule_id = LAST_INSERT_ID(rule_id)
+            """, (rule_name,))
             self.db_conn.commit()
+            self.rule_ids.put(rule_name, cursor.lastrowid)
             return cursor.lastrowid
         except Exception as e:
             print(f"Rule ID Error: {e}")
             return None
 
-    def save_alert(self, hostname, rule_name, severity, details, ai_analysis):
-        if not self.db_conn or not self.db_conn.is_connected():
-            self.connect_db()
-        
-        if self.db_conn:
-            try:
-                host_id = self.get_or_create_host(hostname)
-                rule_id = self.get_or_create_rule(rule_name)
-                
-                if not host_id or not rule_id:
-                    print("Failed to resolve IDs for Host/Rule")
-                    return
-
-                cursor = self.db_conn.cursor()
-                full_desc = f"{details}\n\nAI Analysis: {ai_analysis}"
-                
-                sql = "INSERT INTO lotl_alert_reference (host_id, rule_id, severity, description, timestamp, status, detection_source) VALUES (%s, %s, %s, %s, NOW(), 'new', 'rule')"
-                val = (host_id, rule_id, severity.lower(), full_desc)
-                cursor.execute(sql, val)
-                self.db_conn.commit()
-                print(f"Saved Alert: {rule_name} for {hostname}")
-            except Exception as e:
-                print(f"Failed to save alert: {e}")
+    def skip_enrichment(self, alerts):
+        """Mark [(alert_id, alert)] 'skipped' and replace their "AI Analysis: Pending" text, in one executemany."""
+        if not alerts:
+            return
+        try:
+            cursor = self.db_conn.cursor()
+            cursor.executemany(ENRICHMENT_UPDATE_SQL, [
+                (f"{alert['command_line']}\n\nAI Analysis: Skipped (enrichment queue full)", "skipped", alert_id)
+                for alert_id, alert in alerts])
+            self.db_conn.commit()
+        except Exception as e:
+            print(f"Failed to update AI status: {e}")
 
-    def analyze_log(self, log_entry):
+    def resubmit_pending(self):
+        """Re-enqueue alerts a restart or crash left 'pending' (up to the queue size; the rest wait for the next start)."""
+        if self.enrichment is None:
+            return 0
         try:
-            # DB returns tuple/dict depending on cursor. We'll fetch as dict.
-            process = log_entry.get("process_name") or ""
-            cmd_line = log_entry.get("command_line") or ""
-            hostname = log_entry.get("hostname") or "Unknown-Host"
-            
-            process_lower = process.lower()
-            cmd_line_lower = cmd_line.lower()
-
-            # Rule 1: CertUtil
-            if "certutil" in process_lower and any(x in cmd_line_lower for x in ["urlcache", "split", "decode"]):
-                print(f"DETECTED: CertUtil Abuse on {hostname}")
-                ai_explanation = self.ask_ollama(cmd_line, "CertUtil Abuse")
-                self.save_alert(hostname, "CertUtil Download", "HIGH", cmd_line, ai_explanation)
-                return "ALERT: CertUtil"
-
-            # Rule 2: PowerShell Encoded
-            if ("powershell" in process_lower or "pwsh" in process_lower) and any(x in cmd_line_lower for x in ["-enc", "-encodedcommand"]):
-                print(f"DETECTED: Suspicious PowerShell on {hostname}")
-                ai_explanation = self.ask_ollama(cmd_line, "Suspicious PowerShell")
-                self.save_alert(hostname, "Suspicious PowerShell", "MEDIUM", cmd_line, ai_explanation)
-                return "ALERT: PowerShell"
+            cursor = self.live_conn().cursor()
+            cursor.execute("""
+                SELECT a.alert_id, a.description, r.rule_name
+                FROM lotl_alert_reference a JOIN lotl_detection_rule r ON r.rule_id = a.rule_id
+                WHERE a.ai_status = 'pending' ORDER BY a.alert_id LIMIT %s
+            """, (ENRICH_QUEUE_SIZE,))
+            rows = cursor.fetchall()
+            self.db_conn.commit()
+        except Exception as e:
+            print(f"Pending Alert Load Error: {e}")
+            return 0
+        deadline, submitted = self.enrichment.deadline(), 0
+        for alert_id, description, rule_name in rows:
+            details = (description or "").rsplit("\n\nAI Analysis:", 1)[0]
+            if not self.enrichment.submit(alert_id, details, rule_name, details, deadline):
+                break
+            submitted += 1
+        if submitted:
+            print(f"Re-queued {submitted} alerts still pending AI analysis")
+        return submitted
+
+    def report_hit(self, hostname, rule, cmd_line, rule_set_version, host_id=None, event_id=None, event_time=None):
+        """Queue an alert for the next group commit; AI analysis follows asynchronously when a pool is running.
+
+        Repeats of the same (host, rule, normalized command) within the
+        aggregation window only raise the existing alert's event_count.
+        """
+        host_id = host_id or self.get_or_create_host(hostname)
+        rule_id = rule.rule_id or self.get_or_create_rule(rule.name)
+        if not host_id or not rule_id:
+            print("Failed to resolve IDs for Host/Rule")
+            return
+
+        if not isinstance(event_time, datetime):
+            event_time = datetime.now()
+        seen = event_time.strftime("%Y-%m-%d %H:%M:%S")
+        if self.aggregator is not None:
+            key = self.aggregator.key(host_id, rule_id, cmd_line)
+            group = self.aggregator.lookup(key, event_time.timestamp())
+            if group is not None:
+                _, alert, alert_id = group
+                if alert_id is None:
+                    alert["event_count"] += 1
+                    alert["last_seen"] = max(alert["last_seen"], seen)
+                else:
+                    self.alerts.bump(alert_id, seen)
+                return
+
+        if self.origin == "retro":
+            # Historical findings can number in the thousands; they are not sent to the LLM
+            description, ai_status = f"{cmd_line}\n\nRetro-hunt finding", "skipped"
+        elif self.enrichment is None:
+            description, ai_status = f"{cmd_line}\n\nAI Analysis: {self.ask_ollama(cmd_line, rule.name)}", "done"
+        else:
+            description, ai_status = f"{cmd_line}\n\nAI Analysis: Pending", "pending"
+        alert = {
+            "host_id": host_id,
+            "event_ref_id": event_id,
+            "rule_id": rule_id,
+            "severity": rule.severity,
+            "description": description,
+            "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "rule_set_version": rule_set_version,
+            "ai_status": ai_status,
+            "origin": self.origin,
+            "event_count": 1,
+            "first_seen": seen,
+            "last_seen": seen,
+            "rule_name": rule.name,
+            "hostname": hostname,
+            "command_line": cmd_line,
+        }
+        self.alerts.add(alert)
+        if self.aggregator is not None:
+            self.aggregator.add(key, event_time.timestamp(), alert)
+
+    def flush_alerts(self):
+        """Group-commit buffered alerts and the checkpoint, then hand pending alerts to the enrichment pool."""
+        try:
+            with self.stage["persist"].time():
+                written = self.alerts.flush()
+        except LeaseLost as e:
+            if self.aggregator is not None:
+                self.aggregator.discard(e.discarded)  # repeats must start a new alert, not bump a dropped one
+            raise
+        if self.aggregator is not None:
+            self.aggregator.settle(written)
+        deadline = self.enrichment.deadline() if self.enrichment is not None else None
+        rejected = []
+        for alert_id, alert in written:
+            print(f"Saved Alert: {alert['rule_name']} for {alert['hostname']}")
+            if alert["ai_status"] != "pending" or not alert_id or self.enrichment is None:
+                continue
+            if not self.enrichment.submit(alert_id, alert["command_line"], alert["rule_name"], alert["command_line"], deadline):
+                rejected.append((alert_id, alert))
+        if rejected:
+            print(f"Enrichment queue full, skipping AI analysis for {len(rejected)} alerts")
+            self.skip_enrichment(rejected)
+        return len(written)
+
+    def analyze_log(self, log_entry, matches=None, rules=None):
+        """Detect and report one event (a ProcessEvent, or a dict with the same keys); matches may be precomputed."""
+        try:
+            if isinstance(log_entry, dict):
+                log_entry = ProcessEvent.from_dict(log_entry)
+            rules = rules if rules is not None else self.rules  # one snapshot per event, even if a reload lands mid-way
+            if matches is None:
+                matches = rules.match(log_entry.process_name or log_entry.image_path or "", log_entry.command_line or "")
+            matches = self.report_event(log_entry, matches, rules)
+            if matches:
+                return "ALERT: " + ", ".join(rule.name for rule in matches)
 
             return "CLEAN"
 
         except Exception as e:
             return f"ERROR: {str(e)}"
 
+    def analyze_batch(self, events, rules=None):
+        """Detect and report a fetched page; returns [(event_id, rule_id, severity)] for every hit.
+
+        Rule matching runs once over the page's columns (RuleSet.match_batch,
+        or the detection pool for large pages) instead of event by event.
+        Only events with a hit, a sequence step (RuleSet.match_stages) or an
+        encoded-looking payload go on to the per-event sequence and decoding
+        checks. The alert sink is advanced and flushed at event boundaries,
+        so checkpoints stay exact.
+        """
+        events = [ProcessEvent.from_dict(e) if isinstance(e, dict) else e for e in events]
+        rules = rules if rules is not None else self.rules  # one snapshot for the whole page
+        processes = [e.process_name or e.image_path or "" for e in events]
+        commands = [e.command_line for e in events]
+        if self.detect_pool is not None and len(events) >= DETECT_POOL_MIN_BATCH:
+            matched = self.detect_pool.match_batch(events, rules)
+        else:
+            matched = {position: [rules.rules[i] for i in indices]
+                       for position, indices in rules.match_batch(processes, commands)}
+        # Events that are no sequence step are left out of the process tree: no chain can run through them
+        per_event = rules.match_stages(processes, commands, [e.parent_image for e in events])
+        if self.deobfuscator is not None:
+            per_event |= self.deobfuscator.payload_positions(commands)
+        hits = []
+        for position, event in enumerate(events):
+            matches = matched.get(position)
+            if matches or position in per_event:
+                try:
+                    for rule in self.report_event(event, matches or [], rules):
+                        hits.append((event.event_id, rule.rule_id or self.rule_ids.get(rule.name), rule.severity))
+                except Exception as e:
+                    print(f"Analysis Error (event {event.event_id}): {e}")
+            self.alerts.advance(event.event_id)
+            if self.alerts.should_flush():
+                self.flush_alerts()
+        return hits
+
+    def report_event(self, log_entry, matches, rules):
+        """Add sequence and decoded-payload hits to an event's rule matches and report them all; returns the rules."""
+        process = log_entry.process_name or log_entry.image_path or ""
+        cmd_line = log_entry.command_line or ""
+        hostname = log_entry.hostname or "Unknown-Host"
+        if rules.sequences:
+            matches = list(matches) + self.match_sequences(log_entry, process, cmd_line, rules)
+        for rule in matches:
+            print(f"DETECTED: {rule.name} on {hostname}")
+            self.report_hit(hostname, rule, cmd_line, rules.version, log_entry.host_id,
+                            log_entry.event_id, log_entry.timestamp)
+        decoded_matches = self.match_decoded(process, cmd_line, rules, matches)
+        for rule, text in decoded_matches:
+            print(f"DETECTED (decoded): {rule.name} on {hostname}")
+            self.report_hit(hostname, rule, f"{cmd_line}\n\nDecoded: {text[:DECODED_TEXT_MAX]}", rules.version,
+                            log_entry.host_id, log_entry.event_id, log_entry.timestamp)
+        return list(matches) + [rule for rule, _ in decoded_matches]
+
+    def match_decoded(self, process, cmd_line, rules, matches):
+        """Run the rule set over payloads decoded from the command line.
+
+        Returns (rule, decoded text) for rules that only match after decoding;
+        rules that already matched the raw command line are not reported twice.
+        """
+        if self.deobfuscator is None:
+            return []
+        seen = set(id(rule) for rule in matches)
+        hits = []
+        for text in self.deobfuscator.decode(cmd_line):
+            for rule in rules.match(process, text):
+                if id(rule) not in seen:
+                    seen.add(id(rule))
+                    hits.append((rule, text))
+        return hits
+
+    def match_sequences(self, log_entry, process, cmd_line, rules):
+        """Index the event in the process tree and evaluate the sequence rules that end at it."""
+        event_time = log_entry.timestamp
+        ts = event_time.timestamp() if isinstance(event_time, datetime) else time.time()
+        host = log_entry.host_id or log_entry.hostname
+        node = self.tree.observe(host, log_entry.pid, log_entry.ppid, process, cmd_line, ts)
+        return self.tree.match(host, node, rules.sequence_candidates(node.image),
+                               log_entry.parent_image, log_entry.parent_command_line)
+
     def get_max_event_id(self):
-        if not self.db_conn: return 0
+        if not self.db_conn:
+            self._fetch_result(ConnectionError("MySQL unavailable"))
+            return 0
         try:
             cursor = self.db_conn.cursor()
             cursor.execute("SELECT MAX(event_id) FROM lotl_process_event")
             res = cursor.fetchone()
+            self._fetch_result()
             return res[0] if res and res[0] else 0
         except Exception as e:
             print(f"Error getting max ID: {e}")
+            self._fetch_result(e)
             return 0
 
-    def fetch_new_events(self, last_id):
-        if not self.db_conn: return []
+    def load_checkpoint(self):
+        """Where to resume: replay any spilled batch, then read this consumer's durable offset.
+
+        A consumer without a checkpoint starts from the newest event, as before.
+        """
+        self.flush_alerts()
+        _, spilled_checkpoint = self.alerts.load_spill()
+        if spilled_checkpoint is not None:
+            # MySQL is still unreachable; the spill already holds alerts up to here
+            self.alerts.advance(spilled_checkpoint)
+            return spilled_checkpoint
+        while True:
+            try:
+                cursor = self.live_conn().cursor()
+                cursor.execute("SELECT last_event_id FROM lotl_analyzer_checkpoint WHERE consumer = %s", (self.alerts.consumer,))
+                res = cursor.fetchone()
+                self.db_conn.commit()
+                break
+            except Exception as e:
+                # Guessing an offset here would skip or re-alert events, so wait for the DB
+                print(f"Checkpoint Load Error: {e}")
+                time.sleep(5)
+        if res:
+            self.alerts.committed = res[0]
+            self.alerts.advance(res[0])
+            return res[0]
+        last_id = self.get_max_event_id()
+        self.alerts.advance(last_id)
+        self.flush_alerts()
+        return last_id
+
+    def process_events(self, events):
+        """Analyze a page in event order (see analyze_batch); returns the last event_id."""
+        start, persisted = time.perf_counter(), self.stage["persist"].sum
+        self.analyze_batch(events)
+        # Detection time excludes the alert flushes made mid-page; those count as persist
+        self.stage["detect"].observe(time.perf_counter() - start - (self.stage["persist"].sum - persisted))
+        self.flush_alerts()
+        last_id = events[-1].event_id
+        self.events_total.inc(len(events))
+        self.last_event_id.set(last_id)
+        return last_id
+
+    def fetch_new_events(self, last_id, limit=FETCH_BATCH_SIZE, shard=None):
+        """Next keyset page after last_id; shard=(index, count) keeps only hosts with host_id % count == index."""
+        if not self.db_conn:
+            self._fetch_result(ConnectionError("MySQL unavailable"))
+            return []
         try:
             # Reconnect if needed
             if not self.db_conn.is_connected():
                 self.db_conn.reconnect(attempts=3, delay=2)
             
-            cursor = self.db_conn.cursor(dictionary=True)
-            # Join with host table to get hostname
-            sql = """
-                SELECT e.*, h.hostname 
+            cursor = self.db_conn.cursor()
+            # Keyset page over the primary key, joined with host table to get hostname
+            shard_filter = "AND MOD(e.host_id, %s) = %s" if shard else ""
+            sql = f"""
+                SELECT {EVENT_COLUMNS}
                 FROM lotl_process_event e 
                 LEFT JOIN lotl_host h ON e.host_id = h.host_id 
-                WHERE e.event_id > %s 
-                ORDER BY e.event_id ASC LIMIT 50
+                WHERE e.event_id > %s {shard_filter}
+                ORDER BY e.event_id ASC LIMIT %s
             """
-            cursor.execute(sql, (last_id,))
-            return cursor.fetchall()
+            params = (last_id, shard[1], shard[0], limit) if shard else (last_id, limit)
+            with self.stage["fetch"].time():
+                cursor.execute(sql, params)
+                rows = cursor.fetchall()
+                self.db_conn.commit()  # end the read snapshot so the next page sees new inserts
+            self._fetch_result()
+            return [ProcessEvent.from_row(row) for row in rows]
         except Exception as e:
             print(f"Fetch Error: {e}")
+            self._fetch_result(e)
             return []
 
-def main():
+    def fetch_event_range(self, last_id, end_id, limit, since=None, until=None):
+        """Keyset page over (last_id, end_id], optionally limited to a timestamp window. Raises on errors."""
+        time_filter = ""
+        params = [last_id, end_id]
+        if since:
+            time_filter += " AND e.timestamp >= %s"
+            params.append(since)
+        if until:
+            time_filter += " AND e.timestamp <= %s"
+            params.append(until)
+        cursor = self.live_conn().cursor()
+        cursor.execute(f"""
+            SELECT {EVENT_COLUMNS}
+            FROM lotl_process_event e
+            LEFT JOIN lotl_host h ON e.host_id = h.host_id
+            WHERE e.event_id > %s AND e.event_id <= %s{time_filter}
+            ORDER BY e.event_id ASC LIMIT %s
+        """, params + [limit])
+        rows = cursor.fetchall()
+        self.db_conn.commit()
+        return [ProcessEvent.from_row(row) for row in rows]
+
+def start_background(analyzer, detect_processes=DETECT_PROCESSES, metrics_port=METRICS_PORT, resubmit=True):
+    """Start the rule watcher, the enrichment pool, the metrics endpoint and the optional detection pool.
+
+    With resubmit, alerts still pending AI analysis from a previous run are queued again
+    (shard workers leave that to worker 0).
+    """
+    analyzer.publish_agent_filter(analyzer.rules)
+    if metrics_port > 0:
+        try:
+            start_http_server(analyzer.metrics, metrics_port, METRICS_ADDR)
+            print(f"Metrics on http://{METRICS_ADDR}:{metrics_port}/metrics")
+        except OSError as e:
+            print(f"Metrics endpoint disabled: {e}")
+    watcher = RuleWatcher(lambda: mysql.connector.connect(**DB_CONFIG), analyzer.swap_rules,
+                          RULE_RELOAD_INTERVAL, analyzer.rules.version)
+    watcher.start()
+
+    if ENRICH_WORKERS > 0:
+        analyzer.enrichment = EnrichmentQueue(analyzer.explain, lambda: mysql.connector.connect(**DB_CONFIG),
+                                              ENRICH_WORKERS, ENRICH_QUEUE_SIZE, ENRICH_BATCH_SIZE)
+        analyzer.enrichment.start()
+        if resubmit:
+            analyzer.resubmit_pending()
+
+    if detect_processes > 0:
+        analyzer.detect_pool = DetectionPool(detect_processes, DETECT_CHUNK_SIZE)
+        print(f"Detection pool enabled ({detect_processes} processes)")
+
+def main(detect_processes=DETECT_PROCESSES):
     print("Starting Analysis Engine (Polling Mode)...")
     analyzer = LogAnalyzer()
     
-    # Start from the latest event to avoid re-alerting on old data
-    # Or start from 0 if we want to re-scan? Let's start from max for production-like behavior.
-    last_processed_id = analyzer.get_max_event_id()
+    # Resume from the durable checkpoint; events that arrived while we were down are not skipped
+    last_processed_id = analyzer.load_checkpoint()
     print(f"Starting from Event ID: {last_processed_id}")
 
+    start_background(analyzer, detect_processes)
+
+    scheduler = PollScheduler(POLL_MIN_INTERVAL, POLL_MAX_INTERVAL)
+    backlog = analyzer.get_max_event_id() - last_processed_id
+    catching_up = backlog > FETCH_BATCH_SIZE
+    if catching_up:
+        print(f"Catch-up mode: {backlog} events behind")
+        catchup_start, caught_up = time.time(), 0
+
     while True:
         try:
-            events = analyzer.fetch_new_events(last_processed_id)
+            limit = CATCHUP_BATCH_SIZE if catching_up else FETCH_BATCH_SIZE
+            events = analyzer.fetch_new_events(last_processed_id, limit)
             if events:
                 print(f"Fetched {len(events)} new events.")
-                for event in events:
-                    analyzer.analyze_log(event)
-                    last_processed_id = max(last_processed_id, event['event_id'])
+                last_processed_id = analyzer.process_events(events)
             else:
-                pass # No new events
-            
-            time.sleep(5) # Poll every 5 seconds
+                analyzer.flush_alerts()
+            analyzer.record_lag(events, limit)
+            analyzer.log_metrics()
+
+            if catching_up:
+                caught_up += len(events)
+                rate = caught_up / max(time.time() - catchup_start, 1e-6)
+                print(f"Catch-up: {caught_up}/{backlog} events at {rate:.0f} events/s (event {last_processed_id})")
+                if len(events) < limit:
+                    catching_up = False
+                    print("Caught up, switching to steady-state polling")
+                continue
+
+            delay = scheduler.next_delay(len(events), limit)
+            if delay:
+                time.sleep(delay)
             
         except KeyboardInterrupt:
             print("Stopping...")
+            analyzer.flush_alerts()
+            analyzer.log_metrics(force=True)
+            if analyzer.enrichment:
+                analyzer.enrichment.stop()
+            if analyzer.detect_pool:
+                analyzer.detect_pool.shutdown()
             break
         except Exception as e:
             print(f"Loop Error: {e}")
             time.sleep(5)
 
+def run_shard_worker(shard_count, worker_index=0):
+    """Analyze whichever shards this worker holds leases on, rebalancing as workers come and go."""
+    owner = f"{socket.gethostname()}-{os.getpid()}"
+    print(f"Starting Shard Worker {owner} ({shard_count} shards)...")
+    analyzer = LogAnalyzer()
+    leases = ShardLeases(analyzer.live_conn, owner, shard_count, ANALYZER_CONSUMER, LEASE_TTL)
+    while True:
+        try:
+            leases.ensure_shards()
+            break
+        except Exception as e:
+            print(f"Shard Setup Error: {e}")
+            time.sleep(5)
+    start_background(analyzer, metrics_port=METRICS_PORT + worker_index if METRICS_PORT > 0 else 0,
+                     resubmit=worker_index == 0)
+
+    sinks, positions = {}, {}
+    scheduler = PollScheduler(POLL_MIN_INTERVAL, POLL_MAX_INTERVAL)
+    next_rebalance = 0
+    while True:
+        try:
+            if time.time() >= next_rebalance:
+                owned = leases.rebalance()
+                for shard in [s for s in sinks if s not in owned]:
+                    del sinks[shard], positions[shard]
+                    print(f"Released shard {shard}")
+                for shard in owned:
+                    if shard not in sinks:
+                        consumer = leases.consumer(shard)
+                        analyzer.alerts = sinks[shard] = AlertSink(analyzer.live_conn, f"{ALERT_SPILL_PATH}.{consumer}", consumer,
+                                                                   ALERT_BATCH_SIZE, ALERT_FLUSH_INTERVAL, owner=owner)
+                        try:
+                            positions[shard] = analyzer.load_checkpoint()
+                        except LeaseLost:
+                            del sinks[shard]
+                            continue
+                        print(f"Acquired shard {shard} at Event ID {positions[shard]}")
+                next_rebalance = time.time() + LEASE_TTL / 3
+
+            fetched, full = 0, False
+            for shard, sink in list(sinks.items()):
+                analyzer.alerts = sink
+                try:
+                    events = analyzer.fetch_new_events(positions[shard], FETCH_BATCH_SIZE, (shard, shard_count))
+                    if events:
+                        positions[shard] = analyzer.process_events(events)
+                    else:
+                        analyzer.flush_alerts()
+                except LeaseLost:
+                    print(f"Lost lease on shard {shard}, another worker took it over")
+                    del sinks[shard], positions[shard]
+                    continue
+                fetched += len(events)
+                full = full or len(events) >= FETCH_BATCH_SIZE
+
+            analyzer.log_metrics()
+            delay = scheduler.next_delay(FETCH_BATCH_SIZE if full else fetched, FETCH_BATCH_SIZE)
+            if delay:
+                time.sleep(delay)
+
+        except KeyboardInterrupt:
+            print("Stopping...")
+            for sink in sinks.values():
+                analyzer.alerts = sink
+                analyzer.flush_alerts()
+            leases.release_all()
+            if analyzer.enrichment:
+                analyzer.enrichment.stop()
+            break
+        except Exception as e:
+            print(f"Loop Error: {e}")
+            time.sleep(5)
+
+def run_sharded(workers, shards):
+    if workers == 1:
+        run_shard_worker(shards)
+        return
+    procs = [multiprocessing.Process(target=run_shard_worker, args=(shards, i), name=f"shard-worker-{i}")
+             for i in range(workers)]
+    for proc in procs:
+        proc.start()
+    try:
+        for proc in procs:
+            proc.join()
+    except KeyboardInterrupt:
+        for proc in procs:
+            proc.join()
+
+# --- Retro-hunt: re-run rules over historical events ---
+
+_retro = None  # per worker process: (LogAnalyzer, shared progress counter)
+
+
+def _retro_init(rule_rows, progress):
+    global _retro
+    analyzer = LogAnalyzer()
+    analyzer.origin = "retro"
+    analyzer.rules = RuleSet.from_rows(rule_rows)
+    _retro = (analyzer, progress)
+
+
+def _retro_chunk(task):
+    """Scan one event_id range; its checkpoint row makes an interrupted hunt resume where it stopped."""
+    consumer, first_id, end_id, since, until = task
+    analyzer, progress = _retro
+    analyzer.alerts = AlertSink(analyzer.live_conn, f"{ALERT_SPILL_PATH}.{consumer}", consumer,
+                                ALERT_BATCH_SIZE, ALERT_FLUSH_INTERVAL)
+    analyzer.flush_alerts()  # replay a spill left by an interrupted run
+    cursor = analyzer.live_conn().cursor()
+    cursor.execute("SELECT last_event_id FROM lotl_analyzer_checkpoint WHERE consumer = %s", (consumer,))
+    row = cursor.fetchone()
+    analyzer.db_conn.commit()
+    last_id = row[0] if row else first_id - 1
+    scanned = 0
+    while last_id < end_id:
+        events = analyzer.fetch_event_range(last_id, end_id, CATCHUP_BATCH_SIZE, since, until)
+        if not events:
+            last_id = end_id
+            analyzer.alerts.advance(last_id)
+            break
+        last_id = analyzer.process_events(events)
+        scanned += len(events)
+        with progress.get_lock():
+            progress.value += len(events)
+    analyzer.flush_alerts()
+    return consumer, scanned
+
+
+def select_rule_rows(conn, names):
+    """Enabled rules, or the named rules (by name or id, enabled or not) for a targeted hunt."""
+    if not names:
+        return load_rule_rows(conn)
+    cursor = conn.cursor(dictionary=True)
+    cursor.execute("SELECT rule_id, rule_name, severity_default, logic_type, rule_content FROM lotl_detection_rule ORDER BY rule_id")
+    rows = [r for r in cursor.fetchall() if r["rule_name"] in names or str(r["rule_id"]) in names]
+    conn.commit()
+    missing = set(names) - {r["rule_name"] for r in rows} - {str(r["rule_id"]) for r in rows}
+    if missing:
+        raise SystemExit(f"Unknown rules: {', '.join(sorted(missing))}")
+    return rows
+
+
+RETRO_PLAN_SQL = "SELECT first_event_id, end_event_id, chunks FROM lotl_retro_hunt WHERE hunt_id = %s"
+
+
+def plan_retro_hunt(conn, args, rules):
+    """Return (hunt id, first event id, end event id, chunk count), or None when no events are in range.
+
+    The hunt id comes from the arguments and the rule set only. The range and
+    chunk count picked by the first run are stored in lotl_retro_hunt, so a
+    rerun resumes the same chunks even after new events have arrived
+    (without --to-id the range ends at the MAX(event_id) of the first run).
+    """
+    key = f"{args.from_id}-{args.to_id}-{args.since}-{args.until}-{rules.version}"
+    hunt = hashlib.sha1(key.encode("utf-8")).hexdigest()[:10]
+    cursor = conn.cursor()
+    cursor.execute(RETRO_PLAN_SQL, (hunt,))
+    row = cursor.fetchone()
+    if row is None:
+        conditions, params = [], []
+        if args.since:
+            conditions.append("timestamp >= %s")
+            params.append(args.since)
+        if args.until:
+            conditions.append("timestamp <= %s")
+            params.append(args.until)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        cursor.execute(f"SELECT MIN(event_id), MAX(event_id) FROM lotl_process_event {where}", params)
+        low, high = cursor.fetchone()
+        first_id = max(args.from_id or 0, low or 0)
+        end_id = min(args.to_id or high or 0, high or 0)
+        if not low or first_id > end_id:
+            conn.commit()
+            return None
+        chunk_count = max(1, min(args.retro_workers * RETRO_CHUNKS_PER_WORKER, end_id - first_id + 1))
+        cursor.execute("INSERT IGNORE INTO lotl_retro_hunt (hunt_id, first_event_id, end_event_id, chunks) VALUES (%s, %s, %s, %s)",
+                       (hunt, first_id, end_id, chunk_count))
+        cursor.execute(RETRO_PLAN_SQL, (hunt,))  # a concurrent run may have planned it first
+        row = cursor.fetchone()
+    conn.commit()
+    return (hunt,) + tuple(row)
+
+
+def retro_tasks(hunt, first_id, end_id, chunk_count, since=None, until=None):
+    """The _retro_chunk tasks of a planned hunt: one consumer and event_id range per chunk."""
+    step = -(-(end_id - first_id + 1) // chunk_count)
+    return [(f"retro-{hunt}-{i}", lo, min(lo + step - 1, end_id), since, until)
+            for i, lo in enumerate(range(first_id, end_id + 1, step))]
+
+
+def run_retro_hunt(args):
+    """Re-run rules over an event_id or time range in parallel keyset-paginated chunks.
+
+    Findings are written with origin='retro' and ai_status='skipped'. Each
+    chunk checkpoints as consumer 'retro-<hunt>-<n>'; re-running the same
+    command finds the hunt's stored plan (see plan_retro_hunt), resumes an
+    interrupted hunt and skips finished chunks.
+    """
+    conn = mysql.connector.connect(**DB_CONFIG)
+    rows = select_rule_rows(conn, [n.strip() for n in args.rules.split(",")] if args.rules else None)
+    rules = RuleSet.from_rows(rows)
+    plan = plan_retro_hunt(conn, args, rules)
+    conn.close()
+    if plan is None:
+        print("Retro-hunt: no events in range")
+        return
+
+    hunt, first_id, end_id, chunk_count = plan
+    tasks = retro_tasks(hunt, first_id, end_id, chunk_count, args.since, args.until)
+    span = end_id - first_id + 1
+    print(f"Retro-hunt {hunt}: events {first_id}..{end_id}, {len(rules)} rules, "
+          f"{len(tasks)} chunks on {args.retro_workers} workers")
+
+    progress = multiprocessing.Value("q", 0)
+    start = time.time()
+    with ProcessPoolExecutor(args.retro_workers, initializer=_retro_init, initargs=(rows, progress)) as pool:
+        pending = {pool.submit(_retro_chunk, task) for task in tasks}
+        while pending:
+            done, pending = wait(pending, timeout=5, return_when=FIRST_COMPLETED)
+            for future in done:
+                future.result()  # surface worker errors; finished chunks stay checkpointed
+            elapsed = max(time.time() - start, 1e-6)
+            print(f"Retro-hunt {hunt}: {progress.value} events scanned (id span {span}), "
+                  f"{len(tasks) - len(pending)}/{len(tasks)} chunks done, {progress.value / elapsed:.0f} events/s")
+    print(f"Retro-hunt {hunt} complete in {time.time() - start:.1f}s")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="LOTL analysis engine")
+    parser.add_argument("--workers", type=int, default=int(os.environ.get('ANALYZER_WORKERS', '1')),
+                        help="analyzer worker processes to run on this machine")
+    parser.add_argument("--shards", type=int, default=int(os.environ.get('ANALYZER_SHARDS', '0')),
+                        help="total shards shared by all workers, on any machine (default: --workers)")
+    parser.add_argument("--detect-processes", type=int, default=DETECT_PROCESSES,
+                        help="evaluate rules for large pages in this many worker processes (0 = off)")
+    retro = parser.add_argument_group("retro-hunt", "re-run rules over historical events and exit")
+    retro.add_argument("--retro-hunt", action="store_true", help="run a retro-hunt instead of live analysis")
+    retro.add_argument("--from-id", type=int, help="first event_id to scan")
+    retro.add_argument("--to-id", type=int, help="last event_id to scan")
+    retro.add_argument("--since", help="only events at or after this timestamp (YYYY-MM-DD[ HH:MM:SS])")
+    retro.add_argument("--until", help="only events at or before this timestamp")
+    retro.add_argument("--rules", help="comma-separated rule names or ids (default: all enabled rules)")
+    retro.add_argument("--retro-workers", type=int, default=os.cpu_count() or 2,
+                       help="parallel worker processes for the hunt")
+    return parser.parse_args()
+
 if __name__ == "__main__":
+    args = parse_args()
+    if args.retro_hunt:
+        run_retro_hunt(args)
+        sys.exit(0)
     time.sleep(10) # Wait for DB initialization
-    main()
+    shards = args.shards or args.workers
+    if shards > 1:
+        run_sharded(args.workers, shards)
+    else:
+        main(args.detect_processes)
@@ -0,0 +1,547 @@
+"""Throughput and latency benchmarks for the analysis engine.
+
+Events come from the seeded FleetGenerator in mock_log_generator.py, so runs
+with the same arguments see the same workload. "detect" and "loop" drive a
+real LogAnalyzer; by default its database is MemoryDB, an in-memory stand-in
+for the tables the analyzer touches, so they measure the engine alone. With
+--mysql they run against DB_CONFIG instead (events are bulk-loaded first and
+alerts are written under the "benchmark" consumer). LLM enrichment is
+skipped in both modes.
+
+Usage:
+    python benchmark.py detect [--events N] [--hosts H] [--malicious R] [--seed S] [--mysql] [--tracemalloc]
+    python benchmark.py loop   [--events N] [--page-size P] [...same options]
+    python benchmark.py pool   [--events N] [--processes P] [--regex-rules R] [...workload options]
+    python benchmark.py memory [--events N] [...workload options]
+    python benchmark.py batch  [--events N] [--sizes 50,500,5000,50000] [...workload options]
+"""
+import argparse
+import bisect
+import gc
+import importlib.util
+import json
+import os
+import resource
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+import mysql.connector
+
+import analyzer
+from bulk_import import EVENT_COLUMNS as ROW_COLUMNS, Loader, map_record
+from detect_pool import DetectionPool
+from events import ProcessEvent
+from mock_log_generator import FleetGenerator
+from rule_engine import DEFAULT_RULES, RuleSet
+
+
+def regex_heavy_rules(count):
+    """Built-in rules plus count regex rules that apply to every process image."""
+    rows = list(DEFAULT_RULES)
+    for i in range(count):
+        rows.append({
+            "rule_id": 1000 + i,
+            "rule_name": f"Bench Regex {i}",
+            "severity_default": "low",
+            "logic_type": "regex",
+            "rule_content": rf"command_line:(?:-|/)(?:url|split|enc)\w*\s+\S*bench{i}\b.*(?:http|ftp)s?://\S+",
+        })
+    return RuleSet.from_rows(rows)
+
+
+# The seed rules of database/init.sql, including the sequence rule
+SEED_RULES = DEFAULT_RULES + [{
+    "rule_id": None,
+    "rule_name": "Office Spawns Shell Downloader",
+    "severity_default": "critical",
+    "logic_type": "sequence",
+    "rule_content": "process_name:winword.exe|excel.exe|powerpnt.exe -> process_name:powershell.exe|pwsh.exe|cmd.exe "
+                    "-> process_name:certutil.exe AND command_line:urlcache|split WITHIN 300",
+}]
+
+
+# --- In-memory stand-in for MySQL ---
+
+class MemoryDB:
+    """Just enough of lotl_* to run LogAnalyzer without a server.
+
+    Statements are recognised by the table they touch; rows are kept in
+    lists and dicts. connect() returns a connection object with the
+    mysql-connector methods the analyzer and the alert sink call.
+    Writes are undone by rollback(), and a statement starting with
+    fail_on raises, so tests can break a transaction half-way. An alert
+    with an unknown rule_id fails like the real foreign key.
+    """
+
+    def __init__(self, rule_rows=SEED_RULES):
+        self.hosts = {}       # hostname -> host_id
+        self.events = []      # row dicts in event_id order
+        self.event_ids = []
+        self.rules = [dict(row, rule_id=i + 1) for i, row in enumerate(rule_rows)]
+        self.alerts = {}      # alert_id -> values in alert_sink.COLUMNS order
+        self.checkpoints = {}
+        self.retro_hunts = {}  # hunt_id -> (first_event_id, end_event_id, chunks)
+        self.owners = {}      # consumer -> lease owner (sharded workers)
+        self.commits = 0
+        self.fail_on = None   # SQL prefix that raises instead of executing
+        self.autoinc_lock_mode = 1
+
+    def connect(self):
+        return _MemoryConnection(self)
+
+    def host_id(self, hostname):
+        return self.hosts.setdefault(hostname, len(self.hosts) + 1)
+
+    def add_event(self, hostname, row):
+        event = {c: row[c] for c in ROW_COLUMNS if c not in ("host_id", "raw_event")}
+        event["event_id"] = len(self.events) + 1
+        event["host_id"] = self.host_id(hostname)
+        event["hostname"] = hostname
+        event["timestamp"] = datetime.strptime(row["timestamp"], "%Y-%m-%d %H:%M:%S")
+        self.events.append(event)
+        self.event_ids.append(event["event_id"])
+
+
+class _MemoryConnection:
+    def __init__(self, db):
+        self.db = db
+        self._undo = None  # state before the first write of the open transaction
+
+    def cursor(self, dictionary=False):
+        return _MemoryCursor(self.db, dictionary, self)
+
+    def begin_write(self):
+        if self._undo is None:
+            db = self.db
+            self._undo = ({k: list(v) for k, v in db.alerts.items()}, dict(db.checkpoints), dict(db.hosts),
+                          [dict(r) for r in db.rules])
+
+    def commit(self):
+        self._undo = None
+        self.db.commits += 1
+
+    def rollback(self):
+        if self._undo is not None:
+            self.db.alerts, self.db.checkpoints, self.db.hosts, self.db.rules = self._undo
+            self._undo = None
+
+    def is_connected(self):
+        return True
+
+    def reconnect(self, attempts=1, delay=0):
+        pass
+
+    def close(self):
+        pass
+
+
+class _MemoryCursor:
+    def __init__(self, db, dictionary, conn):
+        self.db = db
+        self.conn = conn
+        self.dictionary = dictionary
+        self.rows = []
+        self.lastrowid = None
+
+    def fetchall(self):
+        rows, self.rows = self.rows, []
+        return rows
+
+    def fetchone(self):
+        return self.rows.pop(0) if self.rows else None
+
+    def executemany(self, sql, seq):
+        first = None
+        for params in seq:
+            self.execute(sql, params)
+            first = first or self.lastrowid
+        self.lastrowid = first
+
+    def execute(self, sql, params=()):
+        db, sql = self.db, " ".join(sql.split())
+        if db.fail_on and sql.startswith(db.fail_on):
+            raise OSError(f"MemoryDB: injected failure on {db.fail_on}")
+        if sql.startswith(("INSERT", "UPDATE")):
+            self.conn.begin_write()
+        if sql.startswith("SELECT") and "FROM lotl_process_event" in sql:
+            if "MIN(event_id), MAX(event_id)" in sql:  # whole table; timestamp filters are not applied
+                self.rows = [(db.event_ids[0], db.event_ids[-1]) if db.event_ids else (None, None)]
+                return
+            if "MAX(event_id)" in sql:
+                self.rows = [(db.event_ids[-1] if db.event_ids else None,)]
+                return
+            last_id, limit = params[0], params[-1]
+            start = bisect.bisect_right(db.event_ids, last_id)
+            page = db.events[start:start + limit]
+            if "e.event_id <= %s" in sql:
+                page = [e for e in page if e["event_id"] <= params[1]]
+            if "MOD(e.host_id" in sql:
+                page = [e for e in db.events[start:] if e["host_id"] % params[1] == params[2]][:limit]
+            if self.dictionary:
+                self.rows = [dict(e) for e in page]
+            else:
+                self.rows = [tuple(e[name] for name in ProcessEvent.__slots__) for e in page]
+        elif sql.startswith("SELECT @@innodb_autoinc_lock_mode"):
+            self.rows = [(db.autoinc_lock_mode,)]
+        elif "FROM lotl_retro_hunt" in sql:
+            self.rows = [db.retro_hunts[params[0]]] if params[0] in db.retro_hunts else []
+        elif sql.startswith("INSERT IGNORE INTO lotl_retro_hunt"):
+            db.retro_hunts.setdefault(params[0], tuple(params[1:]))
+        elif sql.startswith("SELECT hostname, host_id"):
+            self.rows = list(db.hosts.items())
+        elif sql.startswith("SELECT rule_name, rule_id"):
+            self.rows = [(r["rule_name"], r["rule_id"]) for r in db.rules]
+        elif "FROM lotl_detection_rule" in sql:
+            self.rows = [dict(r) for r in db.rules]
+        elif sql.startswith("SELECT owner FROM lotl_analyzer_checkpoint"):
+            self.rows = [(db.owners[params[0]],)] if params[0] in db.owners else []
+        elif "FROM lotl_analyzer_checkpoint" in sql:
+            consumer = params[0]
+            self.rows = [(db.checkpoints[consumer],)] if consumer in db.checkpoints else []
+        elif sql.startswith("INSERT INTO lotl_host"):
+            self.lastrowid = db.host_id(params[0])
+        elif sql.startswith("INSERT INTO lotl_detection_rule"):
+            existing = [r["rule_id"] for r in db.rules if r["rule_name"] == params[0]]
+            if not existing:
+                db.rules.append({"rule_id": len(db.rules) + 1, "rule_name": params[0], "severity_default": "high",
+                                 "logic_type": "keyword", "rule_content": "auto-generated"})
+            self.lastrowid = existing[0] if existing else db.rules[-1]["rule_id"]
+        elif sql.startswith("INSERT INTO lotl_alert_reference"):
+            if params[2] not in {r["rule_id"] for r in db.rules}:  # FOREIGN KEY (rule_id)
+                raise mysql.connector.errors.IntegrityError(msg=f"MemoryDB: no rule_id {params[2]}", errno=1452)
+            # Under lock mode 2 concurrent writers interleave, so ids have gaps; here every other id is taken
+            self.lastrowid = max(db.alerts, default=0) + (2 if db.autoinc_lock_mode == 2 else 1)
+            db.alerts[self.lastrowid] = list(params)
+        elif sql.startswith("UPDATE lotl_alert_reference SET event_count"):
+            alert = db.alerts.get(params[-1])
+            if alert:
+                alert[9] += params[0]
+        elif sql.startswith("SELECT a.alert_id, a.description, r.rule_name"):
+            names = {r["rule_id"]: r["rule_name"] for r in db.rules}
+            self.rows = [(alert_id, alert[4], names.get(alert[2])) for alert_id, alert in sorted(db.alerts.items())
+                         if alert[7] == "pending"][:params[0]]
+        elif sql.startswith("UPDATE lotl_alert_reference SET description"):
+            alert = db.alerts.get(params[2])
+            if alert:
+                alert[4], alert[7] = params[0], params[1]
+        elif sql.startswith("INSERT INTO lotl_analyzer_checkpoint"):
+            db.checkpoints[params[0]] = params[1]
+        # lotl_agent_filter and enrichment description updates need no state here
+
+
+# --- Harness ---
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * pct / 100))]
+
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # KiB on Linux
+
+
+def fleet_records(args):
+    generator = FleetGenerator(args.hosts, args.malicious, args.depth, args.seed)
+    return generator.events(args.events)
+
+
+def make_analyzer(args):
+    """A LogAnalyzer over MemoryDB (or MySQL with --mysql) loaded with the workload's events.
+
+    Returns (analyzer, first event id to process, labels by event id).
+    """
+    labels = {}
+    if args.mysql:
+        connect = lambda: analyzer.mysql.connector.connect(**analyzer.DB_CONFIG)
+        conn = connect()
+        cursor = conn.cursor()
+        cursor.execute("SELECT COALESCE(MAX(event_id), 0) FROM lotl_process_event")
+        start_id = cursor.fetchone()[0]
+        loader, batch = Loader(conn), []
+        for record in fleet_records(args):
+            mapped = map_record(record, "bench")
+            batch.append(mapped)
+            labels[start_id + len(labels) + 1] = record["Label"]  # assumes no concurrent writers
+            if len(batch) >= 5000:
+                loader.write(batch)
+                batch = []
+        if batch:
+            loader.write(batch)
+        conn.close()
+    else:
+        db, start_id = MemoryDB(), 0
+        connect = db.connect
+        for record in fleet_records(args):
+            hostname, row = map_record(record, "bench")
+            db.add_event(hostname, row)
+            labels[len(db.events)] = record["Label"]
+
+    engine = analyzer.LogAnalyzer(connect)
+    engine.ask_ollama = lambda cmd_line, rule_name: "Skipped (benchmark)"
+    engine.alerts.consumer = "benchmark"
+    engine.alerts.spill_path = os.path.join(tempfile.gettempdir(), "benchmark_alert_spill.json")
+    return engine, start_id, labels
+
+
+def report(name, count, elapsed, latencies, hits, labels, traced=None):
+    latencies.sort()
+    malicious = sum(1 for label in labels.values() if label != "benign")
+    print(f"{name}: {count} events in {elapsed:.2f}s = {count / elapsed:,.0f} events/s")
+    print(f"  latency p50 {percentile(latencies, 50) * 1e6:.1f} us, p99 {percentile(latencies, 99) * 1e6:.1f} us, "
+          f"max {latencies[-1] * 1e6 if latencies else 0:.1f} us")
+    print(f"  alerting events: {len(hits)} ({sum(1 for i in hits if labels.get(i) != 'benign')} of {malicious} "
+          f"attack-chain events, {sum(1 for i in hits if labels.get(i) == 'benign')} benign)")
+    print(f"  peak RSS {peak_rss_mb():.0f} MB" + (f", traced Python heap peak {traced / 2**20:.1f} MB" if traced else ""))
+
+
+def bench_detect(args):
+    """Per-event LogAnalyzer.analyze_log latency over pre-fetched events."""
+    engine, start_id, labels = make_analyzer(args)
+    events = []
+    while True:
+        page = engine.fetch_new_events(events[-1].event_id if events else start_id, 10000)
+        if not page:
+            break
+        events.extend(page)
+    print(f"{len(events)} events, {len(engine.rules)} rules, {args.hosts} hosts")
+
+    if args.tracemalloc:
+        tracemalloc.start()
+    latencies, hits = [], []
+    start = time.perf_counter()
+    for event in events:
+        t = time.perf_counter()
+        verdict = engine.analyze_log(event)
+        latencies.append(time.perf_counter() - t)
+        if verdict.startswith("ALERT"):
+            hits.append(event.event_id)
+    elapsed = time.perf_counter() - start
+    traced = tracemalloc.get_traced_memory()[1] if args.tracemalloc else None
+    tracemalloc.stop()
+    engine.flush_alerts()
+    report("analyze_log", len(events), elapsed, latencies, hits, labels, traced)
+
+
+def bench_loop(args):
+    """The polling loop's fetch -> detect -> save cycle, page by page, until caught up."""
+    engine, start_id, labels = make_analyzer(args)
+    engine.alerts.advance(start_id)
+    print(f"{len(labels)} events, {len(engine.rules)} rules, {args.hosts} hosts, pages of {args.page_size}")
+
+    hits = set()
+    original_analyze = engine.analyze_batch
+
+    def analyze_batch(events, *rest):
+        found = original_analyze(events, *rest)
+        hits.update(event_id for event_id, _, _ in found)
+        return found
+    engine.analyze_batch = analyze_batch
+
+    if args.tracemalloc:
+        tracemalloc.start()
+    last_id, pages, count = start_id, [], 0
+    start = time.perf_counter()
+    while True:
+        t = time.perf_counter()
+        events = engine.fetch_new_events(last_id, args.page_size)
+        if not events:
+            break
+        last_id = engine.process_events(events)
+        pages.append((time.perf_counter() - t) / len(events))
+        count += len(events)
+    elapsed = time.perf_counter() - start
+    traced = tracemalloc.get_traced_memory()[1] if args.tracemalloc else None
+    tracemalloc.stop()
+    report("fetch->detect->save", count, elapsed, pages, hits, labels, traced)
+    print(f"  (latency is per event, averaged over each page; {len(pages)} pages, "
+          f"{engine.alerts.stats['written']} alerts written)")
+
+
+def bench_batch(args):
+    """Per-event matching and analyze_log vs. RuleSet.match_batch and analyze_batch, page size by page size.
+
+    "match" is the rule engine alone; "analyze" is the whole detect stage
+    (sequence and decoded-payload checks, alert reporting) as process_events
+    ran it before and runs it now.
+    """
+    engine, start_id, labels = make_analyzer(args)
+    events = []
+    while True:
+        page = engine.fetch_new_events(events[-1].event_id if events else start_id, 10000)
+        if not page:
+            break
+        events.extend(page)
+    rules = engine.rules
+    print(f"{len(events)} events, {len(rules)} rules, {args.hosts} hosts")
+
+    def pages(size):
+        return [events[i:i + size] for i in range(0, len(events), size)]
+
+    def per_event_match(page):
+        return sum(1 for e in page if rules.match_indices(e.process_name or e.image_path or "", e.command_line))
+
+    def batch_match(page):
+        return len(rules.match_batch([e.process_name or e.image_path or "" for e in page],
+                                     [e.command_line for e in page]))
+
+    def per_event_analyze(page):
+        hits = 0
+        for event in page:
+            hits += engine.analyze_log(event, None, rules).startswith("ALERT")
+            engine.alerts.advance(event.event_id)
+            if engine.alerts.should_flush():
+                engine.flush_alerts()
+        engine.flush_alerts()
+        return hits
+
+    def batch_analyze(page):
+        hits = len(set(event_id for event_id, _, _ in engine.analyze_batch(page, rules)))
+        engine.flush_alerts()
+        return hits
+
+    def run(fn, size):
+        gc.collect()
+        start = time.perf_counter()
+        hits = sum(fn(page) for page in pages(size))
+        return len(events) / (time.perf_counter() - start), hits
+
+    print(f"{'page':>7} {'match/event':>12} {'match_batch':>12} {'speedup':>8}   "
+          f"{'analyze_log':>12} {'analyze_batch':>13} {'speedup':>8}")
+    for size in args.sizes:
+        single, single_hits = run(per_event_match, size)
+        batched, batched_hits = run(batch_match, size)
+        logged, logged_hits = run(per_event_analyze, size)
+        paged, paged_hits = run(batch_analyze, size)
+        mismatch = "" if single_hits == batched_hits and logged_hits == paged_hits else \
+            f"  HIT MISMATCH ({single_hits}/{batched_hits}, {logged_hits}/{paged_hits})"
+        print(f"{size:>7} {single:>10,.0f}/s {batched:>10,.0f}/s {batched / single:>7.2f}x   "
+              f"{logged:>10,.0f}/s {paged:>11,.0f}/s {paged / logged:>7.2f}x{mismatch}")
+
+
+def traced_bytes(build):
+    """Bytes still allocated (tracemalloc) after build() returns, and its result."""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = build()
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return size, result
+
+
+def bench_memory(args):
+    """Memory per 100k events: dictionary rows vs ProcessEvent records, analyzer and agent side.
+
+    Inputs are JSON strings, so every row owns freshly decoded strings the
+    way database rows and collector output do.
+    """
+    per = 100000 / args.events
+    names = ProcessEvent.__slots__
+    db_rows, agent_lines = [], []
+    for i, record in enumerate(fleet_records(args), 1):
+        hostname, row = map_record(record, "bench")
+        db_rows.append(json.dumps([i, 1, row["timestamp"]] + [row[c] for c in names[3:-1]] + [hostname]))
+        agent_lines.append(json.dumps(record))
+
+    def rows():
+        for line in db_rows:
+            values = json.loads(line)
+            values[2] = datetime.strptime(values[2], "%Y-%m-%d %H:%M:%S")
+            yield values
+
+    print(f"{args.events} events; bytes scaled to 100k events")
+    dict_size, dicts = traced_bytes(lambda: [dict(zip(names, values)) for values in rows()])
+    del dicts
+    record_size, records = traced_bytes(lambda: [ProcessEvent.from_row(values) for values in rows()])
+    del records
+    print(f"analyzer, dictionary cursor rows: {dict_size * per / 2**20:7.1f} MB")
+    print(f"analyzer, ProcessEvent records:   {record_size * per / 2**20:7.1f} MB ({record_size / dict_size:.0%})")
+
+    # The agent's events.py (not importable by name next to the server's)
+    spec = importlib.util.spec_from_file_location(
+        "agent_events", os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "agent", "events.py"))
+    agent_events = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(agent_events)
+    FIELDS, AgentEvent = agent_events.FIELDS, agent_events.ProcessEvent
+
+    mock_size, mock = traced_bytes(lambda: [json.loads(line) for line in agent_lines])
+    del mock
+    agent_dict_size, agent_dicts = traced_bytes(
+        lambda: [{name: record.get(name) for name in FIELDS} for record in map(json.loads, agent_lines)])
+    del agent_dicts
+    agent_size, agent_records = traced_bytes(
+        lambda: [AgentEvent(**{name: record.get(name) for name in FIELDS}) for record in map(json.loads, agent_lines)])
+    del agent_records
+    print(f"mock Sysmon-format dicts:         {mock_size * per / 2**20:7.1f} MB")
+    print(f"agent, event dicts:               {agent_dict_size * per / 2**20:7.1f} MB")
+    print(f"agent, ProcessEvent records:      {agent_size * per / 2**20:7.1f} MB ({agent_size / agent_dict_size:.0%})")
+
+
+def bench_pool(args):
+    """In-process RuleSet.match_batch vs. the same batch matching spread over worker processes."""
+    events = [map_record(record, "bench")[1] for record in fleet_records(args)]
+    rules = regex_heavy_rules(args.regex_rules)
+    print(f"{len(events)} events ({len(set(e['command_line'] for e in events))} distinct command lines), "
+          f"{len(rules)} rules, {os.cpu_count()} CPUs")
+
+    start = time.perf_counter()
+    serial_hits = 0
+    for i in range(0, len(events), args.chunk_size):
+        chunk = events[i:i + args.chunk_size]
+        serial_hits += len(rules.match_batch([e["process_name"] or "" for e in chunk], [e["command_line"] for e in chunk]))
+    serial = time.perf_counter() - start
+    print(f"in-process:  {len(events) / serial:10.0f} events/s ({serial_hits} hits)")
+
+    pool = DetectionPool(args.processes, args.chunk_size)
+    pool.match_batch(events[:args.chunk_size], rules)  # start workers outside the timing
+    start = time.perf_counter()
+    pooled_hits = len(pool.match_batch(events, rules))
+    pooled = time.perf_counter() - start
+    pool.shutdown()
+    print(f"{args.processes} processes: {len(events) / pooled:10.0f} events/s ({pooled_hits} hits)")
+    print(f"speedup: {serial / pooled:.2f}x")
+
+
+def add_workload_args(parser):
+    parser.add_argument("--events", type=int, default=50000)
+    parser.add_argument("--hosts", type=int, default=50)
+    parser.add_argument("--malicious", type=float, default=0.01)
+    parser.add_argument("--depth", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--mysql", action="store_true", help="use DB_CONFIG instead of the in-memory stand-in")
+    parser.add_argument("--tracemalloc", action="store_true", help="also report the traced Python heap peak (slower)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Analyzer benchmarks")
+    sub = parser.add_subparsers(dest="command", required=True)
+    detect = sub.add_parser("detect", help="per-event analyze_log throughput and latency")
+    add_workload_args(detect)
+    detect.set_defaults(func=bench_detect)
+    loop = sub.add_parser("loop", help="full fetch -> detect -> save loop")
+    add_workload_args(loop)
+    loop.add_argument("--page-size", type=int, default=analyzer.FETCH_BATCH_SIZE)
+    loop.set_defaults(func=bench_loop)
+    memory = sub.add_parser("memory", help="memory per 100k events, dictionary rows vs. ProcessEvent records")
+    add_workload_args(memory)
+    memory.set_defaults(func=bench_memory)
+    batch = sub.add_parser("batch", help="per-event vs. batch detection over a range of page sizes")
+    add_workload_args(batch)
+    batch.add_argument("--sizes", type=lambda v: [int(n) for n in v.split(",")], default=[50, 500, 5000, 50000])
+    batch.set_defaults(func=bench_batch)
+    pool = sub.add_parser("pool", help="in-process matching vs. the multiprocessing detection pool")
+    add_workload_args(pool)
+    pool.add_argument("--processes", type=int, default=os.cpu_count() or 2)
+    pool.add_argument("--regex-rules", type=int, default=200)
+    pool.add_argument("--chunk-size", type=int, default=500)
+    pool.set_defaults(func=bench_pool)
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
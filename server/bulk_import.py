@@ -0,0 +1,308 @@
+"""Offline bulk importer for Sysmon process-creation exports.
+
+Streams JSON lines, JSON arrays (flat Sysmon records, EVTX-JSON `Event`
+documents or Winlogbeat `winlog` documents) and Windows XML event dumps at
+constant memory, maps Event ID 1 records onto lotl_process_event and loads
+them in large batches. Files ending in .gz are decompressed on the fly.
+
+Usage:
+    python bulk_import.py capture.jsonl [more files...] [--format auto|jsonl|json|xml]
+                          [--host NAME] [--batch-size N] [--load-data] [--dry-run]
+"""
+import argparse
+import gzip
+import json
+import os
+import tempfile
+import time
+import xml.etree.ElementTree as ET
+from datetime import datetime, timezone
+
+import mysql.connector
+
+from analyzer import DB_CONFIG
+
+EVENT_COLUMNS = ("host_id", "provider", "event_type", "timestamp", "user_name", "image_path", "process_name",
+                 "command_line", "current_directory", "pid", "ppid", "parent_image", "parent_command_line",
+                 "hash_sha256", "raw_event")
+
+INSERT_SQL = f"""
+    INSERT INTO lotl_process_event ({", ".join(EVENT_COLUMNS)})
+    VALUES ({", ".join(["%s"] * len(EVENT_COLUMNS))})
+"""
+
+LOAD_DATA_SQL = f"""
+    LOAD DATA LOCAL INFILE %s INTO TABLE lotl_process_event
+    CHARACTER SET utf8mb4
+    FIELDS TERMINATED BY '\\t' ESCAPED BY '\\\\'
+    LINES TERMINATED BY '\\n'
+    ({", ".join(EVENT_COLUMNS)})
+"""
+
+PROCESS_CREATE = 1
+READ_CHUNK = 1 << 20
+
+
+def open_text(path):
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8", errors="replace")
+    return open(path, "r", encoding="utf-8", errors="replace")
+
+
+def detect_format(path):
+    """Guess the format from the first non-blank character."""
+    with open_text(path) as f:
+        while True:
+            char = f.read(1)
+            if not char or not char.isspace():
+                break
+    return {"[": "json", "<": "xml"}.get(char, "jsonl")
+
+
+# --- Streaming readers: each yields one raw record at a time ---
+
+def read_jsonl(f):
+    for line in f:
+        line = line.strip()
+        if line:
+            yield json.loads(line)
+
+
+def read_json_array(f):
+    """Incrementally decode a top-level JSON array without loading the whole file."""
+    decoder = json.JSONDecoder()
+    buf, pos, eof = "", 0, False
+    while True:
+        # Skip whitespace, the opening bracket and separators
+        while pos < len(buf) and buf[pos] in " \t\r\n[,":
+            pos += 1
+        if pos < len(buf) and buf[pos] == "]":
+            return
+        if pos < len(buf):
+            try:
+                record, pos = decoder.raw_decode(buf, pos)
+                yield record
+                continue
+            except ValueError:
+                if eof:
+                    raise
+        if eof:
+            return
+        chunk = f.read(READ_CHUNK)
+        eof = not chunk
+        buf, pos = buf[pos:] + chunk, 0
+
+
+def _local(tag):
+    return tag.rsplit("}", 1)[-1]
+
+
+def read_xml(f):
+    """Yield Windows <Event> elements from an XML dump as {'System': {...}, 'EventData': {...}} dicts."""
+    context = ET.iterparse(f, events=("start", "end"))
+    _, root = next(context)
+    for event, elem in context:
+        if event != "end" or _local(elem.tag) != "Event":
+            continue
+        system, data = {}, {}
+        for child in elem:
+            section = _local(child.tag)
+            if section == "System":
+                for field in child:
+                    name = _local(field.tag)
+                    if name == "TimeCreated":
+                        system[name] = field.get("SystemTime")
+                    else:
+                        system[name] = field.text
+            elif section == "EventData":
+                for field in child:
+                    data[field.get("Name") or _local(field.tag)] = field.text
+        yield {"System": system, "EventData": data}
+        elem.clear()
+        root.clear()  # drop references to already processed events, keeping memory flat
+
+
+READERS = {"jsonl": read_jsonl, "json": read_json_array, "xml": read_xml}
+
+
+# --- Mapping onto lotl_process_event ---
+
+def unwrap(record):
+    """Return (event_id, computer, system_time, data) for flat, EVTX-JSON, Winlogbeat and XML records."""
+    if "Event" in record and isinstance(record["Event"], dict):
+        record = record["Event"]
+    if "EventData" in record or "System" in record:
+        system = record.get("System") or {}
+        event_id = system.get("EventID")
+        if isinstance(event_id, dict):  # evtx_dump: {"#text": 1, "#attributes": {...}}
+            event_id = event_id.get("#text")
+        time_created = system.get("TimeCreated")
+        if isinstance(time_created, dict):
+            time_created = (time_created.get("#attributes") or time_created).get("SystemTime")
+        return event_id, system.get("Computer"), time_created, record.get("EventData") or {}
+    if "winlog" in record:
+        winlog = record["winlog"]
+        return winlog.get("event_id"), winlog.get("computer_name"), record.get("@timestamp"), winlog.get("event_data") or {}
+    return record.get("EventID"), record.get("Computer"), None, record
+
+
+def parse_time(value):
+    """Sysmon UtcTime ('2026-01-25 03:33:16.556') or ISO-8601 -> 'YYYY-MM-DD HH:MM:SS'."""
+    if not value:
+        return None
+    text = str(value).strip().replace("T", " ").rstrip("Z")
+    try:
+        return datetime.fromisoformat(text[:26]).strftime("%Y-%m-%d %H:%M:%S")
+    except ValueError:
+        return None
+
+
+def sha256_of(hashes):
+    """Pull SHA256 out of Sysmon's 'SHA1=..,MD5=..,SHA256=..,IMPHASH=..' field."""
+    for part in (hashes or "").split(","):
+        name, _, value = part.partition("=")
+        if name.strip().upper() == "SHA256" and len(value.strip()) == 64:
+            return value.strip().lower()
+    return None
+
+
+def to_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def map_record(record, default_host):
+    """Return (hostname, row dict) for a process-creation record, or None to skip it."""
+    event_id, computer, system_time, data = unwrap(record)
+    if event_id is not None and to_int(event_id) != PROCESS_CREATE:
+        return None
+    image = data.get("Image") or data.get("image_path")
+    cmd = data.get("CommandLine") or data.get("command_line")
+    if not image and not cmd:
+        return None
+    process_name = data.get("process_name") or (image.replace("/", "\\").rsplit("\\", 1)[-1] if image else None)
+    row = {
+        "provider": "Sysmon",
+        "event_type": "ProcessCreate",
+        "timestamp": parse_time(data.get("UtcTime")) or parse_time(system_time)
+                     or datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S"),
+        "user_name": data.get("User") or data.get("user"),
+        "image_path": image,
+        "process_name": process_name,
+        "command_line": cmd,
+        "current_directory": data.get("CurrentDirectory"),
+        "pid": to_int(data.get("ProcessId")),
+        "ppid": to_int(data.get("ParentProcessId")),
+        "parent_image": data.get("ParentImage"),
+        "parent_command_line": data.get("ParentCommandLine"),
+        "hash_sha256": sha256_of(data.get("Hashes")),
+        "raw_event": json.dumps(record, separators=(",", ":"), default=str),
+    }
+    return computer or default_host, row
+
+
+def iter_rows(path, fmt, default_host, stats):
+    if fmt == "auto":
+        fmt = detect_format(path)
+    with open_text(path) as f:
+        for record in READERS[fmt](f):
+            stats["read"] += 1
+            mapped = map_record(record, default_host) if isinstance(record, dict) else None
+            if mapped is None:
+                stats["skipped"] += 1
+                continue
+            yield mapped
+
+
+# --- Loading ---
+
+def _tsv_field(value):
+    if value is None:
+        return "\\N"
+    return (str(value).replace("\\", "\\\\").replace("\t", "\\t")
+            .replace("\n", "\\n").replace("\r", "\\r"))
+
+
+class Loader:
+    """Resolves host ids and writes rows in batches, one commit per batch."""
+
+    def __init__(self, conn, load_data=False):
+        self.conn = conn
+        self.load_data = load_data
+        self.host_ids = {}
+
+    def host_id(self, hostname):
+        host_id = self.host_ids.get(hostname)
+        if host_id is None:
+            cursor = self.conn.cursor()
+            cursor.execute("""
+                INSERT INTO lotl_host (hostname, environment, criticality, status) VALUES (%s, 'lab', 'medium', 'active')
+                ON DUPLICATE KEY UPDATE host_id = LAST_INSERT_ID(host_id)
+            """, (hostname,))
+            host_id = self.host_ids[hostname] = cursor.lastrowid
+        return host_id
+
+    def write(self, batch):
+        rows = [tuple(self.host_id(hostname) if c == "host_id" else row[c] for c in EVENT_COLUMNS)
+                for hostname, row in batch]
+        cursor = self.conn.cursor()
+        if self.load_data:
+            with tempfile.NamedTemporaryFile("w", suffix=".tsv", encoding="utf-8", delete=False) as tmp:
+                for values in rows:
+                    tmp.write("\t".join(_tsv_field(v) for v in values) + "\n")
+            try:
+                cursor.execute(LOAD_DATA_SQL, (tmp.name,))
+            finally:
+                os.remove(tmp.name)
+        else:
+            cursor.executemany(INSERT_SQL, rows)  # rewritten into one multi-row INSERT
+        self.conn.commit()
+
+
+def run(args):
+    stats = {"read": 0, "skipped": 0, "loaded": 0}
+    loader = None
+    if not args.dry_run:
+        conn = mysql.connector.connect(**DB_CONFIG, allow_local_infile=args.load_data)
+        loader = Loader(conn, args.load_data)
+
+    start = time.time()
+    for path in args.paths:
+        print(f"Importing {path}...")
+        batch = []
+        for mapped in iter_rows(path, args.format, args.host, stats):
+            batch.append(mapped)
+            if len(batch) >= args.batch_size:
+                if loader:
+                    loader.write(batch)
+                stats["loaded"] += len(batch)
+                batch = []
+                elapsed = time.time() - start
+                print(f"  {stats['loaded']} events loaded ({stats['loaded'] / elapsed:.0f} events/s)")
+        if batch:
+            if loader:
+                loader.write(batch)
+            stats["loaded"] += len(batch)
+
+    elapsed = max(time.time() - start, 1e-9)
+    print(f"Done: {stats['loaded']} events loaded, {stats['skipped']} of {stats['read']} records skipped "
+          f"in {elapsed:.1f}s ({stats['loaded'] / elapsed:.0f} events/s)")
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk-import Sysmon process-creation exports into lotl_process_event")
+    parser.add_argument("paths", nargs="+", help="JSONL, JSON array or XML files (optionally .gz)")
+    parser.add_argument("--format", choices=["auto", "jsonl", "json", "xml"], default="auto")
+    parser.add_argument("--host", default="imported", help="hostname for records without a Computer field")
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--load-data", action="store_true",
+                        help="load each batch with LOAD DATA LOCAL INFILE (server needs local_infile=1)")
+    parser.add_argument("--dry-run", action="store_true", help="parse and map only, no database writes")
+    run(parser.parse_args())
+
+
+if __name__ == "__main__":
+    main()
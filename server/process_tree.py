@@ -0,0 +1,88 @@
+from collections import OrderedDict
+
+from rule_engine import normalize_image, step_matches
+
+
+class Node:
+    __slots__ = ("image", "cmd", "ts", "ppid")
+
+    def __init__(self, image, cmd, ts, ppid):
+        self.image = image   # normalized image name
+        self.cmd = cmd       # lowercased command line
+        self.ts = ts         # process start (event time, epoch seconds); None if unknown
+        self.ppid = ppid
+
+
+class ProcessTree:
+    """Streaming per-host process index for parent-child correlation.
+
+    Nodes are keyed by (host, pid), so finding an event's parent is one dict
+    lookup. The index is kept in arrival order and bounded: nodes older than
+    ttl seconds (by event time) or beyond max_nodes are evicted oldest first,
+    which also drops processes that exited long ago. A pid that is reused
+    simply replaces the older node.
+    """
+
+    def __init__(self, max_nodes=200000, ttl=3600):
+        self.max_nodes = max_nodes
+        self.ttl = ttl
+        self._nodes = OrderedDict()  # (host, pid) -> Node
+        self.stats = {"observed": 0, "evicted": 0, "parent_hits": 0, "parent_misses": 0}
+
+    def __len__(self):
+        return len(self._nodes)
+
+    def observe(self, host, pid, ppid, process, cmd_line, ts):
+        """Index a process-creation event and return its Node."""
+        node = Node(normalize_image(process), (cmd_line or "").lower(), ts, ppid)
+        self.stats["observed"] += 1
+        if pid is None:
+            return node
+        key = (host, pid)
+        self._nodes.pop(key, None)
+        self._nodes[key] = node
+        while self._nodes:
+            oldest = next(iter(self._nodes.values()))
+            if len(self._nodes) <= self.max_nodes and (oldest.ts is None or ts is None or oldest.ts >= ts - self.ttl):
+                break
+            self._nodes.popitem(last=False)
+            self.stats["evicted"] += 1
+        return node
+
+    def parent(self, host, node):
+        """The indexed parent of node, if it is known and started no later than node."""
+        if node.ppid is None:
+            return None
+        parent = self._nodes.get((host, node.ppid))
+        if parent is None or parent is node or (parent.ts is not None and node.ts is not None and parent.ts > node.ts):
+            self.stats["parent_misses"] += 1
+            return None
+        self.stats["parent_hits"] += 1
+        return parent
+
+    def match(self, host, node, sequences, parent_image=None, parent_cmd_line=None):
+        """Return the sequence rules whose chain of steps ends at node.
+
+        Steps are matched from the node upwards through direct parents. If the
+        immediate parent is not indexed (it started before we began watching),
+        the event's own parent_image/parent_command_line columns stand in for it;
+        its start time is then unknown and does not count against `within`.
+        """
+        hits = []
+        for rule in sequences:
+            if not step_matches(rule.steps[-1], node.image, node.cmd):
+                continue
+            current, first_ts = node, node.ts
+            for step in reversed(rule.steps[:-1]):
+                parent = self.parent(host, current)
+                if parent is None and current is node and parent_image:
+                    parent = Node(normalize_image(parent_image), (parent_cmd_line or "").lower(), None, None)
+                if parent is None or not step_matches(step, parent.image, parent.cmd):
+                    break
+                current = parent
+                if parent.ts is not None:
+                    first_ts = parent.ts
+            else:
+                if rule.within is None or first_ts is None or node.ts is None or node.ts - first_ts <= rule.within:
+                    hits.append(rule)
+        return hits
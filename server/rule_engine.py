@@ -0,0 +1,614 @@
+import hashlib
+import re
+import threading
+from collections import deque
+
+try:
+    import yaml
+except ImportError:  # Sigma rules are skipped when PyYAML is unavailable
+    yaml = None
+
+WILDCARD_IMAGE = "*"
+# Above this many keyword terms for one image, match_batch() scans with the
+# automaton instead of testing each term with a substring check
+BATCH_SUBSTRING_MAX_TERMS = 64
+
+# Built-in rules used when lotl_detection_rule is empty or unreachable.
+# They mirror the keyword seed rows in database/init.sql; the seeded sequence
+# rule ("Office Spawns Shell Downloader") is only loaded from the table.
+DEFAULT_RULES = [
+    {
+        "rule_id": None,
+        "rule_name": "CertUtil Download",
+        "severity_default": "high",
+        "logic_type": "keyword",
+        "rule_content": "process_name:certutil.exe AND command_line:urlcache|split|decode",
+    },
+    {
+        "rule_id": None,
+        "rule_name": "Suspicious PowerShell",
+        "severity_default": "medium",
+        "logic_type": "keyword",
+        "rule_content": "process_name:powershell.exe|pwsh.exe AND command_line:-enc|-encodedcommand",
+    },
+    {
+        "rule_id": None,
+        "rule_name": "PowerShell Download Cradle",
+        "severity_default": "high",
+        "logic_type": "keyword",
+        "rule_content": "process_name:powershell.exe|pwsh.exe AND command_line:downloadstring|downloadfile|invoke-webrequest|net.webclient",
+    },
+]
+
+_IMAGE_FIELDS = ("process_name", "image", "image_path")
+_COMMAND_FIELDS = ("command_line", "commandline", "cmd")
+_AND_SPLIT = re.compile(r"\s+AND\s+", re.IGNORECASE)
+_INLINE_FLAGS = re.compile(r"^\(\?[aiLmsux]+\)")
+_ARROW_SPLIT = re.compile(r"\s*->\s*")
+_WITHIN = re.compile(r"\s+WITHIN\s+(\d+(?:\.\d+)?)\s*s?\s*$", re.IGNORECASE)
+
+RULE_COLUMNS_SQL = """
+    SELECT rule_id, rule_name, severity_default, logic_type, rule_content
+    FROM lotl_detection_rule
+    WHERE enabled = 1
+    ORDER BY rule_id
+"""
+
+# Cheap change detector: any insert, delete, enable/disable or edit of a rule
+# changes at least one of these aggregates.
+RULE_FINGERPRINT_SQL = """
+    SELECT COUNT(*), COALESCE(SUM(enabled), 0), MAX(updated_at), MAX(created_at),
+           COALESCE(BIT_XOR(CRC32(CONCAT_WS('|', rule_id, enabled, severity_default,
+                                            logic_type, rule_content))), 0)
+    FROM lotl_detection_rule
+"""
+
+
+def normalize_image(value):
+    """Reduce a process path or name to a lowercase basename without '.exe'."""
+    if not value:
+        return ""
+    name = value.strip().strip('"').replace("/", "\\").rsplit("\\", 1)[-1].lower()
+    if name.endswith(".exe"):
+        name = name[:-4]
+    return name
+
+
+class AhoCorasick:
+    """Multi-pattern substring matcher: one pass over the text finds every pattern."""
+
+    def __init__(self, patterns):
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [()]
+        for index, pattern in enumerate(patterns):
+            self._add(pattern, index)
+        self._build()
+
+    def _add(self, pattern, index):
+        state = 0
+        for char in pattern:
+            nxt = self._goto[state].get(char)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][char] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append(())
+            state = nxt
+        self._out[state] = self._out[state] + (index,)
+
+    def _build(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                if state:
+                    self._fail[nxt] = self._goto[fail].get(char, 0)
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def search(self, text):
+        """Return the set of pattern indices occurring anywhere in text."""
+        goto, fail, out = self._goto, self._fail, self._out
+        found = set()
+        state = 0
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if out[state]:
+                found.update(out[state])
+        return found
+
+
+class Rule:
+    """A single compiled detection rule.
+
+    images: normalized image names the rule applies to (None = any process).
+    clauses: keyword alternatives; every clause needs at least one hit.
+    regex: optional compiled pattern that must also match the command line.
+    """
+
+    def __init__(self, rule_id, name, severity, logic_type, images=None, clauses=None, regex=None):
+        self.rule_id = rule_id
+        self.name = name
+        self.severity = (severity or "medium").lower()
+        self.logic_type = logic_type
+        self.images = frozenset(images) if images else None
+        self.clauses = [tuple(terms) for terms in (clauses or [])]
+        self.regex = regex
+
+    def __repr__(self):
+        return f"Rule({self.rule_id!r}, {self.name!r})"
+
+
+class SequenceRule(Rule):
+    """Parent-child chain: steps[0] spawned steps[1] ... which spawned the current process.
+
+    Each step is a keyword-style Rule; the last step is matched against the
+    event itself, so images/clauses mirror it for indexing. within bounds the
+    seconds between the first step's process start and the last one.
+    """
+
+    def __init__(self, rule_id, name, severity, steps, within=None):
+        last = steps[-1]
+        super().__init__(rule_id, name, severity, "sequence", last.images, last.clauses)
+        self.steps = tuple(steps)
+        self.within = within
+
+
+def step_matches(step, image, cmd_lower):
+    """Does a process (normalized image, lowercased command line) satisfy one sequence step?"""
+    if step.images is not None and image not in step.images:
+        return False
+    return all(any(term in cmd_lower for term in clause) for clause in step.clauses)
+
+
+def _split_values(value):
+    return [v.strip().lower() for v in value.split("|") if v.strip()]
+
+
+def _parse_field(clause):
+    field, sep, value = clause.partition(":")
+    if not sep:
+        raise ValueError(f"expected 'field:value', got {clause!r}")
+    return field.strip().lower(), value.strip()
+
+
+def parse_keyword_rule(content):
+    """Parse 'process_name:a.exe|b.exe AND command_line:x|y AND ...'."""
+    images, clauses = set(), []
+    for clause in _AND_SPLIT.split(content.strip()):
+        field, value = _parse_field(clause)
+        if field in _IMAGE_FIELDS:
+            images.update(normalize_image(v) for v in _split_values(value))
+        elif field in _COMMAND_FIELDS:
+            terms = _split_values(value)
+            if terms:
+                clauses.append(terms)
+        else:
+            raise ValueError(f"unsupported field {field!r}")
+    if not images and not clauses:
+        raise ValueError("rule has no conditions")
+    return images, clauses
+
+
+def parse_regex_rule(content):
+    """Parse '[process_name:a.exe|b.exe AND ][command_line:]<regex>'."""
+    images = set()
+    content = content.strip()
+    if content.lower().startswith(_IMAGE_FIELDS):
+        head, *rest = _AND_SPLIT.split(content, maxsplit=1)
+        _, value = _parse_field(head)
+        content = rest[0] if rest else ""
+        images.update(normalize_image(v) for v in _split_values(value))
+    field, sep, rest = content.partition(":")
+    if sep and field.strip().lower() in _COMMAND_FIELDS:
+        content = rest.strip()
+    if not content:
+        raise ValueError("empty regex")
+    return images, content
+
+
+def parse_sequence_rule(content):
+    """Parse 'step -> step [-> step ...] [WITHIN seconds]', each step in keyword-rule syntax."""
+    content = content.strip()
+    within = None
+    found = _WITHIN.search(content)
+    if found:
+        within = float(found.group(1))
+        content = content[:found.start()]
+    parts = _ARROW_SPLIT.split(content)
+    if len(parts) < 2:
+        raise ValueError("a sequence needs at least two steps")
+    steps = [Rule(None, None, None, "keyword", *parse_keyword_rule(part)) for part in parts]
+    return steps, within
+
+
+def parse_sigma_rule(content):
+    """Translate the common subset of a Sigma process_creation rule.
+
+    Supported: selections combined with 'and' (or a single selection), the
+    Image|endswith, CommandLine|contains[|all] and CommandLine|re modifiers.
+    """
+    if yaml is None:
+        raise ValueError("PyYAML is not installed")
+    doc = yaml.safe_load(content) or {}
+    detection = doc.get("detection") or {}
+    condition = str(detection.get("condition", "selection")).strip()
+    names = [n.strip() for n in re.split(r"\s+and\s+", condition)]
+    images, clauses, patterns = set(), [], []
+    for name in names:
+        selection = detection.get(name)
+        if not isinstance(selection, dict):
+            raise ValueError(f"unsupported sigma condition {condition!r}")
+        for key, value in selection.items():
+            field, *modifiers = key.split("|")
+            values = value if isinstance(value, list) else [value]
+            values = [str(v) for v in values]
+            if field in ("Image", "OriginalFileName"):
+                images.update(normalize_image(v) for v in values)
+            elif field == "CommandLine" and "re" in modifiers:
+                patterns.extend(values)
+            elif field == "CommandLine" and "all" in modifiers:
+                clauses.extend([v.lower()] for v in values)
+            elif field == "CommandLine":
+                clauses.append([v.lower() for v in values])
+            else:
+                raise ValueError(f"unsupported sigma field {key!r}")
+    regex = "|".join(f"(?:{_INLINE_FLAGS.sub('', p)})" for p in patterns) or None
+    if not images and not clauses and not regex:
+        raise ValueError("rule has no conditions")
+    return images, clauses, regex
+
+
+def compile_rule(row):
+    """Build a Rule from a lotl_detection_rule row (dict)."""
+    logic_type = (row.get("logic_type") or "keyword").lower()
+    content = row.get("rule_content") or ""
+    regex = None
+    if logic_type == "sequence":
+        steps, within = parse_sequence_rule(content)
+        return SequenceRule(row.get("rule_id"), row.get("rule_name"), row.get("severity_default"), steps, within)
+    if logic_type == "keyword":
+        images, clauses = parse_keyword_rule(content)
+    elif logic_type == "regex":
+        images, pattern = parse_regex_rule(content)
+        clauses, regex = [], pattern
+    elif logic_type == "sigma":
+        images, clauses, regex = parse_sigma_rule(content)
+    else:
+        raise ValueError(f"unknown logic_type {logic_type!r}")
+    if regex:
+        regex = re.compile(_INLINE_FLAGS.sub("", regex), re.IGNORECASE)
+    return Rule(row.get("rule_id"), row.get("rule_name"), row.get("severity_default"),
+                logic_type, images, clauses, regex)
+
+
+def rule_set_version(rows):
+    """Content hash of the rule rows, stable across restarts and workers."""
+    digest = hashlib.sha1()
+    for row in rows:
+        key = (row.get("rule_id"), row.get("rule_name"), row.get("severity_default"),
+               row.get("logic_type"), row.get("rule_content"))
+        digest.update(repr(key).encode("utf-8"))
+    return digest.hexdigest()[:12]
+
+
+def load_rule_rows(conn):
+    """Fetch the enabled rules over conn; returns [] when none are available."""
+    cursor = conn.cursor(dictionary=True)
+    cursor.execute(RULE_COLUMNS_SQL)
+    rows = cursor.fetchall()
+    conn.commit()  # release the read snapshot so the next poll sees new rows
+    return rows
+
+
+class RuleSet:
+    """Immutable compiled index over a set of rules.
+
+    Every keyword term of every rule goes into one Aho-Corasick automaton, so a
+    command line is scanned once regardless of the rule count. Rules without
+    keyword clauses are bucketed by process image and share one combined regex
+    per bucket, which rejects most events with a single search.
+
+    Sequence rules need process-tree state, so they are kept apart in
+    self.sequences, bucketed by the image of their last step, and evaluated
+    by the analyzer's ProcessTree.
+    """
+
+    def __init__(self, rules, version="builtin", rows=()):
+        rules = list(rules)
+        self.rules = tuple(r for r in rules if not isinstance(r, SequenceRule))
+        self.sequences = tuple(r for r in rules if isinstance(r, SequenceRule))
+        self._sequence_buckets = {}  # image of the last step -> [SequenceRule]
+        for rule in self.sequences:
+            for image in rule.images or (WILDCARD_IMAGE,):
+                self._sequence_buckets.setdefault(image, []).append(rule)
+        self._stage_steps = {}  # image -> [(step a process with that image can satisfy, the step before it or None)]
+        for rule in self.sequences:
+            for previous, step in zip((None,) + rule.steps[:-1], rule.steps):
+                for image in step.images or (WILDCARD_IMAGE,):
+                    self._stage_steps.setdefault(image, []).append((step, previous))
+        wildcard_steps = self._stage_steps.get(WILDCARD_IMAGE, [])
+        for image, steps in self._stage_steps.items():
+            if image != WILDCARD_IMAGE:
+                steps.extend(wildcard_steps)
+        self.version = version
+        self.rows = tuple(rows)  # source rows, so worker processes can rebuild the same set
+        terms = {}
+        self._term_clauses = []   # term index -> clause indices
+        self._clause_rule = []    # clause index -> rule index
+        self._clause_count = []   # rule index -> number of clauses
+        self._regex_buckets = {}  # image -> (combined prefilter, [rule index])
+        pattern_only = {}
+
+        for rule_index, rule in enumerate(self.rules):
+            self._clause_count.append(len(rule.clauses))
+            for terms_of_clause in rule.clauses:
+                clause_index = len(self._clause_rule)
+                self._clause_rule.append(rule_index)
+                for term in set(terms_of_clause):
+                    term_index = terms.setdefault(term, len(terms))
+                    if term_index == len(self._term_clauses):
+                        self._term_clauses.append([])
+                    self._term_clauses[term_index].append(clause_index)
+            if not rule.clauses:
+                for image in rule.images or (WILDCARD_IMAGE,):
+                    pattern_only.setdefault(image, []).append(rule_index)
+
+        self._automaton = AhoCorasick(terms) if terms else None
+        for image, indices in pattern_only.items():
+            self._regex_buckets[image] = (self._combine(indices), indices)
+        self._batch_plans = {}  # image -> candidate rules for match_batch(), built on first use
+
+    def _combine(self, indices):
+        patterns = [self.rules[i].regex.pattern for i in indices if self.rules[i].regex]
+        if len(patterns) != len(indices):
+            return None  # an image-only rule is in the bucket; always a candidate
+        try:
+            return re.compile("|".join(f"(?:{p})" for p in patterns), re.IGNORECASE)
+        except re.error:
+            return None
+
+    def __len__(self):
+        return len(self.rules) + len(self.sequences)
+
+    def sequence_candidates(self, image):
+        """Sequence rules whose last step can match a process with this normalized image."""
+        return self._sequence_buckets.get(image, []) + self._sequence_buckets.get(WILDCARD_IMAGE, [])
+
+    def match_stages(self, processes, commands, parents):
+        """Positions in a page (process, command-line and parent image columns) of possible sequence steps.
+
+        An event qualifies if it satisfies a step and, for any step but the
+        first, its parent image (when known) fits the step before. Only these
+        events can be part of a parent-child chain, so only they need to go
+        through the process tree. As in match_batch(), images are normalized
+        once per distinct value, and processes whose image appears in no step
+        are skipped without reading their command line.
+        """
+        if not self.sequences:
+            return set()
+        wildcard = self._stage_steps.get(WILDCARD_IMAGE)
+        images, positions = {"": ""}, set()
+        for position, process in enumerate(processes):
+            image = images.get(process)
+            if image is None:
+                image = images[process] = normalize_image(process)
+            steps = self._stage_steps.get(image, wildcard)
+            if not steps:
+                continue
+            parent = parents[position] or ""
+            parent_image = images.get(parent)
+            if parent_image is None:
+                parent_image = images[parent] = normalize_image(parent)
+            cmd_lower = (commands[position] or "").lower()
+            for step, previous in steps:
+                if previous is not None and parent_image and previous.images is not None \
+                        and parent_image not in previous.images:
+                    continue
+                if step_matches(step, image, cmd_lower):
+                    positions.add(position)
+                    break
+        return positions
+
+    @classmethod
+    def from_rows(cls, rows):
+        rules = []
+        for row in rows:
+            try:
+                rules.append(compile_rule(row))
+            except (ValueError, re.error) as e:
+                print(f"Skipping rule '{row.get('rule_name')}': {e}")
+        return cls(rules, rule_set_version(rows), rows)
+
+    def agent_filter(self):
+        """Compact pre-filter for agents that over-approximates this rule set.
+
+        Each entry lists the images a rule applies to (None = any) and the terms
+        of its smallest keyword clause, one of which any hit must contain. Rules
+        with neither (a bare regex) cannot be reduced; they are left out and the
+        filter is marked incomplete, so agents must not sample away non-matches.
+
+        A sequence fires on its last step's event, but only if the ancestors
+        were indexed first, so every step's images are entries on their own
+        (image alone is enough): those processes are shipped right away and
+        never sampled.
+        """
+        entries, complete = [], True
+        steps = [Rule(None, None, None, "keyword", step.images) if step.images else step
+                 for sequence in self.sequences for step in sequence.steps]
+        for rule in self.rules + tuple(steps):
+            images = sorted(rule.images) if rule.images else None
+            keywords = sorted(min(rule.clauses, key=len)) if rule.clauses else []
+            if images is None and not keywords:
+                complete = False
+                continue
+            entry = {"images": images, "keywords": keywords}
+            if entry not in entries:
+                entries.append(entry)
+        return {"version": self.version, "complete": complete, "rules": entries}
+
+    def match(self, process, cmd_line):
+        """Return the rules matching one event, in rule order."""
+        return [self.rules[i] for i in self.match_indices(process, cmd_line)]
+
+    def _batch_plan(self, image):
+        """Candidate rules for one normalized image: (keyword rules, regex buckets), or None if there are none.
+
+        Keyword rules come as (rule index, clauses, regex); None in place of
+        the keyword list means too many terms for substring checks.
+        """
+        plan = self._batch_plans.get(image, False)
+        if plan is not False:
+            return plan
+        keyword, terms = [], 0
+        for rule_index, rule in enumerate(self.rules):
+            if rule.clauses and (rule.images is None or image in rule.images):
+                keyword.append((rule_index, rule.clauses, rule.regex))
+                terms += sum(len(clause) for clause in rule.clauses)
+        regex = [self._regex_buckets[bucket] for bucket in (image, WILDCARD_IMAGE) if bucket in self._regex_buckets]
+        if terms > BATCH_SUBSTRING_MAX_TERMS:
+            keyword = None
+        plan = (keyword, regex) if keyword is None or keyword or regex else None
+        self._batch_plans[image] = plan  # the set is immutable, so a racing rebuild computes the same plan
+        return plan
+
+    def match_batch(self, processes, commands):
+        """match_indices() over a whole page, given as a process column and a command-line column.
+
+        Images are normalized once per distinct process value and events are
+        bucketed by image, so each rule only sees the events of its own
+        images; a bucket without candidate rules (most benign processes) is
+        skipped without touching its command lines. Within a bucket each
+        distinct command line is lowercased and matched once.
+        Returns [(position, (rule index, ...))] for events with hits, in position order.
+        """
+        images, buckets = {}, {}
+        for position, process in enumerate(processes):
+            image = images.get(process)
+            if image is None:
+                image = images[process] = normalize_image(process)
+            buckets.setdefault(image, []).append(position)
+
+        hits = []
+        for image, positions in buckets.items():
+            plan = self._batch_plan(image)
+            if plan is None:
+                continue
+            keyword, regex_buckets = plan
+            results = {}  # command line -> rule indices
+            for position in positions:
+                cmd_line = commands[position] or ""
+                matched = results.get(cmd_line)
+                if matched is None:
+                    if keyword is None:
+                        matched = self.match_indices(processes[position], cmd_line)
+                    else:
+                        matched = self._match_plan(keyword, regex_buckets, cmd_line)
+                    results[cmd_line] = matched = tuple(matched)
+                if matched:
+                    hits.append((position, matched))
+        hits.sort()
+        return hits
+
+    def _match_plan(self, keyword, regex_buckets, cmd_line):
+        cmd_lower = cmd_line.lower()
+        matched = []
+        for rule_index, clauses, regex in keyword:
+            if all(any(term in cmd_lower for term in clause) for clause in clauses):
+                if regex is None or regex.search(cmd_line):
+                    matched.append(rule_index)
+        for prefilter, indices in regex_buckets:
+            if prefilter is not None and not prefilter.search(cmd_line):
+                continue
+            for rule_index in indices:
+                rule = self.rules[rule_index]
+                if rule.regex is None or rule.regex.search(cmd_line):
+                    matched.append(rule_index)
+        return sorted(matched)
+
+    def match_indices(self, process, cmd_line):
+        """Like match(), but returns positions in self.rules."""
+        image = normalize_image(process)
+        cmd_lower = (cmd_line or "").lower()
+        matched = []
+
+        if self._automaton is not None:
+            hits = {}
+            for term_index in self._automaton.search(cmd_lower):
+                for clause_index in self._term_clauses[term_index]:
+                    rule_index = self._clause_rule[clause_index]
+                    hits.setdefault(rule_index, set()).add(clause_index)
+            for rule_index, clauses in hits.items():
+                if len(clauses) != self._clause_count[rule_index]:
+                    continue
+                rule = self.rules[rule_index]
+                if rule.images is not None and image not in rule.images:
+                    continue
+                if rule.regex is not None and not rule.regex.search(cmd_line or ""):
+                    continue
+                matched.append(rule_index)
+
+        for bucket in (image, WILDCARD_IMAGE):
+            entry = self._regex_buckets.get(bucket)
+            if entry is None:
+                continue
+            prefilter, indices = entry
+            if prefilter is not None and not prefilter.search(cmd_line or ""):
+                continue
+            for rule_index in indices:
+                rule = self.rules[rule_index]
+                if rule.regex is None or rule.regex.search(cmd_line or ""):
+                    matched.append(rule_index)
+
+        return sorted(matched)
+
+
+class RuleWatcher(threading.Thread):
+    """Background thread that rebuilds the RuleSet when lotl_detection_rule changes.
+
+    The new snapshot is compiled off the polling thread and handed to
+    on_reload, which only swaps a reference, so detection never pauses.
+    """
+
+    def __init__(self, connect, on_reload, interval=30, version=None):
+        super().__init__(name="rule-watcher", daemon=True)
+        self._connect = connect
+        self._on_reload = on_reload
+        self.interval = interval
+        self._conn = None
+        self._fingerprint = None
+        self._version = version
+        self._stop_event = threading.Event()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            try:
+                self.check()
+            except Exception as e:
+                print(f"Rule Reload Error: {e}")
+                self._conn = None
+
+    def check(self):
+        if self._conn is None or not self._conn.is_connected():
+            self._conn = self._connect()
+        cursor = self._conn.cursor()
+        cursor.execute(RULE_FINGERPRINT_SQL)
+        fingerprint = cursor.fetchone()
+        self._conn.commit()
+        if fingerprint == self._fingerprint:
+            return
+        rule_set = RuleSet.from_rows(load_rule_rows(self._conn) or DEFAULT_RULES)
+        self._fingerprint = fingerprint
+        if rule_set.version != self._version:
+            self._version = rule_set.version
+            self._on_reload(rule_set)
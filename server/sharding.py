@@ -0,0 +1,107 @@
+import math
+
+
+class LeaseLost(Exception):
+    """Raised when a shard's checkpoint row is now owned by another worker.
+
+    discarded holds the alert dicts the sink dropped (the new owner re-analyzes their events).
+    """
+
+    def __init__(self, consumer, discarded=()):
+        super().__init__(consumer)
+        self.discarded = list(discarded)
+
+
+class ShardLeases:
+    """Coordinates analyzer workers over lotl_analyzer_checkpoint lease rows.
+
+    Events are split into shard_count shards by MOD(host_id, shard_count), so
+    every host's events stay in one shard and keep their order. Each worker
+    heartbeats in lotl_analyzer_worker and holds at most its fair share
+    (shards / live workers) of shard leases. Leases of a worker that stops
+    heartbeating expire after ttl seconds and are claimed by the others.
+    """
+
+    def __init__(self, connect, owner, shard_count, prefix="analyzer", ttl=30):
+        self._connect = connect
+        self.owner = owner
+        self.shard_count = shard_count
+        self.prefix = prefix
+        self.ttl = ttl
+
+    def consumer(self, shard):
+        return f"{self.prefix}-shard-{shard}"
+
+    def _pattern(self):
+        return f"{self.prefix}-shard-%"
+
+    @staticmethod
+    def shard_of(consumer):
+        return int(consumer.rsplit("-", 1)[1])
+
+    def ensure_shards(self):
+        """Create missing shard rows, starting where the unsharded consumer stopped (or at the newest event)."""
+        conn = self._connect()
+        cursor = conn.cursor()
+        cursor.execute("SELECT last_event_id FROM lotl_analyzer_checkpoint WHERE consumer = %s", (self.prefix,))
+        row = cursor.fetchone()
+        if row is None:
+            cursor.execute("SELECT COALESCE(MAX(event_id), 0) FROM lotl_process_event")
+            row = cursor.fetchone()
+        cursor.executemany(
+            "INSERT IGNORE INTO lotl_analyzer_checkpoint (consumer, last_event_id) VALUES (%s, %s)",
+            [(self.consumer(shard), row[0]) for shard in range(self.shard_count)])
+        conn.commit()
+
+    def rebalance(self):
+        """Heartbeat, renew our leases, give back shards above fair share and claim free ones.
+
+        Returns the sorted list of shard numbers this worker owns.
+        """
+        conn = self._connect()
+        cursor = conn.cursor()
+        try:
+            cursor.execute("INSERT INTO lotl_analyzer_worker (owner, heartbeat) VALUES (%s, NOW()) "
+                           "ON DUPLICATE KEY UPDATE heartbeat = NOW()", (self.owner,))
+            cursor.execute("DELETE FROM lotl_analyzer_worker WHERE heartbeat < NOW() - INTERVAL %s SECOND",
+                           (self.ttl * 10,))
+            cursor.execute("SELECT COUNT(*) FROM lotl_analyzer_worker WHERE heartbeat > NOW() - INTERVAL %s SECOND",
+                           (self.ttl,))
+            live = max(1, cursor.fetchone()[0])
+            fair = math.ceil(self.shard_count / live)
+
+            cursor.execute("UPDATE lotl_analyzer_checkpoint SET lease_expires = NOW() + INTERVAL %s SECOND "
+                           "WHERE owner = %s AND consumer LIKE %s", (self.ttl, self.owner, self._pattern()))
+            cursor.execute("SELECT consumer FROM lotl_analyzer_checkpoint WHERE owner = %s AND consumer LIKE %s "
+                           "ORDER BY consumer", (self.owner, self._pattern()))
+            owned = [row[0] for row in cursor.fetchall()]
+
+            for consumer in owned[fair:]:
+                cursor.execute("UPDATE lotl_analyzer_checkpoint SET owner = NULL, lease_expires = NULL "
+                               "WHERE consumer = %s AND owner = %s", (consumer, self.owner))
+            owned = owned[:fair]
+
+            if len(owned) < fair:
+                cursor.execute("SELECT consumer FROM lotl_analyzer_checkpoint WHERE consumer LIKE %s "
+                               "AND (owner IS NULL OR lease_expires < NOW()) ORDER BY consumer", (self._pattern(),))
+                for (consumer,) in cursor.fetchall():
+                    if len(owned) >= fair:
+                        break
+                    cursor.execute("UPDATE lotl_analyzer_checkpoint SET owner = %s, lease_expires = NOW() + INTERVAL %s SECOND "
+                                   "WHERE consumer = %s AND (owner IS NULL OR lease_expires < NOW())",
+                                   (self.owner, self.ttl, consumer))
+                    if cursor.rowcount == 1:
+                        owned.append(consumer)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        return sorted(self.shard_of(consumer) for consumer in owned)
+
+    def release_all(self):
+        conn = self._connect()
+        cursor = conn.cursor()
+        cursor.execute("UPDATE lotl_analyzer_checkpoint SET owner = NULL, lease_expires = NULL WHERE owner = %s",
+                       (self.owner,))
+        cursor.execute("DELETE FROM lotl_analyzer_worker WHERE owner = %s", (self.owner,))
+        conn.commit()
